@@ -2,7 +2,7 @@ from fastapi import APIRouter
 
 from .endpoints.post import llm, rag_system
 from .endpoints.get import minio_storage
-from .endpoints import nurse, process_audio
+from .endpoints import nurse, process_audio, admin
 
 api_router = APIRouter()
 
@@ -11,3 +11,4 @@ api_router.include_router(minio_storage.router, tags=["minio-storage"])
 api_router.include_router(nurse.router, prefix="/nurses", tags=["nurses"])
 api_router.include_router(process_audio.router, tags=["audio-processing"])
 api_router.include_router(rag_system.router, tags=["rag-system"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
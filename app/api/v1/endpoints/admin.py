@@ -0,0 +1,55 @@
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from ....core.config_loader import config
+from ....llm.reextraction import get_reextraction_status
+from ....utils.fair_share_helpers import fair_share_stats
+from ....utils.storage_helpers import run_storage_io
+from ....worker import reextract_outputs_task
+
+logger = logging.getLogger(__name__)
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Check X-Admin-Token against tokens.admin (ADMIN_TOKEN); the endpoints are disabled without one."""
+    expected = config.tokens.admin
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: ADMIN_TOKEN is not set")
+    if not hmac.compare_digest(x_admin_token or "", expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+@router.post("/reextract")
+async def start_reextraction(
+    user_id: Optional[str] = None,
+    concurrency: int = Query(8, ge=1, le=64),
+    batch_size: int = Query(100, ge=1, le=1000),
+    force: bool = False,
+    reset: bool = False,
+):
+    """
+    Re-run the medical JSON extraction over stored diarizations of a user (or
+    of every user) after a prompt or model change, without re-transcribing.
+    """
+    status = await run_storage_io(get_reextraction_status, user_id)
+    if status["running"]:
+        raise HTTPException(status_code=409, detail=f"A re-extraction of {status['scope']} is already running")
+
+    task = reextract_outputs_task.delay(
+        user_id=user_id, concurrency=concurrency, batch_size=batch_size, force=force, reset=reset
+    )
+    logger.info(f"Started re-extraction of {status['scope']} with task ID: {task.id}")
+    return {"message": "Re-extraction started", "task_id": task.id, "scope": status["scope"]}
+
+@router.get("/reextract/status")
+async def reextraction_status(user_id: Optional[str] = None):
+    """Progress and throughput of the current or last re-extraction of a scope."""
+    return await run_storage_io(get_reextraction_status, user_id)
+
+@router.get("/scheduler")
+async def scheduler_status():
+    """Pending and running pipelines per user in the fair-share scheduler."""
+    return await run_storage_io(fair_share_stats)
@@ -1,21 +1,34 @@
 from minio import Minio
 from minio.error import S3Error
-from fastapi import HTTPException, APIRouter
-import re, requests, json, os
-from tempfile import NamedTemporaryFile
+from fastapi import HTTPException, APIRouter, Request, Response, Query
+from fastapi.responses import StreamingResponse
+import re, requests, json, os, hashlib
+from typing import Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
 from .....core.minio_config import minio_config
 from .....models.request_enum import *
 from .....utils.storage_helpers import *
 from .....utils.json_helpers import remove_json_metadata
+from .....utils.catalog_helpers import lookup_object, record_object, catalog_is_complete, get_listing_marker
+from .....utils.key_helpers import AUDIO_FOLDER, OUTPUTS_FOLDER
 
 router = APIRouter()
 
 
 # Define the endpoints
 @router.get("/get_audios_from_user/{id}")
-async def get_audios_from_user_id(id: str):
-    return await get_audios_from_user(id)
+async def get_audios_from_user_id(
+    id: str,
+    request: Request,
+    response: Response,
+    start_after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    # Pages are in file name order; only a full listing can be sorted newest first
+    build = lambda objects: build_audio_urls(objects, newest_first=limit is None)
+    return await listing_response(request, response, id, AUDIO_FOLDER, start_after, limit, build)
 
 
 @router.get("/get_audio/{file_id}/{file_extension}")
@@ -23,122 +36,275 @@ async def get_audio_route(file_id: str, file_extension: AudioExtension):
     return await get_audio(file_id, file_extension)
 
 
+@router.get("/stream_audio/{file_id}/{file_extension}")
+async def stream_audio_route(file_id: str, file_extension: AudioExtension, request: Request):
+    return await stream_audio(file_id, file_extension, request)
+
+
 @router.get("/buckets")
 async def get_buckets_route():
     return await get_buckets()
 
 
+@router.get("/storage/metrics")
+async def get_storage_metrics_route():
+    """Connection pool saturation, circuit breaker state and storage thread pool usage."""
+    return storage_metrics()
+
+
 @router.get("/get_json_transcripts_by_user/{user_id}")
-async def get_transcripts_by_user_route(user_id: str):
-    return await get_transcripts_by_user(user_id)
+async def get_transcripts_by_user_route(
+    user_id: str,
+    request: Request,
+    response: Response,
+    start_after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    return await listing_response(request, response, user_id, OUTPUTS_FOLDER, start_after, limit, build_transcripts)
+
+
+def listing_headers(version: str, last_modified: Optional[datetime], user_id: str, folder: str,
+                    start_after: Optional[str], limit: Optional[int]) -> dict:
+    """Build the ETag/Last-Modified validators of one page of a user listing."""
+    page = hashlib.sha1(f"{user_id}|{folder}|{start_after}|{limit}".encode("utf-8")).hexdigest()[:12]
+    headers = {"ETag": f'W/"{folder}-{version}-{page}"', "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the listing validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison: the W/ prefix is ignored on both sides
+        etag = headers["ETag"].removeprefix("W/")
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def listing_response(request: Request, response: Response, user_id: str, folder: str,
+                           start_after: Optional[str], limit: Optional[int], build):
+    """
+    Serve one page of a user listing with conditional GET support.
+
+    When the catalog tracks the listing, the validators come from its version
+    marker and an unchanged listing returns 304 before anything is listed or
+    downloaded. Otherwise they are computed from the newest listed object,
+    which still saves building the body and sending it.
+    """
+    marker = await run_storage_io(get_listing_marker, user_id, folder)
+    if marker is not None:
+        headers = listing_headers(marker["version"], marker["last_modified"], user_id, folder, start_after, limit)
+        if is_not_modified(request, headers):
+            return Response(status_code=304, headers=headers)
+
+    try:
+        objects, next_cursor = await list_user_objects_page_async(user_id, folder, start_after, limit)
+
+        if marker is None:
+            newest = max((obj.last_modified for obj in objects), default=None)
+            version = f"{len(objects)}.{int(newest.timestamp()) if newest else 0}"
+            headers = listing_headers(version, newest, user_id, folder, start_after, limit)
+            if is_not_modified(request, headers):
+                return Response(status_code=304, headers=headers)
+
+        body = await build(objects)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if limit is not None:
+        body["next_cursor"] = next_cursor
+    response.headers.update(headers)
+    return body
+
+
+async def build_audio_urls(objects: list, newest_first: bool = True) -> dict:
+    """Build the URL listing of a user's audio objects, newest first or in listing order."""
+    # Generate URLs using internal container endpoint
+    audio_urls = [get_object_url(obj.object_name) for obj in objects]
+    return {"urls": sort_files_by_datetime(audio_urls) if newest_first else audio_urls}
+
+
+async def build_transcripts(objects: list) -> dict:
+    """Fetch and parse a user's JSON outputs concurrently, in listing order."""
+    object_names = [obj.object_name for obj in objects if obj.object_name.endswith(".json")]
+    documents = await fetch_json_objects_async(object_names)
+    return {"patients": [remove_json_metadata(json_data) for json_data in documents]}
 
 
 async def get_transcripts_by_user(user_id: str):
     """Retrieve all patient data generated by the LLM for a specific user."""
     try:
-        patients = []
-        
-        # Use MinIO
-        storage = init_storage_client()
-        client = storage["client"]
-        bucket_name = storage["bucket_name"]
-        
-        # List all objects in the bucket
-        objects = client.list_objects(bucket_name, recursive=True)
-        
-        for obj in objects:
-            split_parts = obj.object_name.rsplit(".", 1)[0].rsplit("_", 2)
-            if len(split_parts) < 3:
-                continue
-            
-            user_id_in_obj = split_parts[-2]
-            if user_id_in_obj == user_id and obj.object_name.endswith(".json"):
-                # Download the JSON file to a temporary file
-                with NamedTemporaryFile(delete=False, suffix='.json') as temp_file:
-                    temp_path = temp_file.name
-                
-                try:
-                    # Get the object data
-                    client.fget_object(bucket_name, obj.object_name, temp_path)
-                    
-                    # Read the JSON data
-                    with open(temp_path, 'r') as f:
-                        json_data = json.load(f)
-                    
-                    # Process the data
-                    patient_data = remove_json_metadata(json_data)
-                    patients.append(patient_data)
-                finally:
-                    # Clean up the temporary file
-                    if os.path.exists(temp_path):
-                        os.unlink(temp_path)
-
-        return {"patients": patients}
+        # List only this user's outputs
+        objects = await list_user_objects_async(user_id, OUTPUTS_FOLDER)
+        return await build_transcripts(objects)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def find_audio_object(file_id: str, file_extension: AudioExtension) -> dict:
+    """
+    Find the catalog record of an audio file by its file_id.
+
+    The catalog answers with a single lookup. The bucket is only scanned while
+    the catalog has not been backfilled yet, and any match found is recorded.
+    """
+    extension = getattr(file_extension, "value", file_extension)
+
+    record = await run_storage_io(lookup_object, file_id, "audio")
+    if record is None and not await run_storage_io(catalog_is_complete):
+        record = await run_storage_io(scan_for_audio_object, file_id)
+
+    if record is None or record["extension"] != extension:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    return record
+
+
+def scan_for_audio_object(file_id: str) -> Optional[dict]:
+    """Legacy lookup: list the whole bucket and match the fileID in each object name."""
+    # Define a regex pattern to extract the fileID from object names
+    pattern = r"date_(.*?)fileID_"
+    
+    # Use MinIO
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    
+    # List all objects in the bucket
+    objects = client.list_objects(bucket_name, recursive=True)
+    
+    # Iterate over the objects to find the one that matches the file_id
+    for obj in objects:
+        # Use regex to extract the fileID from the object name
+        match = re.search(pattern, obj.object_name)
+        if match and match.group(1) == file_id:
+            record = record_object(obj.object_name, obj.size)
+            if record is not None and record["kind"] == "audio":
+                return record
+    return None
+
+
 async def get_audio(file_id: str, file_extension: AudioExtension):
     try:
-        # Define a regex pattern to extract the fileID from object names
-        pattern = r"date_(.*?)fileID_"
-        
-        # Use MinIO
-        storage = init_storage_client()
-        client = storage["client"]
-        bucket_name = storage["bucket_name"]
-        
-        # List all objects in the bucket
-        objects = client.list_objects(bucket_name, recursive=True)
-        
-        # Iterate over the objects to find the one that matches the file_id and extension
-        for obj in objects:
-            # Use regex to extract the fileID from the object name
-            match = re.search(pattern, obj.object_name)
-            if match:
-                id_in_obj = match.group(1)
-                # Check if the extracted fileID matches the 'file_id' and the file has the correct audio extension
-                if id_in_obj == file_id and obj.object_name.endswith(f".{file_extension}"):
-                    # Generate URL using internal container endpoint
-                    protocol = 'http'  # Always use HTTP for internal container communication
-                    
-                    url = f"{protocol}://{minio_config['endpoint']}/{bucket_name}/{obj.object_name}"
-                    return url
-
-        # If no matching audio file is found, raise an HTTPException
+        record = await find_audio_object(file_id, file_extension)
+        return get_object_url(record["object_key"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """
+    Parse a single-range "bytes=" Range header into inclusive (start, end) offsets.
+    Returns None when the whole object should be sent: no header, several
+    ranges, or an invalid header, which RFC 9110 says to ignore. A valid
+    range that cannot be satisfied raises 416.
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    match = re.fullmatch(r"(\d*)-(\d*)", ranges.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+
+    if start:
+        first = int(start)
+        if end and int(end) < first:
+            return None
+        last = min(int(end), size - 1) if end else size - 1
+    else:
+        # Suffix range: the last N bytes (a zero-length suffix cannot be satisfied)
+        suffix = int(end)
+        first, last = (max(size - suffix, 0), size - 1) if suffix else (size, size - 1)
+
+    if first >= size or first > last:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return first, last
+
+
+async def stream_audio(file_id: str, file_extension: AudioExtension, request: Request):
+    """
+    Stream an audio file from storage with HTTP Range support.
+
+    The object is proxied in chunks and never held in memory, and a Range
+    request only reads the requested bytes from MinIO.
+    """
+    record = await find_audio_object(file_id, file_extension)
+    object_key = record["object_key"]
+
+    try:
+        stat = await run_storage_io(stat_object, object_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if stat is None:
         raise HTTPException(status_code=404, detail="Audio file not found")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{stat.etag}"',
+        "Content-Disposition": f'inline; filename="{os.path.basename(object_key)}"',
+    }
+    media_type = get_content_type(object_key) or stat.content_type or "application/octet-stream"
+
+    # A stale If-Range validator means the client gets the whole file
+    byte_range = parse_range_header(request.headers.get("range"), stat.size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range.strip('"') != stat.etag:
+        byte_range = None
+
+    if byte_range is None:
+        first, last, status_code = 0, stat.size - 1, 200
+    else:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{stat.size}"
+    headers["Content-Length"] = str(last - first + 1)
+
+    if stat.size == 0:
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    try:
+        object_response = await run_storage_io(open_object_stream, object_key, first, last - first + 1)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Starlette iterates sync generators in its thread pool, off the event loop
+    return StreamingResponse(
+        iter_object_chunks(object_response),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
+
 
 async def get_audios_from_user(id: str):
     try:
-        # Create a list to store the URLs of the audio files
-        audio_urls = []
-        
-        # Use MinIO
-        storage = init_storage_client()
-        client = storage["client"]
-        bucket_name = storage["bucket_name"]
-        
-        # List all objects in the bucket
-        objects = client.list_objects(bucket_name, recursive=True)
-        
-        # Iterate over the objects to find the ones that end with the id
-        for obj in objects:
-            # Split the object name by underscore and get the last part before the extension
-            id_in_obj = obj.object_name.rsplit(".", 1)[0].rsplit("_", 1)[-1]
-            
-            # Check if the id in the object name matches the id
-            if id_in_obj == id:
-                # Generate URL using internal container endpoint
-                protocol = 'http'  # Always use HTTP for internal container communication
-                
-                url = f"{protocol}://{minio_config['endpoint']}/{bucket_name}/{obj.object_name}"
-                audio_urls.append(url)
+        # List only this user's audio files
+        objects = await list_user_objects_async(id, AUDIO_FOLDER)
 
         # Return the list of audio URLs
-        return {"urls": sort_files_by_datetime(audio_urls)}
+        return await build_audio_urls(objects)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -147,11 +313,11 @@ async def get_buckets():
     """List MinIO buckets."""
     try:
         # Use MinIO
-        storage = init_storage_client()
+        storage = await run_storage_io(init_storage_client)
         client = storage["client"]
         
         # List buckets
-        buckets = client.list_buckets()
+        buckets = await run_storage_io(client.list_buckets)
         bucket_names = [bucket.name for bucket in buckets]
         
         return {"buckets": bucket_names}
@@ -1,4 +1,5 @@
-from typing import Optional
+import logging
+from typing import Optional, Dict, Any
 
 from fastapi import HTTPException, APIRouter
 from .....utils.file_helpers import *
@@ -8,10 +9,18 @@ from .....llm.replicate_models import (
     whisper_diarization,
 )
 from .....llm.llm_helpers import convert_prompt_for_llama3
+from .....llm.result_cache import (
+    result_cache_key,
+    resolve_audio_sha256,
+    get_cached_result,
+    store_cached_result,
+    count_cache_event,
+)
 from .....models.request_enum import Question, SourceType
 from .....llm.rag import *
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/whisper-diarize/")
 async def whisper_diarize_endpoint(file_url: str):
@@ -19,9 +28,9 @@ async def whisper_diarize_endpoint(file_url: str):
 
 @router.post("/llm-pipeline/")
 async def llm_pipeline_audio_to_json_endpoint(
-    file_url: str, patient_name: Optional[str] = None
+    file_url: str, patient_name: Optional[str] = None, bypass_cache: bool = False
 ):
-    return await llm_pipeline_audio_to_json(file_url, patient_name)
+    return await llm_pipeline_audio_to_json(file_url, patient_name, bypass_cache)
 
 @router.post("/rag-ask/")
 async def rag_ask_endpoint(question_body: Question):
@@ -61,21 +70,73 @@ async def whisper_diarize(file_url: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def llm_pipeline_audio_to_json(file_url: str, patient_name: Optional[str] = None):
+async def lookup_cached_extraction(file_url: str, patient_name: Optional[str] = None,
+                                   bypass_cache: bool = False) -> Dict[str, Any]:
+    """
+    Look the recording up in the result cache.
+
+    Returns the result cache key (None if the audio hash is unknown) and the
+    cached extraction, or None on a miss or with bypass_cache.
+    """
+    cache_key = None
+    audio_sha256 = await resolve_audio_sha256(file_url)
+    if audio_sha256:
+        cache_key = result_cache_key(audio_sha256, patient_name)
+        if bypass_cache:
+            await count_cache_event("bypassed")
+        else:
+            cached = await get_cached_result(cache_key)
+            if cached is not None:
+                logger.info(f"Result cache hit for {file_url}")
+                return {"cache_key": cache_key, "extraction": cached["extraction"]}
+    return {"cache_key": cache_key, "extraction": None}
+
+async def transcribe_audio(file_url: str, patient_name: Optional[str] = None, bypass_cache: bool = False) -> Dict[str, Any]:
+    """
+    Transcription stage of the pipeline.
+
+    Returns the result cache key and either the cached extraction (on a cache
+    hit, skipping Whisper) or the speaker diarization to extract from.
+    """
+    lookup = await lookup_cached_extraction(file_url, patient_name, bypass_cache)
+    if lookup["extraction"] is not None:
+        return lookup
+
+    speaker_diarization_json = await whisper_diarization(file_url)
+    return {"cache_key": lookup["cache_key"], "diarization": speaker_diarization_json}
+
+async def extract_medical_json(speaker_diarization_json: Any, patient_name: Optional[str] = None,
+                               cache_key: Optional[str] = None) -> Dict[str, Any]:
+    """Extraction stage of the pipeline: build the Llama 3 prompt and extract the medical JSON."""
+    prompt_for_llama3 = convert_prompt_for_llama3(
+        speaker_diarization_json, patient_name
+    )
+
+    # Pass the prompt directly - it already contains the transcript and context
+    llama3_json_output = await llama3_generate_medical_json(
+        prompt_for_llama3["prompt"]
+    )
+
+    if cache_key:
+        await store_cached_result(cache_key, speaker_diarization_json, llama3_json_output)
+
+    print(pretty_print_json(llama3_json_output))
+    return llama3_json_output
+
+async def llm_pipeline_audio_to_json(file_url: str, patient_name: Optional[str] = None, bypass_cache: bool = False):
+    """
+    Transcribe an audio file and extract the medical JSON from it.
+
+    Results are cached by audio content hash, model versions, prompt version
+    and patient name, so re-submitting the same recording skips Replicate.
+    With bypass_cache the pipeline always runs and refreshes the cached result.
+    """
     try:
-        speaker_diarization_json = await whisper_diarization(file_url)
-
-        prompt_for_llama3 = convert_prompt_for_llama3(
-            speaker_diarization_json, patient_name
-        )
-
-        # Pass the prompt directly - it already contains the transcript and context
-        llama3_json_output = await llama3_generate_medical_json(
-            prompt_for_llama3["prompt"]
-        )
+        transcription = await transcribe_audio(file_url, patient_name, bypass_cache)
+        if "extraction" in transcription:
+            return transcription["extraction"]
 
-        print(pretty_print_json(llama3_json_output))
-        return llama3_json_output
+        return await extract_medical_json(transcription["diarization"], patient_name, transcription["cache_key"])
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,41 +1,35 @@
-import os
 import json
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from .....models.request_enum import Question
 from .....llm.rag import RAGSystem_JSON
-from .....utils.file_helpers import remove_local_file
+from .....utils.scratch_helpers import ScratchSpace, request_scratch_space
 from ..get.minio_storage import get_transcripts_by_user
 
 router = APIRouter()
 
 @router.post("/ask_v2/{user_id}", tags=["rag-system"])
-async def rag_system_v2(user_id: str, question_body: Question):
+async def rag_system_v2(user_id: str, question_body: Question, scratch: ScratchSpace = Depends(request_scratch_space)):
     """
     Ask a question to the RAG System.
 
     - Uses LLM for generating answers.
-    - Removes temporary files after processing.
+    - Writes the user's transcripts to a per-request scratch file, removed after the request.
     """
-    file_path = f"assets/patients_from_user_{user_id}.json"
-
-    if os.path.exists(file_path):
-        remove_local_file(file_path)
-
     question = question_body.question
     json_data = await get_transcripts_by_user(user_id)
 
     print(json_data)
 
     try:
+        # Each request gets its own file, so concurrent questions never overwrite each other
+        payload = json.dumps(json_data)
+        file_path = scratch.path(f"patients_from_user_{user_id}.json", size=len(payload.encode("utf-8")))
         with open(file_path, "w") as json_file:
-            json.dump(json_data, json_file)
+            json_file.write(payload)
 
         rag_json = RAGSystem_JSON(file_path=file_path)
         answer = await rag_json.handle_question(question)
 
-        remove_local_file(file_path)
         return {"response": answer, "message": "Question answered successfully"}
     except Exception as e:
-        if os.path.exists(file_path):
-            remove_local_file(file_path)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,10 +1,38 @@
-import tempfile, os, logging
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from celery.result import AsyncResult
+import tempfile, os, uuid, logging, asyncio
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Header
+from fastapi.responses import StreamingResponse
+from celery.result import AsyncResult, GroupResult
+from minio.error import S3Error
 from typing import Optional, List
-from ....models.request_enum import AudioExtension, FileExtension, AudioUploadResponse
-from ....worker import process_audio_task
-from ....utils.storage_helpers import upload_file, check_file_exists
+from ....models.request_enum import (
+    AudioExtension,
+    FileExtension,
+    AudioUploadResponse,
+    BatchUploadResponse,
+    BatchUploadFailure,
+    TaskPriority,
+    TaskStatusRequest,
+)
+from ....worker import celery_app, enqueue_audio_pipelines, submit_audio_pipeline
+from ....utils.storage_helpers import (
+    upload_file_async,
+    upload_stream_async,
+    run_storage_io,
+    presign_upload,
+    register_issued_upload,
+    is_issued_upload,
+    add_upload_task,
+    is_upload_task,
+    remove_object,
+    stat_object,
+    get_object_url,
+)
+from ....utils.key_helpers import upload_object_key, new_upload_id, user_prefix, UPLOADS_FOLDER
+from ....utils.idempotency_helpers import idempotency_key, SubmissionInProgress
+from ....utils.task_result_helpers import load_task_result, get_task_statuses
+from ....llm.result_cache import get_cache_stats
+from ....utils.progress_helpers import get_progress, stream_progress, format_sse
+from ....core.minio_config import minio_config
 from ....utils.file_helpers import (
     get_file_from_user_upload,
     get_file_from_storage,
@@ -18,117 +46,279 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def stage_upload(user_id: str, file: UploadFile) -> dict:
+    """
+    Stream an uploaded file into the user's uploads prefix.
+    Returns the keyword arguments of the audio pipeline that processes it.
+    """
+    # Create a storage path of its own under the user's uploads prefix
+    storage_path = upload_object_key(user_id, file.filename, new_upload_id())
+    
+    logger.info(f"Uploading file to storage path: {storage_path}")
+    
+    # Stream the upload into the bucket in fixed-size parts; the upload
+    # response confirms the write, so no separate existence check is needed
+    upload = await upload_stream_async(file.file, storage_path, file.content_type)
+    logger.info(f"File uploaded successfully to: {upload['url']}")
+    
+    file_metadata = {
+        "filename": file.filename,
+        "content_type": file.content_type,
+        "size": upload["size"],
+        "sha256": upload["sha256"],
+        "storage_path": storage_path
+    }
+    
+    return {
+        "file_id": storage_path,  # Pass the exact storage path as file_id
+        "file_extension": os.path.splitext(file.filename)[1][1:],
+        "user_id": user_id,
+        "file_name": file.filename,
+        "file_path": upload["url"],  # Pass the URL/path in storage
+        "file_metadata": file_metadata
+    }
+
+async def start_pipeline(**kwargs):
+    """
+    Submit a pipeline without blocking the event loop (the idempotency claim
+    and the broker publish are blocking Redis calls).
+    Returns the AsyncResult to track and whether it was deduplicated.
+    """
+    try:
+        return await run_storage_io(submit_audio_pipeline, **kwargs)
+    except SubmissionInProgress as e:
+        raise HTTPException(status_code=409, detail=f"{str(e)}; retry the request")
+
+async def track_upload_task(object_key: str, task_id: str) -> None:
+    try:
+        await run_storage_io(add_upload_task, object_key, task_id)
+    except Exception as e:
+        logger.warning(f"Could not record task {task_id} of upload {object_key}: {e}")
+
+async def is_tracked_upload_task(object_key: str, task_id: str) -> bool:
+    """Whether task_id processes object_key; unknown (Redis down) counts as yes, so the object is kept."""
+    try:
+        return await run_storage_io(is_upload_task, object_key, task_id)
+    except Exception as e:
+        logger.warning(f"Could not check the tasks of upload {object_key}: {e}")
+        return True
+
+async def discard_staged_upload(object_key: str) -> None:
+    """Delete an upload that no pipeline will process (best effort)."""
+    try:
+        await run_storage_io(remove_object, object_key)
+        logger.info(f"Removed staged upload {object_key} of a deduplicated submission")
+    except Exception as e:
+        logger.warning(f"Could not remove staged upload {object_key}: {e}")
+
+def storage_error_detail(error: Exception) -> str:
+    error_message = str(error)
+    if "S3 operation failed" in error_message or "NoSuchKey" in error_message:
+        return f"Storage error: {error_message}"
+    return f"Processing error: {error_message}"
+
 @router.post("/process_upload_audio/{user_id}", response_model=AudioUploadResponse)
-async def process_upload_audio(user_id: str, file: UploadFile = File(...)):
-    """Handle file upload and process the audio file."""
-    temp_path = None
+async def process_upload_audio(
+    user_id: str,
+    file: UploadFile = File(...),
+    bypass_cache: bool = False,
+    priority: TaskPriority = TaskPriority.interactive,
+    client_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Handle file upload and process the audio file.
+    Re-submitting the same recording (or Idempotency-Key) while it is still
+    being processed returns the existing task instead of starting another.
+    """
     try:
-        # Read file content and get metadata before passing to Celery
-        content = await file.read()
-        file_metadata = {
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "size": len(content)
-        }
-        
-        # Create temporary file
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(content)
-        
-        # Create storage path - use the original filename for storage simplicity
-        storage_path = f"{file.filename}"
-        
-        logger.info(f"Uploading file to storage path: {storage_path}")
-        
-        # Upload file to bucket with original name
-        uploaded_url = upload_file(temp_path, storage_path)
-        logger.info(f"File uploaded successfully to: {uploaded_url}")
-        
-        # Verify the file exists in storage before proceeding
-        if not await check_file_exists(storage_path):
-            raise Exception(f"File verification failed. The file {storage_path} was not found after upload.")
-        
-        # Start Celery task with the uploaded file information
-        task = process_audio_task.delay(
-            file_id=storage_path,  # Pass the exact storage path as file_id
-            file_extension=os.path.splitext(file.filename)[1][1:],
-            user_id=user_id,
-            file_name=file.filename,
-            file_path=uploaded_url,  # Pass the URL/path in storage
-            file_metadata=file_metadata
+        task_kwargs = await stage_upload(user_id, file)
+        key = idempotency_key(
+            user_id, client_key, sha256=task_kwargs["file_metadata"]["sha256"], bypass_cache=bypass_cache
         )
-        logger.info(f"Started processing task with ID: {task.id}")
-        
-        # Clean up the temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+        # Start the staged pipeline with the uploaded file information
+        task, deduplicated = await start_pipeline(
+            idempotency_key=key, **task_kwargs, bypass_cache=bypass_cache, priority=priority
+        )
+        if deduplicated:
+            # The running task has its own staged copy; this one would be left behind
+            await discard_staged_upload(task_kwargs["file_id"])
+        logger.info(f"{'Reusing' if deduplicated else 'Started'} processing task with ID: {task.id}")
         
         return AudioUploadResponse(
-            message="Audio file uploaded and processing started",
+            message="Audio file is already being processed" if deduplicated
+            else "Audio file uploaded and processing started",
             task_id=str(task.id),
-            filename=file.filename
+            filename=file.filename,
+            deduplicated=deduplicated
         )
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the detailed error
         logger.error(f"Error processing audio upload: {str(e)}")
-        
-        # Cleanup temp file if exists
-        if temp_path and os.path.exists(temp_path):
-            try:
-                remove_local_file(temp_path)
-            except Exception as cleanup_error:
-                logger.error(f"Failed to clean up temporary file: {str(cleanup_error)}")
-        
-        # Check for S3-specific errors
-        error_message = str(e)
-        if "S3 operation failed" in error_message or "NoSuchKey" in error_message:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Storage error: {error_message}"
-            )
-        
-        raise HTTPException(status_code=500, detail=f"Processing error: {error_message}")
+        raise HTTPException(status_code=500, detail=storage_error_detail(e))
+
+@router.post("/process_upload_audios/{user_id}", response_model=BatchUploadResponse)
+async def process_upload_audios(
+    user_id: str,
+    files: List[UploadFile] = File(...),
+    bypass_cache: bool = False,
+    priority: TaskPriority = TaskPriority.bulk,
+):
+    """
+    Upload several recordings at once and process them as one Celery group.
+    Uploads run concurrently; files that fail to upload are reported and skipped.
+    Batches default to bulk priority so they do not delay single recordings,
+    and wait in the user's fair-share queue so they do not crowd out other users.
+    """
+    results = await asyncio.gather(*(stage_upload(user_id, file) for file in files), return_exceptions=True)
+
+    staged, failed = [], []
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error uploading {file.filename} in batch: {str(result)}")
+            failed.append(BatchUploadFailure(filename=file.filename, error=storage_error_detail(result)))
+        else:
+            staged.append(result)
+
+    if not staged:
+        raise HTTPException(status_code=500, detail=[failure.model_dump() for failure in failed])
+
+    try:
+        # Queue the whole batch in one Redis round trip, off the event loop
+        results = await run_storage_io(
+            enqueue_audio_pipelines,
+            [{**task_kwargs, "bypass_cache": bypass_cache, "priority": priority} for task_kwargs in staged]
+        )
+        # Save the group so its progress can be looked up by id later
+        group_result = GroupResult(str(uuid.uuid4()), results, app=celery_app)
+        await run_storage_io(group_result.save)
+    except Exception as e:
+        logger.error(f"Error starting batch processing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+
+    logger.info(f"Started batch {group_result.id} with {len(staged)} tasks")
+
+    return BatchUploadResponse(
+        message=f"{len(staged)} audio files uploaded and processing started",
+        group_id=str(group_result.id),
+        task_ids=[str(result.id) for result in group_result.results],
+        filenames=[task_kwargs["file_name"] for task_kwargs in staged],
+        failed=failed
+    )
 
 @router.post("/upload_audio/{user_id}")
 async def upload_audio(user_id: str, file: UploadFile = File(...)):
     """Upload an audio file to storage without processing it."""
-    temp_path = None
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Create temporary file
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(content)
+        # Store under a path of its own in the user's uploads prefix
+        storage_path = upload_object_key(user_id, file.filename, new_upload_id())
         
-        # Use original filename for storage
-        storage_path = f"{file.filename}"
-        
-        # Upload file to bucket
-        uploaded_url = upload_file(temp_path, storage_path)
-        logger.info(f"File uploaded successfully to: {uploaded_url}")
-        
-        # Clean up the temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        # Stream the upload into the bucket
+        upload = await upload_stream_async(file.file, storage_path, file.content_type)
+        logger.info(f"File uploaded successfully to: {upload['url']}")
             
         return {
             "message": "Audio file uploaded successfully",
             "filename": file.filename,
             "storage_path": storage_path,
-            "url": uploaded_url
+            "url": upload["url"],
+            "size": upload["size"],
+            "sha256": upload["sha256"]
         }
     except Exception as e:
-        # Cleanup temp file if exists
-        if temp_path and os.path.exists(temp_path):
-            try:
-                remove_local_file(temp_path)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/presigned_upload/{user_id}")
+async def presigned_upload(user_id: str, file_name: str):
+    """
+    Get a presigned URL to PUT an audio file directly into storage.
+    Once the upload is done, call /complete_upload/{user_id} with the returned object_key.
+    """
+    extension = os.path.splitext(file_name)[1][1:].lower()
+    if extension not in {ext.value for ext in AudioExtension}:
+        raise HTTPException(status_code=400, detail=f"Unsupported audio extension: {extension or file_name}")
+
+    object_key = upload_object_key(user_id, file_name, new_upload_id())
+    try:
+        upload_url = await run_storage_io(presign_upload, object_key)
+        await run_storage_io(register_issued_upload, object_key, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "upload_url": upload_url,
+        "method": "PUT",
+        "object_key": object_key,
+        "expires_in": minio_config["presign_expiry"],
+    }
+
+@router.post("/complete_upload/{user_id}", response_model=AudioUploadResponse)
+async def complete_upload(
+    user_id: str,
+    object_key: str,
+    bypass_cache: bool = False,
+    priority: TaskPriority = TaskPriority.interactive,
+    client_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """Verify a direct upload and start processing it (deduplicated like /process_upload_audio)."""
+    # Only keys issued to this user by /presigned_upload can be completed
+    file_name = os.path.basename(object_key)
+    if not file_name or not object_key.startswith(user_prefix(user_id, UPLOADS_FOLDER)):
+        raise HTTPException(status_code=403, detail="Object key is outside the user's upload prefix")
+    try:
+        issued = await run_storage_io(is_issued_upload, object_key, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Storage error: {str(e)}")
+    if not issued:
+        raise HTTPException(status_code=403, detail="Object key was not issued by /presigned_upload")
+
+    try:
+        stat = await run_storage_io(stat_object, object_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Storage error: {str(e)}")
+    if stat is None:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {object_key}")
+
+    file_metadata = {
+        "filename": file_name,
+        "content_type": stat.content_type,
+        "size": stat.size,
+        "etag": stat.etag,
+        "storage_path": object_key
+    }
+
+    key = idempotency_key(user_id, client_key, object_key=object_key, etag=stat.etag, bypass_cache=bypass_cache)
+    # Tie the task id to the object before submitting, so a deduplicated
+    # completion can tell whether the running task reads this very object
+    task_id = str(uuid.uuid4())
+    await track_upload_task(object_key, task_id)
+    task, deduplicated = await start_pipeline(
+        idempotency_key=key,
+        task_id=task_id,
+        file_id=object_key,
+        file_extension=os.path.splitext(file_name)[1][1:],
+        user_id=user_id,
+        file_name=file_name,
+        file_path=get_object_url(object_key),
+        file_metadata=file_metadata,
+        bypass_cache=bypass_cache,
+        priority=priority
+    )
+    if deduplicated and not await is_tracked_upload_task(object_key, task.id):
+        # Completed under the Idempotency-Key of another upload: nothing will read this one
+        await discard_staged_upload(object_key)
+    logger.info(f"Direct upload {object_key} completed, processing task ID: {task.id}")
+
+    return AudioUploadResponse(
+        message="Audio file is already being processed" if deduplicated
+        else "Audio file upload completed and processing started",
+        task_id=str(task.id),
+        filename=file_name,
+        deduplicated=deduplicated
+    )
+
 @router.post("/process_transcript")
 async def process_transcript(
     transcript: List[str],
@@ -150,11 +340,8 @@ async def process_transcript(
             raise ValueError("Either user_id and file_name or file_id must be provided")
 
         transcript_text = "\n".join(transcript)
-        transcript_file_path = generate_output_filename(transcript, file_info["file_id"], file_info["file_name"])
-
-        upload_file(transcript_file_path, transcript_file_path)
-        remove_local_file(file_info["audio_file_path"])
-        remove_local_file(transcript_file_path)
+        # generate_output_filename uploads the transcript itself
+        await run_storage_io(generate_output_filename, transcript, file_info["file_id"], file_info["file_name"])
 
         return {"transcript": transcript_text, "file_id": file_info["file_id"]}
     except Exception as e:
@@ -166,17 +353,125 @@ async def process_audio_v2(
     file_id: Optional[str] = None,
     file_extension: Optional[AudioExtension] = AudioExtension.m4a,
     file_name: Optional[str] = None,
+    bypass_cache: bool = False,
+    priority: TaskPriority = TaskPriority.interactive,
+    client_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    """Process an audio file asynchronously."""
-    task = process_audio_task.delay(file_id, file_extension, user_id, file_name)
+    """Process an audio file asynchronously; a repeated request reuses the task in progress."""
+    key = idempotency_key(
+        user_id, client_key, file_id=file_id, file_extension=getattr(file_extension, "value", file_extension),
+        file_name=file_name, bypass_cache=bypass_cache
+    )
+    task, deduplicated = await start_pipeline(
+        idempotency_key=key, file_id=file_id, file_extension=file_extension, user_id=user_id, file_name=file_name,
+        bypass_cache=bypass_cache, priority=priority
+    )
     return {
-        "message": "Audio processing started in the background",
+        "message": "Audio is already being processed" if deduplicated else "Audio processing started in the background",
         "task_id": task.id,
+        "deduplicated": deduplicated,
     }
 
+@router.get("/result_cache/stats")
+async def result_cache_stats():
+    """Get the hit/miss counters of the transcription result cache."""
+    stats = await run_storage_io(get_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+@router.get("/get_audio_batch/{group_id}")
+async def get_audio_batch_status(group_id: str):
+    """Get the aggregated progress of a batch started by /process_upload_audios."""
+    group_result = GroupResult.restore(group_id, app=celery_app)
+    if group_result is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {group_id}")
+
+    tasks, counts = [], {}
+    for task_result in group_result.results:
+        state = task_result.state
+        error = None
+        # Pipeline failures are reported in the result of the last stage
+        if state == "SUCCESS" and isinstance(task_result.result, dict) and "error" in task_result.result:
+            state, error = "FAILURE", task_result.result["error"]
+        elif state == "FAILURE":
+            error = str(task_result.result)
+
+        counts[state] = counts.get(state, 0) + 1
+        tasks.append({"task_id": task_result.id, "status": state, "error": error})
+
+    total = len(tasks)
+    finished = counts.get("SUCCESS", 0) + counts.get("FAILURE", 0) + counts.get("REVOKED", 0)
+    return {
+        "group_id": group_id,
+        "total": total,
+        "completed": finished,
+        "succeeded": counts.get("SUCCESS", 0),
+        "failed": counts.get("FAILURE", 0),
+        "counts": counts,
+        "progress": round(finished / total, 4) if total else 1.0,
+        "ready": finished == total,
+        "tasks": tasks,
+    }
+
+@router.post("/tasks/status")
+async def get_audio_task_statuses(request: TaskStatusRequest):
+    """
+    Poll many tasks at once: one Redis MGET for all of them.
+
+    Returns a map of task id to its state, plus the latest progress event of
+    unfinished tasks and file_id / transcript_url or error of finished ones.
+    Fetch an output with GET /get_audio_task/{task_id}.
+    """
+    try:
+        return {"tasks": await get_task_statuses(request.task_ids)}
+    except Exception as e:
+        logger.error(f"Error reading task statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Task status error: {str(e)}")
+
+@router.get("/get_audio_task/{task_id}/events")
+async def stream_audio_task_events(task_id: str, request: Request):
+    """
+    Stream the progress of an audio processing task as Server-Sent Events
+    (queued, uploaded, transcribing, extracting, then saved or failed).
+    The stream starts with the latest event and ends after saved or failed.
+    """
+    try:
+        latest = await run_storage_io(get_progress, task_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Progress events unavailable: {str(e)}")
+
+    if latest is None:
+        # Tasks without progress events (queued before they existed, or expired)
+        task_result = AsyncResult(task_id, app=celery_app)
+        if task_result.ready():
+            result = task_result.result
+            if task_result.state == "SUCCESS" and not (isinstance(result, dict) and "error" in result):
+                event = {"task_id": task_id, "event": "saved", "file_id": result.get("file_id"),
+                         "transcript_url": result.get("transcript_url")}
+            else:
+                error = result.get("error") if isinstance(result, dict) else str(result)
+                event = {"task_id": task_id, "event": "failed", "error": error}
+
+            async def finished_stream():
+                yield format_sse(event)
+            return StreamingResponse(finished_stream(), media_type="text/event-stream")
+
+    return StreamingResponse(
+        stream_progress(task_id, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/get_audio_task/{task_id}")
-async def get_audio_processing_result(task_id: str):
-    """Get the result of an audio processing task."""
+async def get_audio_processing_result(task_id: str, include_result: bool = False):
+    """
+    Get the result of an audio processing task.
+
+    Large outputs are kept in the bucket rather than the result backend; they
+    are only fetched with include_result=true. Otherwise llama3_json_output is
+    null and result_size / result_summary describe the output.
+    """
     task_result = AsyncResult(task_id)
     if (task_result.ready()):
         result = task_result.get()
@@ -195,9 +490,28 @@ async def get_audio_processing_result(task_id: str):
                 "error_type": "storage_error" if "S3 operation" in error_msg else "processing_error"
             }
         
-        return {
+        if "result_object" not in result:
+            return {
+                "status": task_result.state,
+                "file_id": result["file_id"],
+                "llama3_json_output": result["llama3_json_output"],
+            }
+
+        response = {
             "status": task_result.state,
             "file_id": result["file_id"],
-            "llama3_json_output": result["llama3_json_output"],
+            "llama3_json_output": None,
+            "transcript_url": result.get("transcript_url"),
+            "result_offloaded": True,
+            "result_size": result["result_size"],
+            "result_summary": result["result_summary"],
         }
+        if include_result:
+            try:
+                response["llama3_json_output"] = (await run_storage_io(load_task_result, result))["llama3_json_output"]
+            except S3Error as e:
+                if e.code == "NoSuchKey":
+                    raise HTTPException(status_code=410, detail=f"Result of task {task_id} has expired")
+                raise HTTPException(status_code=500, detail=f"Storage error: {str(e)}")
+        return response
     return {"status": task_result.state}
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 import yaml
+import tempfile
 from typing import Dict, Any, Optional
 import logging
 from pydantic import BaseModel
@@ -19,6 +20,73 @@ class MinioConfig(BaseModel):
     secret_key: str = "minioadmin"
     secure: bool = False
     bucket_name: str = "medvoice-storage"
+    fetch_concurrency: int = 8
+    io_workers: int = 16
+    region: str = "us-east-1"
+    presign_expiry: int = 3600
+    pool_maxsize: int = 32
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    http_retries: int = 1
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+class StorageConfig(BaseModel):
+    backend: str = "minio"
+    local_root: str = "storage"
+
+class ScratchConfig(BaseModel):
+    root: str = os.path.join(tempfile.gettempdir(), "medvoice-scratch")
+    spool_max_size: int = 8 * 1024 * 1024
+    disk_quota: int = 2 * 1024 * 1024 * 1024
+    stale_after: int = 6 * 60 * 60
+
+class PipelineConfig(BaseModel):
+    # Soft time limits in seconds of each audio pipeline stage
+    ingest_time_limit: int = 300
+    transcribe_time_limit: int = 1800
+    extract_time_limit: int = 600
+    persist_time_limit: int = 300
+    # Pipeline coroutines a worker process runs concurrently on its event loop
+    max_concurrent: int = 32
+    # Seconds a submission's idempotency key stays claimed at most (released when its task finishes)
+    idempotency_ttl: int = 6 * 60 * 60
+    # Results larger than this (bytes of JSON) are stored in the bucket, not in Redis
+    result_inline_max_bytes: int = 16 * 1024
+    # Seconds task results are kept in the Celery backend, and days offloaded results are kept
+    result_expires: int = 24 * 60 * 60
+    result_retention_days: int = 7
+    # Automatic retries of a stage after a transient failure: exponential
+    # backoff starting at retry_backoff seconds, capped at retry_backoff_max
+    stage_max_retries: int = 3
+    retry_backoff: int = 10
+    retry_backoff_max: int = 600
+
+class RateLimitConfig(BaseModel):
+    # Replicate calls per minute and burst size per model, shared by all workers
+    enabled: bool = True
+    whisper_per_minute: int = 30
+    whisper_burst: int = 5
+    llama_per_minute: int = 60
+    llama_burst: int = 10
+    # Seconds a call waits for a token before it fails
+    max_wait: int = 600
+
+class FairShareConfig(BaseModel):
+    # Pipelines wait in per-user queues and are started round robin across users
+    enabled: bool = True
+    # Pipelines running at once over all users, and per user while others are waiting
+    max_inflight: int = 32
+    per_user_max_inflight: int = 4
+    # Seconds a started pipeline holds its slot at most (frees slots of lost workers)
+    lease: int = 2 * 60 * 60
+
+class RedisConfig(BaseModel):
+    url: str = "redis://localhost:6379"
+    # Seconds a command or connection attempt may take before it fails, so an
+    # unreachable Redis cannot stall the callers that fail open
+    socket_timeout: float = 5
+    socket_connect_timeout: float = 2
 
 class OllamaConfig(BaseModel):
     base_url: str = "http://host.docker.internal:11434"
@@ -26,6 +94,8 @@ class OllamaConfig(BaseModel):
 class TokensConfig(BaseModel):
     replicate: str = ""
     huggingface: str = ""
+    # Required in the X-Admin-Token header of /admin endpoints (disabled when empty)
+    admin: str = ""
 
 class NgrokConfig(BaseModel):
     auth_token: str = ""
@@ -37,6 +107,12 @@ class AppSettings(BaseModel):
     app: AppConfig
     minio: MinioConfig
     ollama: OllamaConfig
+    storage: StorageConfig = StorageConfig()
+    scratch: ScratchConfig = ScratchConfig()
+    pipeline: PipelineConfig = PipelineConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    fair_share: FairShareConfig = FairShareConfig()
+    redis: RedisConfig = RedisConfig()
     tokens: TokensConfig = TokensConfig()
     ngrok: NgrokConfig = NgrokConfig()
 
@@ -93,7 +169,8 @@ class ConfigLoader:
         """Load API tokens exclusively from environment variables."""
         return {
             "replicate": os.getenv("REPLICATE_API_TOKEN", ""),
-            "huggingface": os.getenv("HF_ACCESS_TOKEN", "")
+            "huggingface": os.getenv("HF_ACCESS_TOKEN", ""),
+            "admin": os.getenv("ADMIN_TOKEN", "")
         }
     
     def _load_ngrok_from_env(self) -> Dict[str, str]:
@@ -128,6 +205,76 @@ class ConfigLoader:
             config.setdefault("minio", {})["secure"] = os.getenv("MINIO_SECURE").lower() == "true"
         if os.getenv("MINIO_BUCKET_NAME"):
             config.setdefault("minio", {})["bucket_name"] = os.getenv("MINIO_BUCKET_NAME")
+        if os.getenv("MINIO_FETCH_CONCURRENCY"):
+            config.setdefault("minio", {})["fetch_concurrency"] = int(os.getenv("MINIO_FETCH_CONCURRENCY"))
+        if os.getenv("MINIO_IO_WORKERS"):
+            config.setdefault("minio", {})["io_workers"] = int(os.getenv("MINIO_IO_WORKERS"))
+        if os.getenv("MINIO_REGION"):
+            config.setdefault("minio", {})["region"] = os.getenv("MINIO_REGION")
+        if os.getenv("MINIO_PRESIGN_EXPIRY"):
+            config.setdefault("minio", {})["presign_expiry"] = int(os.getenv("MINIO_PRESIGN_EXPIRY"))
+        if os.getenv("MINIO_POOL_MAXSIZE"):
+            config.setdefault("minio", {})["pool_maxsize"] = int(os.getenv("MINIO_POOL_MAXSIZE"))
+        if os.getenv("MINIO_CONNECT_TIMEOUT"):
+            config.setdefault("minio", {})["connect_timeout"] = float(os.getenv("MINIO_CONNECT_TIMEOUT"))
+        if os.getenv("MINIO_READ_TIMEOUT"):
+            config.setdefault("minio", {})["read_timeout"] = float(os.getenv("MINIO_READ_TIMEOUT"))
+        if os.getenv("MINIO_HTTP_RETRIES"):
+            config.setdefault("minio", {})["http_retries"] = int(os.getenv("MINIO_HTTP_RETRIES"))
+        if os.getenv("MINIO_BREAKER_FAILURE_THRESHOLD"):
+            config.setdefault("minio", {})["breaker_failure_threshold"] = int(os.getenv("MINIO_BREAKER_FAILURE_THRESHOLD"))
+        if os.getenv("MINIO_BREAKER_RESET_TIMEOUT"):
+            config.setdefault("minio", {})["breaker_reset_timeout"] = float(os.getenv("MINIO_BREAKER_RESET_TIMEOUT"))
+
+        # Storage backend overrides
+        if os.getenv("STORAGE_BACKEND"):
+            config.setdefault("storage", {})["backend"] = os.getenv("STORAGE_BACKEND")
+        if os.getenv("STORAGE_LOCAL_ROOT"):
+            config.setdefault("storage", {})["local_root"] = os.getenv("STORAGE_LOCAL_ROOT")
+
+        # Scratch space overrides
+        if os.getenv("SCRATCH_ROOT"):
+            config.setdefault("scratch", {})["root"] = os.getenv("SCRATCH_ROOT")
+        if os.getenv("SCRATCH_SPOOL_MAX_SIZE"):
+            config.setdefault("scratch", {})["spool_max_size"] = int(os.getenv("SCRATCH_SPOOL_MAX_SIZE"))
+        if os.getenv("SCRATCH_DISK_QUOTA"):
+            config.setdefault("scratch", {})["disk_quota"] = int(os.getenv("SCRATCH_DISK_QUOTA"))
+
+        # Pipeline overrides
+        for stage in ("ingest", "transcribe", "extract", "persist"):
+            env_name = f"PIPELINE_{stage.upper()}_TIME_LIMIT"
+            if os.getenv(env_name):
+                config.setdefault("pipeline", {})[f"{stage}_time_limit"] = int(os.getenv(env_name))
+        for setting in ("max_concurrent", "idempotency_ttl", "result_inline_max_bytes",
+                        "result_expires", "result_retention_days", "stage_max_retries",
+                        "retry_backoff", "retry_backoff_max"):
+            env_name = f"PIPELINE_{setting.upper()}"
+            if os.getenv(env_name):
+                config.setdefault("pipeline", {})[setting] = int(os.getenv(env_name))
+
+        # Replicate rate limit overrides
+        if os.getenv("RATE_LIMIT_ENABLED"):
+            config.setdefault("rate_limit", {})["enabled"] = os.getenv("RATE_LIMIT_ENABLED").lower() == "true"
+        for setting in ("whisper_per_minute", "whisper_burst", "llama_per_minute", "llama_burst", "max_wait"):
+            env_name = f"RATE_LIMIT_{setting.upper()}"
+            if os.getenv(env_name):
+                config.setdefault("rate_limit", {})[setting] = int(os.getenv(env_name))
+
+        # Fair-share scheduling overrides
+        if os.getenv("FAIR_SHARE_ENABLED"):
+            config.setdefault("fair_share", {})["enabled"] = os.getenv("FAIR_SHARE_ENABLED").lower() == "true"
+        for setting in ("max_inflight", "per_user_max_inflight", "lease"):
+            env_name = f"FAIR_SHARE_{setting.upper()}"
+            if os.getenv(env_name):
+                config.setdefault("fair_share", {})[setting] = int(os.getenv(env_name))
+
+        # Redis config overrides
+        if os.getenv("REDIS_URL"):
+            config.setdefault("redis", {})["url"] = os.getenv("REDIS_URL")
+        for setting in ("socket_timeout", "socket_connect_timeout"):
+            env_name = f"REDIS_{setting.upper()}"
+            if os.getenv(env_name):
+                config.setdefault("redis", {})[setting] = float(os.getenv(env_name))
 
         # Ollama config overrides
         if os.getenv("OLLAMA_BASE_URL"):
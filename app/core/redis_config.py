@@ -0,0 +1,26 @@
+import redis
+import redis.asyncio
+from app.core.config_loader import config
+
+# Global Redis clients (redis-py only connects on the first command)
+redis_client = None
+async_redis_client = None
+
+def _timeouts() -> dict:
+    return {
+        "socket_timeout": config.redis.socket_timeout,
+        "socket_connect_timeout": config.redis.socket_connect_timeout,
+    }
+
+def get_redis_client() -> redis.Redis:
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.Redis.from_url(config.redis.url, decode_responses=True, **_timeouts())
+    return redis_client
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Client for the API's event loop (pub/sub subscriptions of the progress stream)."""
+    global async_redis_client
+    if async_redis_client is None:
+        async_redis_client = redis.asyncio.Redis.from_url(config.redis.url, decode_responses=True, **_timeouts())
+    return async_redis_client
@@ -1,3 +1,5 @@
+import hashlib
+
 # JSON schema for medical transcription output
 MEDICAL_TRANSCRIPTION_SCHEMA = """
 {
@@ -118,4 +120,10 @@ If no patient-related information is present, use empty strings ("") for any mis
 Ensuring the use of explicit information and recognized medical terminology. 
 Follow the JSON schema strictly without making assumptions about unspecified details.
 Format your response exactly like this example, maintaining all fields.
-You must only return the JSON schema. Do not include any additional information."""
\ No newline at end of file
+You must only return the JSON schema. Do not include any additional information."""
+
+# Version of the extraction prompt (part of the result cache key): changes
+# whenever the template or the schema examples change
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT_TEMPLATE + MEDICAL_OUTPUT_EXAMPLE).encode("utf-8")
+).hexdigest()[:16]
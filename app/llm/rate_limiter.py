@@ -0,0 +1,112 @@
+import time
+import asyncio
+import logging
+import functools
+from typing import Dict
+
+from ..core.config_loader import config
+from ..core.redis_config import get_redis_client
+from ..utils.storage_helpers import run_storage_io
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY_PREFIX = "medvoice:ratelimit"
+
+# Token bucket refilled continuously at rate tokens per second up to capacity.
+# Runs atomically in Redis on Redis' own clock, so every worker shares one
+# bucket per model. Returns 0 when the tokens were taken, otherwise the
+# milliseconds until enough tokens will be available (nothing is taken).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate / 1000)
+
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = math.ceil((requested - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when a call waited longer than rate_limit.max_wait for a token."""
+
+class TokenBucket:
+    """Distributed token bucket for one Replicate model."""
+
+    def __init__(self, name: str, per_minute: int, burst: int):
+        self.name = name
+        self.key = f"{RATE_LIMIT_KEY_PREFIX}:{name}"
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._script = None
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take tokens if available; returns 0 or the seconds to wait before retrying."""
+        if self._script is None:
+            self._script = get_redis_client().register_script(TOKEN_BUCKET_SCRIPT)
+        wait_ms = self._script(keys=[self.key], args=[self.rate, self.capacity, tokens])
+        return int(wait_ms) / 1000.0
+
+    async def acquire(self, tokens: int = 1, max_wait: float = None) -> float:
+        """
+        Wait until the bucket grants the tokens; returns the seconds waited.
+        Fails open (no limiting) when Redis is unavailable, so a Redis outage
+        never fails a task on its own. The script runs off the event loop, and
+        Redis timeouts (redis.socket_timeout) bound how long a check can take.
+        """
+        max_wait = config.rate_limit.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        while True:
+            try:
+                wait = await run_storage_io(self._try_acquire, tokens)
+            except Exception as e:
+                logger.warning(f"Rate limiter {self.name} unavailable, not limiting: {e}")
+                return time.monotonic() - started
+            if wait <= 0:
+                return time.monotonic() - started
+
+            waited = time.monotonic() - started
+            if waited + wait > max_wait:
+                raise RateLimitTimeout(
+                    f"Waited {waited:.1f}s for a {self.name} rate limit token (max {max_wait}s)"
+                )
+            await asyncio.sleep(wait)
+
+# Buckets per model, created on first use
+_buckets: Dict[str, TokenBucket] = {}
+
+def get_bucket(name: str) -> TokenBucket:
+    """Bucket of a model ("whisper" or "llama") configured by rate_limit.{name}_per_minute/_burst."""
+    if name not in _buckets:
+        _buckets[name] = TokenBucket(
+            name,
+            per_minute=getattr(config.rate_limit, f"{name}_per_minute"),
+            burst=getattr(config.rate_limit, f"{name}_burst"),
+        )
+    return _buckets[name]
+
+def rate_limited(name: str):
+    """Decorator: take a token from the model's bucket before each call of an async function."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if config.rate_limit.enabled:
+                waited = await get_bucket(name).acquire()
+                if waited >= 1:
+                    logger.info(f"Waited {waited:.1f}s for the {name} rate limit")
+            return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,254 @@
+import time
+import uuid
+import asyncio
+import logging
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from .llm_helpers import convert_prompt_for_llama3
+from .replicate_models import llama3_generate_medical_json
+from .result_cache import checkpoint_fingerprint
+from ..core.redis_config import get_redis_client
+from ..utils.catalog_helpers import lookup_object
+from ..utils.checkpoint_helpers import read_checkpoint, save_checkpoint
+from ..utils.file_helpers import generate_output_filename
+from ..utils.key_helpers import CHECKPOINTS_FOLDER, USERS_PREFIX, user_prefix
+from ..utils.storage_helpers import init_storage_client, run_storage_io
+
+logger = logging.getLogger(__name__)
+
+# Redis keys of a run, per scope (a user id or "all"): resume cursor, stats and lock.
+# The lock holds the run's token and is refreshed by a heartbeat while it runs.
+REEXTRACT_KEY_PREFIX = "medvoice:reextract"
+REEXTRACT_LOCK_TTL = 10 * 60
+REEXTRACT_HEARTBEAT = REEXTRACT_LOCK_TTL / 5
+
+# Extend or release the lock only while it still holds this run's token
+REFRESH_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+DIARIZATION_CHECKPOINT = "/diarization.json"
+
+class ReextractionRunning(RuntimeError):
+    """Raised when a re-extraction of the same scope is already running."""
+
+def reextract_scope(user_id: Optional[str] = None) -> str:
+    return user_id or "all"
+
+def _redis_key(scope: str, name: str) -> str:
+    return f"{REEXTRACT_KEY_PREFIX}:{scope}:{name}"
+
+def acquire_lock(lock_key: str, token: str) -> bool:
+    return bool(get_redis_client().set(lock_key, token, nx=True, ex=REEXTRACT_LOCK_TTL))
+
+def refresh_lock(lock_key: str, token: str) -> bool:
+    return bool(get_redis_client().eval(REFRESH_LOCK_SCRIPT, 1, lock_key, token, REEXTRACT_LOCK_TTL))
+
+def release_lock(lock_key: str, token: str) -> None:
+    get_redis_client().eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+def load_cursor(cursor_key: str, reset: bool = False) -> Optional[str]:
+    """The saved resume cursor of a run, dropped first when reset is set."""
+    redis_client = get_redis_client()
+    if reset:
+        redis_client.delete(cursor_key)
+    return redis_client.get(cursor_key)
+
+def save_progress(cursor_key: str, stats_key: str, cursor: Optional[str], stats: Dict[str, Any]) -> None:
+    """Save the resume cursor and stats in one round trip; no cursor means the run finished."""
+    pipe = get_redis_client().pipeline()
+    if cursor is None:
+        pipe.delete(cursor_key)
+        pipe.hset(stats_key, mapping={**stats, "finished": int(stats["finished"])})
+    else:
+        pipe.set(cursor_key, cursor)
+        pipe.hset(stats_key, mapping={**stats, "finished": int(stats["finished"]), "cursor": cursor})
+    pipe.execute()
+
+def checkpoint_prefixes(user_id: Optional[str] = None) -> List[str]:
+    """Prefixes holding diarization checkpoints, in key order."""
+    if user_id:
+        return [user_prefix(user_id, CHECKPOINTS_FOLDER)]
+    return [f"{CHECKPOINTS_FOLDER}/", f"{USERS_PREFIX}/"]
+
+def list_diarization_checkpoints(user_id: Optional[str], start_after: Optional[str], limit: int) -> List[str]:
+    """
+    Next diarization checkpoints after start_after, in key order.
+    Over the whole bucket every users/ object is listed, so pages can be
+    shorter than limit only at the end.
+    """
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+
+    names = []
+    for prefix in checkpoint_prefixes(user_id):
+        if start_after and start_after > prefix and not start_after.startswith(prefix):
+            # The cursor is past this prefix
+            continue
+        listing = client.list_objects(
+            bucket_name, prefix=prefix, recursive=True,
+            start_after=start_after if start_after and start_after.startswith(prefix) else None
+        )
+        matching = (
+            obj.object_name for obj in listing
+            if obj.object_name.endswith(DIARIZATION_CHECKPOINT) and f"/{CHECKPOINTS_FOLDER}/" in f"/{obj.object_name}"
+        )
+        names.extend(islice(matching, limit - len(names)))
+        if len(names) >= limit:
+            break
+    return names
+
+def get_reextraction_status(user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Progress of the current or last run of a scope."""
+    scope = reextract_scope(user_id)
+    redis_client = get_redis_client()
+    stats = redis_client.hgetall(_redis_key(scope, "stats"))
+    return {
+        "scope": scope,
+        "running": redis_client.exists(_redis_key(scope, "lock")) == 1,
+        "cursor": redis_client.get(_redis_key(scope, "cursor")),
+        "stats": stats,
+    }
+
+async def reextract_checkpoint(object_name: str, force: bool = False) -> str:
+    """
+    Re-run the extraction of one recording from its diarization checkpoint.
+    Returns "reextracted", or "skipped" if its extraction is already current.
+    """
+    document = await run_storage_io(read_checkpoint, object_name)
+    if document is None:
+        return "skipped"
+
+    user_id, file_id = document.get("user_id"), document.get("file_id")
+    metadata = document.get("metadata") or {}
+    patient_name = metadata.get("patient_name")
+    fingerprint = checkpoint_fingerprint("extraction", patient_name)
+
+    extraction_name = object_name[:-len(DIARIZATION_CHECKPOINT)] + "/extraction.json"
+    if not force:
+        current = await run_storage_io(read_checkpoint, extraction_name)
+        if current is not None and current.get("fingerprint") == fingerprint:
+            return "skipped"
+
+    prompt = convert_prompt_for_llama3(document["data"], patient_name)["prompt"]
+    extraction = await llama3_generate_medical_json(prompt)
+    if "error" in extraction:
+        raise RuntimeError(f"Extraction failed: {extraction['error']}")
+
+    await run_storage_io(
+        save_checkpoint, user_id, file_id, "extraction", fingerprint, extraction, None, metadata
+    )
+    if user_id:
+        # Refresh the output the user sees (same object key as the pipeline's)
+        file_name = metadata.get("file_name") or await output_file_name(file_id)
+        await run_storage_io(generate_output_filename, extraction, file_id, user_id, file_name)
+    return "reextracted"
+
+async def output_file_name(file_id: str) -> str:
+    """Name part of an output key for checkpoints without file_name: the cataloged patient name."""
+    try:
+        record = await run_storage_io(lookup_object, file_id, "audio")
+    except Exception as e:
+        logger.warning(f"Could not look up the catalog record of {file_id}: {e}")
+        record = None
+    return (record or {}).get("patient_name") or "transcript"
+
+async def reextract_outputs(
+    user_id: Optional[str] = None,
+    concurrency: int = 8,
+    batch_size: int = 100,
+    max_batches: Optional[int] = None,
+    force: bool = False,
+    reset: bool = False,
+) -> Dict[str, Any]:
+    """
+    Re-run the Llama extraction over stored diarization checkpoints of a user
+    (or of the whole bucket), without transcribing the audio again.
+
+    Up to `concurrency` extractions run at once (Replicate calls also pass the
+    shared llama rate limit). The cursor is saved in Redis after every batch,
+    so an interrupted run resumes there; recordings whose extraction already
+    matches the current model and prompt are skipped unless force is set.
+
+    Returns:
+        Counts of re-extracted, skipped and failed recordings, elapsed time
+        and throughput, and whether the run finished
+    """
+    scope = reextract_scope(user_id)
+    lock_key, cursor_key, stats_key = (_redis_key(scope, name) for name in ("lock", "cursor", "stats"))
+    token = uuid.uuid4().hex
+    if not await run_storage_io(acquire_lock, lock_key, token):
+        raise ReextractionRunning(f"A re-extraction of {scope} is already running")
+
+    lock_lost = asyncio.Event()
+
+    async def heartbeat() -> None:
+        # Keep the lock while items wait on the rate limiter, however long a batch takes
+        while True:
+            await asyncio.sleep(REEXTRACT_HEARTBEAT)
+            try:
+                owned = await run_storage_io(refresh_lock, lock_key, token)
+            except Exception as e:
+                logger.warning(f"Could not refresh the re-extraction lock of {scope}: {e}")
+                continue
+            if not owned:
+                lock_lost.set()
+                return
+
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"reextracted": 0, "skipped": 0, "failed": 0, "batches": 0, "finished": False}
+    started = time.monotonic()
+
+    async def handle(object_name: str) -> None:
+        async with semaphore:
+            if lock_lost.is_set():
+                return
+            try:
+                stats[await reextract_checkpoint(object_name, force)] += 1
+            except Exception as e:
+                logger.exception(f"Failed to re-extract {object_name}: {e}")
+                stats["failed"] += 1
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        cursor = await run_storage_io(load_cursor, cursor_key, reset)
+        while max_batches is None or stats["batches"] < max_batches:
+            batch = await run_storage_io(list_diarization_checkpoints, user_id, cursor, batch_size)
+            if not batch:
+                stats["finished"] = True
+                break
+
+            await asyncio.gather(*(handle(object_name) for object_name in batch))
+            if lock_lost.is_set():
+                # Another run owns the scope now; leave its cursor and stats alone
+                raise ReextractionRunning(f"Lost the re-extraction lock of {scope}")
+
+            cursor = batch[-1]
+            stats["batches"] += 1
+            elapsed = time.monotonic() - started
+            handled = stats["reextracted"] + stats["skipped"] + stats["failed"]
+            stats["elapsed"] = round(elapsed, 2)
+            stats["per_minute"] = round(handled / elapsed * 60, 2) if elapsed else 0.0
+
+            await run_storage_io(save_progress, cursor_key, stats_key, cursor, stats)
+            logger.info(f"Re-extraction batch {stats['batches']} of {scope} done up to {cursor}: {stats}")
+
+        # A finished run drops its cursor, so the next one starts over (and skips everything already current)
+        await run_storage_io(save_progress, cursor_key, stats_key, None if stats["finished"] else cursor, stats)
+    finally:
+        heartbeat_task.cancel()
+        # Only release the lock if it is still ours
+        await run_storage_io(release_lock, lock_key, token)
+
+    return stats
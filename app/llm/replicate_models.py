@@ -7,15 +7,20 @@ from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from typing import Dict, Any, List, Optional, Union
 
 from .prompt import *
+from .rate_limiter import rate_limited
 
 HF_ACCESS_TOKEN = os.getenv("HF_ACCESS_TOKEN", "")
 
+# Model versions (also part of the result cache key)
+LLAMA3_MODEL = "meta/meta-llama-3.1-405b-instruct"
+WHISPER_MODEL = "vaibhavs10/incredibly-fast-whisper:3ab86df6c8f54c11309d4d1f930ac292bad43ace52d10c80d87eb258b3c9f79c"
+
 def init_replicate() -> Replicate:
     # Initialize the Replicate instance
     llm = Replicate(
         streaming=True,
         callbacks=[StreamingStdOutCallbackHandler()],
-        model="meta/meta-llama-3.1-405b-instruct",
+        model=LLAMA3_MODEL,
         model_kwargs={
             "top_k": 0,
             "top_p": 0.9,
@@ -33,6 +38,7 @@ def init_ollama():
     llm = Ollama(model="llama3", temperature=0)
     return llm
 
+@rate_limited("llama")
 async def llama3_generate_medical_json(prompt: str) -> Dict[str, Any]:
     llm = init_replicate()
     
@@ -62,6 +68,7 @@ async def llama3_generate_medical_json(prompt: str) -> Dict[str, Any]:
         print(f"Raw output: {result}")
         return {"error": "Failed to parse JSON", "raw_output": result}
 
+@rate_limited("whisper")
 async def whisper_diarization(file_url_or_path: str):
     """
     Process audio using Whisper model.
@@ -72,46 +79,30 @@ async def whisper_diarization(file_url_or_path: str):
     Returns:
         JSON output from the whisper model
     """
-    import os
-    from ..utils.storage_helpers import download_file, extract_path_from_url
+    from ..utils.storage_helpers import extract_path_from_url
+    from ..utils.scratch_helpers import ScratchSpace
     
-    local_file_path = None
-    try:
-        # Check if this is a URL or local path
-        is_url = file_url_or_path.startswith('http://') or file_url_or_path.startswith('https://')
+    # Check if this is a URL or local path
+    is_url = file_url_or_path.startswith('http://') or file_url_or_path.startswith('https://')
+    
+    if is_url and 'minio' in file_url_or_path:
+        # This is a MinIO URL, need to download the file
+        object_name = extract_path_from_url(file_url_or_path)
+        if not object_name:
+            raise ValueError(f"Could not extract object name from URL: {file_url_or_path}")
         
-        if is_url and 'minio' in file_url_or_path:
-            # This is a MinIO URL, need to download the file
-            object_name = extract_path_from_url(file_url_or_path)
-            if not object_name:
-                raise ValueError(f"Could not extract object name from URL: {file_url_or_path}")
-                
-            # Download the file to a temporary location
-            local_file_path = f"temp_audio_{os.path.basename(object_name)}"
-            download_file(object_name, local_file_path)
+        # Spool the audio: small recordings stay in memory, larger ones spill to a
+        # private scratch directory, removed even if transcription fails
+        with ScratchSpace("whisper") as scratch:
+            buffer = await scratch.spool(object_name)
             
-            # Use local file for processing
-            with open(local_file_path, "rb") as f:
-                output = replicate.run(
-                    "vaibhavs10/incredibly-fast-whisper:3ab86df6c8f54c11309d4d1f930ac292bad43ace52d10c80d87eb258b3c9f79c",
-                    input={
-                        "task": "transcribe",
-                        "audio": f,  # Pass file object directly
-                        "hf_token": HF_ACCESS_TOKEN,
-                        "language": "None",
-                        "timestamp": "word",
-                        "batch_size": 64,
-                        "diarise_audio": True
-                    }
-                )
-        else:
-            # This is either a non-MinIO URL or a local file path
-            # Replicate can handle both public URLs and local files
-            output = replicate.run(
-                "vaibhavs10/incredibly-fast-whisper:3ab86df6c8f54c11309d4d1f930ac292bad43ace52d10c80d87eb258b3c9f79c",
+            # Spooled buffers have no usable file name, so upload with the object's
+            audio_file = await replicate.files.async_create(buffer, filename=os.path.basename(object_name))
+            output = await replicate.async_run(
+                WHISPER_MODEL,
                 input={
                     "task": "transcribe",
-                    "audio": file_url_or_path,
+                    "audio": audio_file.urls["get"],
                     "hf_token": HF_ACCESS_TOKEN,
                     "language": "None",
                     "timestamp": "word",
@@ -119,17 +110,23 @@ async def whisper_diarization(file_url_or_path: str):
                     "diarise_audio": True
                 }
             )
-            
-        return output
-    
-    finally:
-        # Clean up the temporary file if created
-        if local_file_path and os.path.exists(local_file_path):
-            try:
-                os.remove(local_file_path)
-                print(f"Removed temporary file: {local_file_path}")
-            except Exception as e:
-                print(f"Error removing temporary file {local_file_path}: {e}")
+    else:
+        # This is either a non-MinIO URL or a local file path
+        # Replicate can handle both public URLs and local files
+        output = await replicate.async_run(
+            WHISPER_MODEL,
+            input={
+                "task": "transcribe",
+                "audio": file_url_or_path,
+                "hf_token": HF_ACCESS_TOKEN,
+                "language": "None",
+                "timestamp": "word",
+                "batch_size": 64,
+                "diarise_audio": True
+            }
+        )
+        
+    return output
 
 async def llama3_generate_medical_summary(output: str) -> str:
     llm = init_replicate()
@@ -0,0 +1,123 @@
+import json
+import hashlib
+import logging
+from typing import Optional, Dict, Any
+
+from minio.error import S3Error
+
+from .prompt import PROMPT_VERSION
+from .replicate_models import WHISPER_MODEL, LLAMA3_MODEL
+from ..core.redis_config import get_redis_client
+from ..utils.catalog_helpers import lookup_object
+from ..utils.key_helpers import parse_object_key
+from ..utils.storage_helpers import (
+    run_storage_io,
+    upload_file_async,
+    fetch_json_object,
+    object_sha256,
+    extract_path_from_url,
+)
+from ..core.minio_config import minio_config
+
+# Cached pipeline results live in the bucket; only the counters live in Redis
+RESULT_CACHE_PREFIX = "cache/results"
+RESULT_CACHE_STATS_KEY = "medvoice:result_cache:stats"
+
+def result_cache_key(audio_sha256: str, patient_name: Optional[str] = None) -> str:
+    """
+    Key of a pipeline result: the audio content plus everything else that
+    changes the output (model versions, prompt version and patient name).
+    """
+    material = "|".join([audio_sha256, WHISPER_MODEL, LLAMA3_MODEL, PROMPT_VERSION, patient_name or ""])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def checkpoint_fingerprint(stage: str, patient_name: Optional[str] = None) -> str:
+    """
+    What a pipeline checkpoint depends on besides the audio (which its key
+    already identifies): the Whisper model for diarizations, and the Llama
+    model, prompt version and patient name for extractions.
+    """
+    if stage == "diarization":
+        return WHISPER_MODEL
+    return "|".join([LLAMA3_MODEL, PROMPT_VERSION, patient_name or ""])
+
+def _cache_object_name(cache_key: str) -> str:
+    return f"{RESULT_CACHE_PREFIX}/{cache_key}.json"
+
+async def count_cache_event(event: str) -> None:
+    """Increment a result cache counter (hits, misses, bypassed, stored) off the event loop."""
+    try:
+        await run_storage_io(get_redis_client().hincrby, RESULT_CACHE_STATS_KEY, event, 1)
+    except Exception as e:
+        logging.warning(f"Could not update result cache counter {event}: {e}")
+
+def get_cache_stats() -> Dict[str, int]:
+    """Get the result cache counters."""
+    stats = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0}
+    try:
+        stats.update({key: int(value) for key, value in get_redis_client().hgetall(RESULT_CACHE_STATS_KEY).items()})
+    except Exception as e:
+        logging.warning(f"Could not read result cache counters: {e}")
+    return stats
+
+def _read_cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    try:
+        return fetch_json_object(_cache_object_name(cache_key), max_retries=1)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return None
+        raise
+
+async def resolve_audio_sha256(file_url: str) -> Optional[str]:
+    """
+    Get the content hash of an audio file stored in the bucket.
+
+    Uses the sha256 recorded in the catalog at upload time when there is one,
+    and otherwise streams the object to hash it. Returns None for audio that
+    is not in our bucket.
+    """
+    if minio_config['endpoint'] not in file_url:
+        return None
+
+    object_name = extract_path_from_url(file_url)
+    if not object_name:
+        return None
+
+    key_info = parse_object_key(object_name)
+    if key_info is not None:
+        record = await run_storage_io(lookup_object, key_info["file_id"], key_info["kind"])
+        if record and record.get("sha256"):
+            return record["sha256"]
+
+    return await run_storage_io(object_sha256, object_name)
+
+async def get_cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Get a cached pipeline result; a storage error counts as a miss."""
+    try:
+        cached = await run_storage_io(_read_cached_result, cache_key)
+    except Exception as e:
+        logging.warning(f"Result cache read failed for {cache_key}: {e}")
+        cached = None
+
+    await count_cache_event("hits" if cached is not None else "misses")
+    return cached
+
+async def store_cached_result(cache_key: str, diarization: Any, extraction: Dict[str, Any]) -> None:
+    """Store a pipeline result. Failed extractions are not cached."""
+    if isinstance(extraction, dict) and "error" in extraction:
+        return
+
+    payload = json.dumps({
+        "cache_key": cache_key,
+        "whisper_model": WHISPER_MODEL,
+        "llama3_model": LLAMA3_MODEL,
+        "prompt_version": PROMPT_VERSION,
+        "diarization": diarization,
+        "extraction": extraction,
+    }).encode("utf-8")
+
+    try:
+        await upload_file_async(None, _cache_object_name(cache_key), data=payload, compress=True)
+        await count_cache_event("stored")
+    except Exception as e:
+        logging.warning(f"Result cache write failed for {cache_key}: {e}")
@@ -15,6 +15,7 @@ from .core.app_config import ON_LOCALHOST
 from .models.request_enum import *
 from .worker import *
 from .db.init_db import initialize_all_databases
+from .utils.scratch_helpers import purge_stale_scratch
 from .api.v1.api import api_router
 
 # Import the configuration at the top level to ensure it's loaded early
@@ -27,6 +28,7 @@ running_in_docker = os.getenv('RUNNING_IN_DOCKER', 'false').lower() == 'true'
 async def lifespan(app: FastAPI):
     # Code to run on startup
     print("Starting up...")
+    purge_stale_scratch()
     if ON_LOCALHOST or not running_in_docker:
         # Only initialize database when in local development
         print("Running in local mode - skipping database initialization")
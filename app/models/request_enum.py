@@ -1,5 +1,6 @@
 from enum import Enum
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
 
 ### Enum models ###
 class FileExtension(str, Enum):
@@ -15,6 +16,10 @@ class AudioExtension(str, Enum):
     wav = "wav"
     m4a = "m4a"
 
+class TaskPriority(str, Enum):
+    interactive = "interactive"
+    bulk = "bulk"
+
 ### Base models ###
 class Question(BaseModel):
     question: str
@@ -23,4 +28,21 @@ class Question(BaseModel):
 class AudioUploadResponse(BaseModel):
     message: str
     task_id: str
-    filename: str
\ No newline at end of file
+    filename: str
+    # True when the task_id belongs to an identical submission already in progress
+    deduplicated: bool = False
+
+class BatchUploadFailure(BaseModel):
+    filename: str
+    error: str
+
+class BatchUploadResponse(BaseModel):
+    message: str
+    group_id: str
+    task_ids: List[str]
+    filenames: List[str]
+    failed: List[BatchUploadFailure] = []
+
+class TaskStatusRequest(BaseModel):
+    # Polled together in one Redis round trip
+    task_ids: List[str] = Field(..., min_length=1, max_length=500)
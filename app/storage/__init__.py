@@ -0,0 +1,74 @@
+import os
+
+import certifi
+import urllib3
+
+from app.core.config_loader import config
+
+from .base import StorageBackend
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .minio_backend import MinioBackend
+from .local_backend import LocalBackend
+
+# Global storage backend, created on first use
+storage_backend = None
+
+def create_minio_http_client() -> urllib3.PoolManager:
+    """
+    Connection pool shared by all MinIO requests.
+
+    maxsize bounds the connections per host and block=True makes extra callers
+    wait for a free connection instead of opening unbounded new ones. Keep it
+    at least minio.io_workers so the storage thread pool never waits on it.
+    Timeouts are explicit and urllib3 only retries once: the storage helpers
+    already retry with backoff, and stacking both multiplies the delay.
+    """
+    return urllib3.PoolManager(
+        maxsize=config.minio.pool_maxsize,
+        block=True,
+        timeout=urllib3.Timeout(connect=config.minio.connect_timeout, read=config.minio.read_timeout),
+        retries=urllib3.Retry(
+            total=config.minio.http_retries,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    )
+
+def create_storage_backend(backend: str = None) -> StorageBackend:
+    """Create the storage backend selected by storage.backend ("minio" or "local")."""
+    backend = backend or config.storage.backend
+    if backend == "minio":
+        return MinioBackend(
+            config.minio.endpoint,
+            access_key=config.minio.access_key,
+            secret_key=config.minio.secret_key,
+            secure=config.minio.secure,
+            region=config.minio.region,
+            http_client=create_minio_http_client(),
+            breaker=CircuitBreaker(
+                "minio",
+                failure_threshold=config.minio.breaker_failure_threshold,
+                reset_timeout=config.minio.breaker_reset_timeout
+            )
+        )
+    if backend == "local":
+        return LocalBackend(config.storage.local_root)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def get_storage_backend() -> StorageBackend:
+    global storage_backend
+    if storage_backend is None:
+        storage_backend = create_storage_backend()
+    return storage_backend
+
+__all__ = [
+    "StorageBackend",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "MinioBackend",
+    "LocalBackend",
+    "create_storage_backend",
+    "get_storage_backend",
+]
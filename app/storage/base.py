@@ -0,0 +1,100 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+from minio.commonconfig import CopySource
+
+
+class StorageBackend(ABC):
+    """
+    Object storage interface used by the storage helpers.
+
+    The method names and signatures follow the subset of the minio-py client
+    API the application uses, and results are minio-py datatypes (Object,
+    ObjectWriteResult, Bucket), so every backend can stand in for the MinIO
+    client without changes to the callers.
+    """
+
+    @abstractmethod
+    def bucket_exists(self, bucket_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def make_bucket(self, bucket_name: str, *args, **kwargs) -> None:
+        ...
+
+    @abstractmethod
+    def list_buckets(self) -> List[Any]:
+        ...
+
+    @abstractmethod
+    def set_bucket_policy(self, bucket_name: str, policy: Any) -> None:
+        ...
+
+    @abstractmethod
+    def put_object(self, bucket_name: str, object_name: str, data: BinaryIO, length: int, *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def fput_object(self, bucket_name: str, object_name: str, file_path: str, *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def get_object(self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0, *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def fget_object(self, bucket_name: str, object_name: str, file_path: str, *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def stat_object(self, bucket_name: str, object_name: str, *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def copy_object(self, bucket_name: str, object_name: str, source: CopySource, *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    def remove_object(self, bucket_name: str, object_name: str, *args, **kwargs) -> None:
+        ...
+
+    @abstractmethod
+    def list_objects(self, bucket_name: str, prefix: Optional[str] = None, recursive: bool = False,
+                     start_after: Optional[str] = None, *args, **kwargs) -> Iterator[Any]:
+        ...
+
+    def metrics(self) -> Dict[str, Any]:
+        """Backend-specific metrics (connection pools, circuit breaker)."""
+        return {}
+
+    def set_prefix_expiry(self, bucket_name: str, prefix: str, days: int) -> bool:
+        """
+        Expire objects under prefix after the given number of days.
+        Returns False if the backend cannot expire objects by itself.
+        """
+        return False
+
+    def ensure_bucket(self, bucket_name: str) -> None:
+        """Create the bucket if it does not exist and allow public reads on it."""
+        if self.bucket_exists(bucket_name):
+            return
+
+        self.make_bucket(bucket_name)
+        # Set bucket policy for public access if required
+        try:
+            policy = {
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Effect": "Allow",
+                        "Principal": {"AWS": "*"},
+                        "Action": ["s3:GetObject"],
+                        "Resource": [f"arn:aws:s3:::{bucket_name}/*"]
+                    }
+                ]
+            }
+            self.set_bucket_policy(bucket_name, policy)
+            logging.info(f"Bucket {bucket_name} created and configured for public access")
+        except Exception as e:
+            logging.warning(f"Could not set public access policy: {e}")
@@ -0,0 +1,255 @@
+import os
+import mmap
+import shutil
+import tempfile
+import mimetypes
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, List, Optional
+
+from minio.commonconfig import CopySource
+from minio.datatypes import Bucket, Object
+from minio.error import S3Error
+from minio.helpers import ObjectWriteResult
+
+from .base import StorageBackend
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Temporary files are written next to the buckets (same filesystem) and
+# renamed into place, so readers never see a partially written object
+TMP_DIR_NAME = ".tmp"
+
+
+class MappedObjectResponse:
+    """
+    Response of LocalBackend.get_object.
+
+    Reads are served from a memory map of the file, so the object is paged in
+    by the kernel instead of being copied into Python buffers up front. It
+    mirrors the parts of urllib3's response the storage helpers use.
+    """
+
+    def __init__(self, path: str, offset: int = 0, length: int = 0):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        end = size if not length else min(size, offset + length)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map)[offset:end] if self._map is not None else memoryview(b"")
+        self._position = 0
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        end = len(self._view) if amt is None else min(len(self._view), self._position + amt)
+        chunk = self._view[self._position:end].tobytes()
+        self._position = end
+        return chunk
+
+    def stream(self, amt: int = 64 * 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def release_conn(self) -> None:
+        pass
+
+
+class LocalBackend(StorageBackend):
+    """
+    Filesystem backend: each bucket is a directory under root and object keys
+    are relative paths inside it. Writes go to a temporary file and are moved
+    into place with an atomic rename; reads are memory-mapped.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, TMP_DIR_NAME)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _bucket_path(self, bucket_name: str) -> str:
+        return os.path.join(self.root, bucket_name)
+
+    def _object_path(self, bucket_name: str, object_name: str) -> str:
+        bucket_path = self._bucket_path(bucket_name)
+        path = os.path.normpath(os.path.join(bucket_path, object_name))
+        if not path.startswith(bucket_path + os.sep):
+            raise ValueError(f"Invalid object name: {object_name}")
+        return path
+
+    def _no_such_key(self, bucket_name: str, object_name: str) -> S3Error:
+        return S3Error(
+            "NoSuchKey", "Object does not exist", f"/{bucket_name}/{object_name}",
+            None, None, None, bucket_name, object_name,
+        )
+
+    def _existing_path(self, bucket_name: str, object_name: str) -> str:
+        path = self._object_path(bucket_name, object_name)
+        if not os.path.isfile(path):
+            raise self._no_such_key(bucket_name, object_name)
+        return path
+
+    def _etag(self, stat: os.stat_result) -> str:
+        # Derived from size and mtime so it never needs the object content
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def _object_info(self, bucket_name: str, object_name: str, stat: os.stat_result) -> Object:
+        return Object(
+            bucket_name,
+            object_name,
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            etag=self._etag(stat),
+            size=stat.st_size,
+            content_type=mimetypes.guess_type(object_name)[0] or "application/octet-stream",
+        )
+
+    def _write_atomic(self, bucket_name: str, object_name: str, write) -> ObjectWriteResult:
+        """Write an object through a temporary file, then rename it into place."""
+        path = self._object_path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                write(tmp_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return ObjectWriteResult(bucket_name, object_name, None, self._etag(os.stat(path)), {})
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return os.path.isdir(self._bucket_path(bucket_name))
+
+    def make_bucket(self, bucket_name: str, *args, **kwargs) -> None:
+        os.makedirs(self._bucket_path(bucket_name), exist_ok=True)
+
+    def list_buckets(self) -> List[Bucket]:
+        buckets = []
+        for entry in sorted(os.scandir(self.root), key=lambda entry: entry.name):
+            if entry.is_dir() and entry.name != TMP_DIR_NAME:
+                created = datetime.fromtimestamp(entry.stat().st_ctime, tz=timezone.utc)
+                buckets.append(Bucket(entry.name, created))
+        return buckets
+
+    def set_bucket_policy(self, bucket_name: str, policy) -> None:
+        # Access policies do not apply to local files
+        pass
+
+    def put_object(self, bucket_name: str, object_name: str, data: BinaryIO, length: int, *args, **kwargs) -> ObjectWriteResult:
+        def write(tmp_file):
+            remaining = length
+            while remaining != 0:
+                chunk = data.read(COPY_CHUNK_SIZE if remaining < 0 else min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                tmp_file.write(chunk)
+                if remaining > 0:
+                    remaining -= len(chunk)
+
+        return self._write_atomic(bucket_name, object_name, write)
+
+    def fput_object(self, bucket_name: str, object_name: str, file_path: str, *args, **kwargs) -> ObjectWriteResult:
+        def write(tmp_file):
+            with open(file_path, "rb") as source:
+                shutil.copyfileobj(source, tmp_file, COPY_CHUNK_SIZE)
+
+        return self._write_atomic(bucket_name, object_name, write)
+
+    def get_object(self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0, *args, **kwargs) -> MappedObjectResponse:
+        return MappedObjectResponse(self._existing_path(bucket_name, object_name), offset, length)
+
+    def fget_object(self, bucket_name: str, object_name: str, file_path: str, *args, **kwargs) -> Object:
+        source = self._existing_path(bucket_name, object_name)
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.stat_object(bucket_name, object_name)
+
+    def stat_object(self, bucket_name: str, object_name: str, *args, **kwargs) -> Object:
+        path = self._existing_path(bucket_name, object_name)
+        return self._object_info(bucket_name, object_name, os.stat(path))
+
+    def copy_object(self, bucket_name: str, object_name: str, source: CopySource, *args, **kwargs) -> ObjectWriteResult:
+        source_path = self._existing_path(source.bucket_name, source.object_name)
+
+        def write(tmp_file):
+            with open(source_path, "rb") as source_file:
+                shutil.copyfileobj(source_file, tmp_file, COPY_CHUNK_SIZE)
+
+        return self._write_atomic(bucket_name, object_name, write)
+
+    def remove_object(self, bucket_name: str, object_name: str, *args, **kwargs) -> None:
+        path = self._object_path(bucket_name, object_name)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Like S3, removing a missing object is not an error
+            return
+
+        # Drop empty parent directories so they do not show up as prefixes
+        bucket_path = self._bucket_path(bucket_name)
+        directory = os.path.dirname(path)
+        while directory != bucket_path:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    def _walk_keys(self, bucket_name: str, prefix: str) -> List[str]:
+        """All object keys in a bucket under the directory that contains prefix."""
+        bucket_path = self._bucket_path(bucket_name)
+        start = self._object_path(bucket_name, prefix.rpartition("/")[0]) if "/" in prefix else bucket_path
+        if not os.path.isdir(start):
+            return []
+
+        keys = []
+        for directory, _, files in os.walk(start):
+            relative = os.path.relpath(directory, bucket_path).replace(os.sep, "/")
+            for name in files:
+                keys.append(name if relative == "." else f"{relative}/{name}")
+        return keys
+
+    def list_objects(self, bucket_name: str, prefix: Optional[str] = None, recursive: bool = False,
+                     start_after: Optional[str] = None, *args, **kwargs) -> Iterator[Object]:
+        """List objects in key order with S3 prefix, delimiter and start_after semantics."""
+        prefix = prefix or ""
+        if not self.bucket_exists(bucket_name):
+            return
+
+        seen_prefixes = set()
+        for key in sorted(self._walk_keys(bucket_name, prefix)):
+            if not key.startswith(prefix) or (start_after and key <= start_after):
+                continue
+
+            if not recursive:
+                # Collapse everything below the next "/" into a common prefix
+                slash = key.find("/", len(prefix))
+                if slash != -1:
+                    common_prefix = key[:slash + 1]
+                    if common_prefix not in seen_prefixes:
+                        seen_prefixes.add(common_prefix)
+                        yield Object(bucket_name, common_prefix)
+                    continue
+
+            yield self._object_info(bucket_name, key, os.stat(self._object_path(bucket_name, key)))
@@ -0,0 +1,95 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from minio import Minio
+from minio.commonconfig import ENABLED, Filter
+from minio.error import S3Error
+from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+
+from .base import StorageBackend
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class MinioBackend(Minio, StorageBackend):
+    """
+    MinIO (or any S3-compatible store) backend.
+
+    The minio-py client already implements the whole interface. This adds an
+    optional circuit breaker around every HTTP request the client makes, and
+    metrics on its connection pool.
+    """
+
+    def __init__(self, *args, breaker: Optional[CircuitBreaker] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    def _url_open(self, *args, **kwargs):
+        # Every request of the client (including each page of a listing) goes through here
+        if self.breaker is None:
+            return super()._url_open(*args, **kwargs)
+
+        self.breaker.before_call()
+        try:
+            response = super()._url_open(*args, **kwargs)
+        except S3Error as e:
+            # Error responses such as NoSuchKey mean the server is healthy
+            status = getattr(e.response, "status", None)
+            if status is not None and status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except CircuitOpenError:
+            raise
+        except Exception:
+            # Connection errors, timeouts and 5xx responses
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def set_bucket_policy(self, bucket_name: str, policy) -> None:
+        # minio-py expects the policy document as a JSON string
+        if not isinstance(policy, str):
+            policy = json.dumps(policy)
+        super().set_bucket_policy(bucket_name, policy)
+
+    def set_prefix_expiry(self, bucket_name: str, prefix: str, days: int) -> bool:
+        # One lifecycle rule per prefix; rules for other prefixes are kept
+        rule_id = f"expire-{prefix.strip('/').replace('/', '-')}"
+        lifecycle = self.get_bucket_lifecycle(bucket_name)
+        rules = [rule for rule in (lifecycle.rules if lifecycle else []) if rule.rule_id != rule_id]
+        rules.append(Rule(
+            ENABLED,
+            rule_filter=Filter(prefix=prefix),
+            rule_id=rule_id,
+            expiration=Expiration(days=days),
+        ))
+        self.set_bucket_lifecycle(bucket_name, LifecycleConfig(rules))
+        return True
+
+    def pool_stats(self) -> List[Dict[str, Any]]:
+        """Usage of the client's connection pools (one per host)."""
+        stats = []
+        pools = self._http.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            maxsize = pool.pool.maxsize if pool.pool is not None else 0
+            in_use = maxsize - pool.pool.qsize() if pool.pool is not None else 0
+            stats.append({
+                "host": f"{pool.host}:{pool.port}",
+                "maxsize": maxsize,
+                "in_use": in_use,
+                "saturation": round(in_use / maxsize, 4) if maxsize else 0.0,
+                "connections_created": pool.num_connections,
+                "requests": pool.num_requests,
+            })
+        return stats
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "pools": self.pool_stats(),
+            "circuit_breaker": self.breaker.snapshot() if self.breaker is not None else None,
+        }
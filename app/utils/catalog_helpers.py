@@ -0,0 +1,161 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from .key_helpers import parse_object_key, folder_for_kind
+from ..core.redis_config import get_redis_client
+
+# Redis key layout for the object metadata catalog
+CATALOG_PREFIX = "medvoice:catalog"
+CATALOG_META_KEY = f"{CATALOG_PREFIX}:meta"
+
+def _file_key(file_id: str) -> str:
+    return f"{CATALOG_PREFIX}:file:{file_id}"
+
+def build_catalog_record(object_name: str, size: Optional[int] = None, **extra) -> Optional[Dict[str, Any]]:
+    """
+    Build a catalog record for an object from its key.
+    Returns None if the key does not carry a file_id.
+    """
+    record = parse_object_key(object_name)
+    if record is None:
+        return None
+
+    record["object_key"] = object_name
+    record["size"] = size
+    record.update(extra)
+    return record
+
+def record_object(object_name: str, size: Optional[int] = None, **extra) -> Optional[Dict[str, Any]]:
+    """
+    Store the metadata of an object in the catalog.
+
+    Each file_id maps to a Redis hash with one field per kind (audio/json/txt),
+    so lookups by file_id are a single HGET. Catalog failures are logged and
+    never fail the storage operation that triggered them.
+    """
+    record = build_catalog_record(object_name, size, **extra)
+    if record is None:
+        return None
+
+    try:
+        client = get_redis_client()
+        client.hset(_file_key(record["file_id"]), record["kind"], json.dumps(record))
+    except Exception as e:
+        logging.warning(f"Could not record {object_name} in the storage catalog: {e}")
+    return record
+
+def _listing_key(user_id: str, folder: str) -> str:
+    return f"{CATALOG_PREFIX}:listing:{user_id}:{folder}"
+
+def touch_listing(object_name: str, last_modified: Optional[datetime] = None) -> None:
+    """
+    Mark the listing that contains an object as changed.
+
+    Each user/folder listing keeps a version counter and a last-modified time,
+    which the listing endpoints turn into ETag/Last-Modified validators without
+    listing the bucket. Call this only once the object is actually in storage.
+    """
+    record = parse_object_key(object_name)
+    if record is None:
+        return
+
+    last_modified = last_modified or datetime.now(timezone.utc)
+    key = _listing_key(record["user_id"], folder_for_kind(record["kind"]))
+    try:
+        pipeline = get_redis_client().pipeline()
+        pipeline.hincrby(key, "version", 1)
+        pipeline.hset(key, "last_modified", last_modified.isoformat())
+        pipeline.execute()
+    except Exception as e:
+        logging.warning(f"Could not update the listing marker for {object_name}: {e}")
+
+def get_listing_marker(user_id: str, folder: str) -> Optional[Dict[str, Any]]:
+    """Get the version and last-modified time of a user's listing, if tracked."""
+    try:
+        marker = get_redis_client().hgetall(_listing_key(user_id, folder))
+    except Exception as e:
+        logging.warning(f"Could not read the listing marker of {user_id}/{folder}: {e}")
+        return None
+
+    if not marker or "version" not in marker:
+        return None
+    return {
+        "version": int(marker["version"]),
+        "last_modified": datetime.fromisoformat(marker["last_modified"]),
+    }
+
+def lookup_object(file_id: str, kind: str = "audio") -> Optional[Dict[str, Any]]:
+    """Get the catalog record of a file_id for the given kind."""
+    try:
+        client = get_redis_client()
+        record = client.hget(_file_key(file_id), kind)
+    except Exception as e:
+        logging.warning(f"Storage catalog lookup failed for {file_id}: {e}")
+        return None
+    return json.loads(record) if record else None
+
+def catalog_is_complete() -> bool:
+    """
+    Whether the catalog has been backfilled from the bucket.
+    Once it has, a catalog miss is authoritative and no bucket scan is needed.
+    """
+    try:
+        client = get_redis_client()
+        return bool(client.hget(CATALOG_META_KEY, "rebuilt_at"))
+    except Exception as e:
+        logging.warning(f"Could not read storage catalog state: {e}")
+        return False
+
+def rebuild_catalog(prefix: str = "", batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Backfill the catalog from the objects already in the bucket.
+
+    Args:
+        prefix: Only catalog objects under this prefix
+        batch_size: Number of catalog writes sent per Redis pipeline
+
+    Returns:
+        Counts of scanned and cataloged objects
+    """
+    from .storage_helpers import init_storage_client
+
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    redis_client = get_redis_client()
+
+    scanned, cataloged = 0, 0
+    pipeline = redis_client.pipeline(transaction=False)
+    newest_by_listing = {}
+
+    for obj in client.list_objects(bucket_name, prefix=prefix, recursive=True):
+        scanned += 1
+        record = build_catalog_record(obj.object_name, obj.size)
+        if record is None:
+            continue
+
+        pipeline.hset(_file_key(record["file_id"]), record["kind"], json.dumps(record))
+        cataloged += 1
+
+        listing = _listing_key(record["user_id"], folder_for_kind(record["kind"]))
+        if listing not in newest_by_listing or obj.last_modified > newest_by_listing[listing]:
+            newest_by_listing[listing] = obj.last_modified
+
+        if cataloged % batch_size == 0:
+            pipeline.execute()
+            logging.info(f"Cataloged {cataloged} objects ({scanned} scanned)")
+
+    # Start tracking listing validators for every user seen
+    for listing, last_modified in newest_by_listing.items():
+        pipeline.hincrby(listing, "version", 1)
+        pipeline.hset(listing, "last_modified", last_modified.isoformat())
+    pipeline.execute()
+
+    # Only a full-bucket rebuild makes catalog misses authoritative
+    if not prefix:
+        redis_client.hset(CATALOG_META_KEY, "rebuilt_at", datetime.now(timezone.utc).isoformat())
+
+    logging.info(f"Storage catalog rebuilt: {cataloged} objects cataloged, {scanned} scanned")
+    return {"scanned": scanned, "cataloged": cataloged}
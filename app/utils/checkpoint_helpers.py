@@ -0,0 +1,63 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from minio.error import S3Error
+
+from .key_helpers import checkpoint_object_key
+from .storage_helpers import upload_file, fetch_json_object
+
+# Checkpointed pipeline outputs, in pipeline order
+CHECKPOINT_STAGES = ("diarization", "extraction")
+
+def save_checkpoint(user_id: Optional[str], file_id: str, stage: str, fingerprint: str, data: Any,
+                    task_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Store the output of a pipeline stage under the recording's checkpoints.
+
+    The fingerprint identifies everything besides the audio that the output
+    depends on (model and prompt versions, patient name); a checkpoint is only
+    reused while it matches. metadata (patient and file name) lets jobs such as
+    re-extraction rebuild the output without the original task. Returns the
+    object name.
+    """
+    object_name = checkpoint_object_key(user_id, file_id, stage)
+    document = {
+        "stage": stage,
+        "fingerprint": fingerprint,
+        "task_id": task_id,
+        "user_id": user_id,
+        "file_id": file_id,
+        "metadata": metadata or {},
+        "data": data,
+    }
+    payload = json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    upload_file(None, object_name, data=payload, compress=True)
+    return object_name
+
+def load_checkpoint(user_id: Optional[str], file_id: str, stage: str, fingerprint: str,
+                    task_id: Optional[str] = None) -> Optional[Any]:
+    """
+    Output of a completed stage, or None if there is no usable checkpoint.
+    With task_id, only checkpoints written by that task are used.
+    """
+    object_name = checkpoint_object_key(user_id, file_id, stage)
+    document = read_checkpoint(object_name)
+    if document is None:
+        return None
+
+    if document.get("fingerprint") != fingerprint:
+        logging.info(f"Ignoring outdated checkpoint {object_name}")
+        return None
+    if task_id is not None and document.get("task_id") != task_id:
+        return None
+    return document["data"]
+
+def read_checkpoint(object_name: str) -> Optional[Dict[str, Any]]:
+    """The whole checkpoint document (data plus fingerprint and metadata), or None if missing."""
+    try:
+        return fetch_json_object(object_name, max_retries=1)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return None
+        raise
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, Dict, Optional
+
+from ..core.config_loader import config
+
+class WorkerEventLoop:
+    """
+    Long-lived event loop of one worker process, running in a daemon thread.
+
+    Celery tasks are synchronous; instead of creating (or reusing the main
+    thread's) loop per task, every task hands its coroutine to this loop and
+    waits for the result. With a thread pool (`--pool threads`) many tasks of
+    one process then await Replicate and MinIO concurrently on the same loop,
+    while a semaphore caps how many coroutines are in flight at once. Each
+    caller blocks its pool thread until its coroutine finishes, so the thread
+    count also caps concurrency.
+
+        result = get_worker_loop().run(process_audio_background(...), timeout=600)
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent or config.pipeline.max_concurrent
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_forever, name="worker-event-loop", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_forever(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        # Created inside the loop's thread so it binds to this loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self.loop.is_closed()
+
+    async def _limited(self, coro: Coroutine, timeout: Optional[float]) -> Any:
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            if timeout:
+                return await asyncio.wait_for(coro, timeout)
+            return await coro
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    def submit(self, coro: Coroutine, timeout: Optional[float] = None):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self._limited(coro, timeout), self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the loop and block the calling thread until it is done.
+        With a timeout, the coroutine is cancelled and asyncio.TimeoutError raised
+        once it has run for that many seconds (waiting for a slot does not count).
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("WorkerEventLoop.run() cannot be called from the loop's own thread")
+        return self.submit(coro, timeout).result()
+
+    def stats(self) -> Dict[str, int]:
+        """Coroutines running, waiting for a slot and completed, for metrics."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+        }
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the loop and wait for its thread; pending coroutines are cancelled."""
+        if not self.running:
+            return
+
+        async def cancel_pending():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_pending(), self.loop).result(timeout)
+        except Exception as e:
+            logging.warning(f"Could not cancel pending coroutines: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+# Event loop of this process, created on first use
+_worker_loop: Optional[WorkerEventLoop] = None
+_worker_loop_lock = threading.Lock()
+
+def get_worker_loop() -> WorkerEventLoop:
+    """
+    The event loop of the current process.
+    A loop inherited through fork has no running thread in the child, so a new one is started.
+    """
+    global _worker_loop
+    with _worker_loop_lock:
+        if _worker_loop is None or _worker_loop.pid != os.getpid() or not _worker_loop.running:
+            _worker_loop = WorkerEventLoop()
+            logging.info(
+                f"Started worker event loop in process {os.getpid()} "
+                f"(max {_worker_loop.max_concurrent} concurrent coroutines)"
+            )
+        return _worker_loop
+
+def stop_worker_loop() -> None:
+    global _worker_loop
+    with _worker_loop_lock:
+        if _worker_loop is not None and _worker_loop.pid == os.getpid():
+            _worker_loop.stop()
+        _worker_loop = None
@@ -0,0 +1,152 @@
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config_loader import config
+from ..core.redis_config import get_redis_client
+
+# Pending pipelines wait in one Redis list per user. The users with pending
+# work form a ring that the dispatcher rotates through, and every dispatched
+# pipeline holds a leased in-flight slot until it finishes.
+FAIR_SHARE_PREFIX = "medvoice:fair"
+USERS_RING_KEY = f"{FAIR_SHARE_PREFIX}:users"
+INFLIGHT_KEY = f"{FAIR_SHARE_PREFIX}:inflight"
+ANONYMOUS_USER = "_anonymous"
+
+def user_queue_key(user_id: str) -> str:
+    return f"{FAIR_SHARE_PREFIX}:queue:{user_id}"
+
+def user_inflight_key(user_id: str) -> str:
+    return f"{FAIR_SHARE_PREFIX}:inflight:{user_id}"
+
+# Pick the next pipeline to start, atomically across all dispatchers.
+# Round robin over the ring: the first user below the per-user cap gets the
+# next slot. If only capped users have pending work, the first of them gets it
+# anyway (work-conserving), so a single heavy user still uses an idle system.
+# Slots are sorted sets of task ids scored by lease expiry; expired leases
+# (lost workers) are dropped before counting.
+# Queue keys are built from the user ids, so this needs a single Redis node.
+DISPATCH_SCRIPT = """
+local ring, inflight = KEYS[1], KEYS[2]
+local prefix = ARGV[1]
+local per_user_cap, max_inflight = tonumber(ARGV[2]), tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1])
+
+redis.call('ZREMRANGEBYSCORE', inflight, '-inf', now)
+if redis.call('ZCARD', inflight) >= max_inflight then
+    return nil
+end
+
+local fallback = nil
+for i = 1, redis.call('LLEN', ring) do
+    local user = redis.call('RPOPLPUSH', ring, ring)
+    if not user then
+        break
+    end
+    local queue = prefix .. ':queue:' .. user
+    if redis.call('LLEN', queue) == 0 then
+        redis.call('LREM', ring, 0, user)
+    else
+        local user_inflight = prefix .. ':inflight:' .. user
+        redis.call('ZREMRANGEBYSCORE', user_inflight, '-inf', now)
+        if redis.call('ZCARD', user_inflight) < per_user_cap then
+            fallback = user
+            break
+        end
+        fallback = fallback or user
+    end
+end
+if not fallback then
+    return nil
+end
+
+local queue = prefix .. ':queue:' .. fallback
+local job = redis.call('LPOP', queue)
+local task_id = cjson.decode(job)['task_id']
+redis.call('ZADD', inflight, now + lease, task_id)
+redis.call('ZADD', prefix .. ':inflight:' .. fallback, now + lease, task_id)
+redis.call('EXPIRE', prefix .. ':inflight:' .. fallback, lease)
+if redis.call('LLEN', queue) == 0 then
+    redis.call('LREM', ring, 0, fallback)
+end
+return {fallback, job}
+"""
+
+def fair_share_user(user_id: Optional[str]) -> str:
+    return user_id or ANONYMOUS_USER
+
+def enqueue_fair(entries: List[Tuple[Optional[str], str, Dict[str, Any], bool]]) -> None:
+    """
+    Add pipelines to their users' queues in one round trip.
+    Each entry is (user_id, task_id, pipeline_kwargs, front); front=True puts
+    the pipeline ahead of the user's other work.
+    """
+    pipe = get_redis_client().pipeline()
+    users = []
+    for user_id, task_id, pipeline_kwargs, front in entries:
+        user = fair_share_user(user_id)
+        job = json.dumps({"task_id": task_id, "kwargs": pipeline_kwargs, "enqueued_at": time.time()})
+        if front:
+            pipe.lpush(user_queue_key(user), job)
+        else:
+            pipe.rpush(user_queue_key(user), job)
+        if user not in users:
+            users.append(user)
+    for user in users:
+        # Join the ring once (LPOS needs Redis 6.0.6; LREM + RPUSH keeps it unique)
+        pipe.lrem(USERS_RING_KEY, 0, user)
+        pipe.rpush(USERS_RING_KEY, user)
+    pipe.execute()
+
+def next_fair_job() -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Take the next pipeline to start and lease its slot, or None if nothing may start now."""
+    picked = get_redis_client().eval(
+        DISPATCH_SCRIPT, 2, USERS_RING_KEY, INFLIGHT_KEY,
+        FAIR_SHARE_PREFIX, config.fair_share.per_user_max_inflight,
+        config.fair_share.max_inflight, config.fair_share.lease
+    )
+    if not picked:
+        return None
+    user, job = picked
+    return user, json.loads(job)
+
+def requeue_fair(user: str, job: Dict[str, Any]) -> None:
+    """Put back a job that could not be started, at the front of its user's queue."""
+    release_slot(user, job["task_id"])
+    pipe = get_redis_client().pipeline()
+    pipe.lpush(user_queue_key(user), json.dumps(job))
+    pipe.lrem(USERS_RING_KEY, 0, user)
+    pipe.rpush(USERS_RING_KEY, user)
+    pipe.execute()
+
+def release_slot(user: Optional[str], task_id: Optional[str]) -> None:
+    """Free the in-flight slot of a finished pipeline (best effort)."""
+    if not user or not task_id:
+        return
+    try:
+        pipe = get_redis_client().pipeline()
+        pipe.zrem(INFLIGHT_KEY, task_id)
+        pipe.zrem(user_inflight_key(user), task_id)
+        pipe.execute()
+    except Exception as e:
+        logging.warning(f"Could not release the in-flight slot of task {task_id}: {e}")
+
+def fair_share_stats() -> Dict[str, Any]:
+    """Pending and in-flight pipelines per user, for monitoring."""
+    redis_client = get_redis_client()
+    now = time.time()
+    users = {}
+    for user in dict.fromkeys(redis_client.lrange(USERS_RING_KEY, 0, -1)):
+        users[user] = {
+            "pending": redis_client.llen(user_queue_key(user)),
+            "in_flight": redis_client.zcount(user_inflight_key(user), now, "+inf"),
+        }
+    return {
+        "in_flight": redis_client.zcount(INFLIGHT_KEY, now, "+inf"),
+        "max_inflight": config.fair_share.max_inflight,
+        "per_user_max_inflight": config.fair_share.per_user_max_inflight,
+        "users": users,
+    }
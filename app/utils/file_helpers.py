@@ -1,13 +1,17 @@
 from fastapi import HTTPException
 from typing import List, Dict, Any, Optional, Union
-import json, os, requests, datetime, hashlib
+import json, os, requests, datetime, hashlib, logging
 import re
 
-from .storage_helpers import upload_file, download_file, extract_path_from_url
+from .storage_helpers import upload_file, copy_file_async, extract_path_from_url, resolve_upload_key, run_storage_io
 from .json_helpers import remove_json_metadata
+from .catalog_helpers import record_object
+from .key_helpers import audio_object_key, output_object_key
 from ..core.minio_config import *
 from ..models.request_enum import AudioExtension
-from ..api.v1.endpoints.get.minio_storage import get_audio
+from ..api.v1.endpoints.get.minio_storage import get_audio, find_audio_object
+
+logger = logging.getLogger(__name__)
 
 # Helper function for getting audio file path
 def extract_audio_path(full_url):
@@ -23,50 +27,39 @@ def remove_local_file(file_path):
     else:
         print("No file path provided, skipping removal.")
 
-async def fetch_and_store_audio(user_id: str, file_name: str):
+async def fetch_and_store_audio(user_id: str, file_name: str, remove_source: bool = False,
+                                size: Optional[int] = None, sha256: Optional[str] = None,
+                                date_string: Optional[str] = None):
     try:
-        # Initialize file_path
-        file_path = os.path.join("audios", os.path.basename(file_name))
-        
-        # Ensure the audios directory exists
-        os.makedirs("audios", exist_ok=True)
-        
-        # Download the file using our storage helper
-        local_file = download_file(file_name, file_path)
-        
-        print(f"File downloaded successfully to {local_file}")
-
-        # Generate a new filename with metadata
-        audio_file = generate_audio_filename(local_file, user_id)
+        # Generate a new filename with metadata (the same one again for the same date_string)
+        audio_file = generate_audio_filename(file_name, user_id, date_string)
         print(audio_file)
         
-        # Upload the file using our storage helper
-        upload_file(audio_file['new_file_name'], audio_file['new_file_name'])
+        # Copy the object under its new name server-side; no bytes pass through this node
+        await copy_file_async(file_name, audio_file['object_name'], remove_source=remove_source)
 
-        # Clean up the local file
-        remove_local_file(audio_file["new_file_name"])
+        # Register the new object in the metadata catalog only once it exists
+        await run_storage_io(record_object, audio_file['object_name'], size, sha256=sha256)
 
         return {
-            "new_file_name": audio_file['new_file_name'], 
+            "new_file_name": audio_file['object_name'], 
             "file_id": audio_file['file_id']
         }
     except Exception as e:
         # Rethrow the exception to be caught by the calling function
         raise e
     
-def generate_audio_filename(file_path: str, user_id: str):
-    # Ensure the audios/ directory exists
-    os.makedirs('audios', exist_ok=True)
+def audio_date_string(now: Optional[datetime.datetime] = None) -> str:
+    """Date part of an audio object name; with the file name and user it determines the file_id."""
+    return (now or datetime.datetime.now()).strftime("%Y-%m-%d_%H-%M-%S")
 
+def generate_audio_filename(file_path: str, user_id: str, date_string: Optional[str] = None):
     # Get file extension
-    file_info = get_file_name_and_extension(file_path)
+    file_info = get_file_name_and_extension(os.path.basename(file_path))
     patient_name, file_extension = file_info['file_name'], file_info['file_extension']
 
-    # Get the current date and time
-    now = datetime.datetime.now()
-
-    # Format the date and time as a string
-    date_string = now.strftime("%Y-%m-%d_%H-%M-%S")
+    # Format the date and time as a string (fixed by the caller to get the same key again)
+    date_string = date_string or audio_date_string()
 
     # Create the new file_name with date, original file_name, and user ID
     new_file_name = f'{patient_name}patient_{date_string}date_{user_id}{file_extension}'
@@ -77,16 +70,16 @@ def generate_audio_filename(file_path: str, user_id: str):
     # Create the new file_name with hash value, date, original file_name, and user ID
     new_file_name = f'{patient_name}patient_{date_string}date_{file_id}fileID_{user_id}{file_extension}'
     
-    # Rename the temporary file
-    os.rename(file_path, new_file_name)
+    # Storage key under the user's audio prefix
+    object_name = audio_object_key(user_id, new_file_name)
 
-    return {"new_file_name": new_file_name, "file_id": file_id}
+    return {"new_file_name": new_file_name, "object_name": object_name, "file_id": file_id}
 
 def generate_output_filename(data: Union[List[str], Dict[str, Any]], file_id: str, user_id: str, file_name: Optional[str] = "transcript") -> str:
-    # Ensure 'outputs' directory exists
-    if not os.path.exists('outputs'):
-        os.makedirs('outputs')
-
+    """
+    Upload a transcript (list of lines) or structured output (dict) to the user's outputs prefix.
+    Outputs are serialized compactly and stored gzip-compressed; returns the object URL.
+    """
     # Determine output format based on data type
     if isinstance(data, list):
         file_extension = 'txt'
@@ -97,24 +90,16 @@ def generate_output_filename(data: Union[List[str], Dict[str, Any]], file_id: st
         # Remove JSON metadata
         clean_data = remove_json_metadata(data)
 
-        # Convert the cleaned dictionary to a JSON string
-        data_to_write = json.dumps(clean_data, indent=4)  # Use clean_data instead of data
-
-    # Define the local file path
-    object_name = f'{file_id}_{file_name}_{user_id}_output.{file_extension}'
-    output_file_path = os.path.join('outputs', object_name)
+        # Convert the cleaned dictionary to a compact JSON string
+        data_to_write = json.dumps(clean_data, separators=(',', ':'), ensure_ascii=False)
 
-    # Write data to the local file
-    with open(output_file_path, 'w') as f:
-        f.write(data_to_write)
+    # Define the storage key under the user's outputs prefix
+    output_name = f'{file_id}_{file_name}_{user_id}_output.{file_extension}'
+    object_name = output_object_key(user_id, output_name)
 
-    print(f"Output saved locally to {output_file_path}")
-    
-    # Upload to storage and get URL
-    file_url = upload_file(output_file_path, object_name)
-    
-    # Clean up local file
-    remove_local_file(output_file_path)
+    # Upload from memory and get URL
+    file_url = upload_file(None, object_name, data=data_to_write.encode('utf-8'), compress=True)
+    logger.info(f"Output saved to {object_name}")
     
     return file_url
 
@@ -127,7 +112,8 @@ def get_file_name_and_extension(file_path):
 
 async def get_file_from_user_upload(user_id: str, file_name: str) -> Dict[str, Any]:
     """Get file information from a user uploaded file."""
-    audio_file = await fetch_and_store_audio(user_id, file_name)
+    storage_path = await resolve_upload_key(user_id, file_name)
+    audio_file = await fetch_and_store_audio(user_id, storage_path)
     return {
         "file_id": audio_file["file_id"],
         "audio_file_path": None,
@@ -136,13 +122,11 @@ async def get_file_from_user_upload(user_id: str, file_name: str) -> Dict[str, A
 
 async def get_file_from_storage(file_id: str, file_extension: AudioExtension) -> Dict[str, Any]:
     """Retrieve file information from storage using file_id."""
-    file_url = await get_audio(file_id, file_extension)
-    audio_file_path = extract_audio_path(file_url)
-    file_name = extract_patient_name(audio_file_path)
+    record = await find_audio_object(file_id, file_extension)
     return {
         "file_id": file_id,
-        "audio_file_path": audio_file_path,
-        "file_name": file_name
+        "audio_file_path": record["object_key"],
+        "file_name": record["patient_name"]
     }
 
 def extract_patient_name(file_path: str) -> Optional[str]:
@@ -0,0 +1,77 @@
+import hashlib
+import logging
+from typing import Callable, Optional
+
+from ..core.config_loader import config
+from ..core.redis_config import get_redis_client
+
+IDEMPOTENCY_KEY_PREFIX = "medvoice:idempotency"
+
+# Replace the claim only if it still holds the task id we found finished
+REPLACE_CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Release the claim only if it still belongs to this task
+RELEASE_CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class SubmissionInProgress(RuntimeError):
+    """Raised when a submission's key could not be claimed because other submissions kept racing for it."""
+
+def idempotency_key(user_id: Optional[str], client_key: Optional[str] = None, **identity) -> str:
+    """
+    Redis key identifying one submission of a user.
+
+    A client-supplied key (Idempotency-Key header) wins; otherwise the key is
+    derived from whatever identifies the recording (audio sha256, file_id,
+    object key) plus the processing options, so a retried request maps to the
+    same key.
+    """
+    if client_key:
+        material = f"client|{user_id or ''}|{client_key}"
+    else:
+        material = "|".join([user_id or ""] + [f"{name}={identity[name]}" for name in sorted(identity)])
+    return f"{IDEMPOTENCY_KEY_PREFIX}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+def claim_submission(key: str, task_id: str, is_active: Callable[[str], bool], max_attempts: int = 5) -> Optional[str]:
+    """
+    Claim the key for a new task.
+
+    Returns None if the caller holds the claim and should enqueue task_id, or
+    the id of the task already queued or running for this key. A claim whose
+    task has finished (is_active returns False) is replaced, so a later retry
+    starts a new run. Raises SubmissionInProgress if every attempt lost a race
+    against other submissions, so the caller never enqueues without the claim.
+    """
+    client = get_redis_client()
+    ttl = config.pipeline.idempotency_ttl
+    for _ in range(max_attempts):
+        if client.set(key, task_id, nx=True, ex=ttl):
+            return None
+        existing = client.get(key)
+        if existing is None:
+            # Expired or released in between; try to claim again
+            continue
+        if is_active(existing):
+            return existing
+        if client.eval(REPLACE_CLAIM_SCRIPT, 1, key, existing, task_id, ttl):
+            return None
+    raise SubmissionInProgress(f"Could not claim submission {key} after {max_attempts} attempts")
+
+def release_submission(key: Optional[str], task_id: Optional[str]) -> None:
+    """Release a claim once its task has finished (best effort)."""
+    if not key or not task_id:
+        return
+    try:
+        get_redis_client().eval(RELEASE_CLAIM_SCRIPT, 1, key, task_id)
+    except Exception as e:
+        logging.warning(f"Could not release idempotency key of task {task_id}: {e}")
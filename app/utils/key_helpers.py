@@ -0,0 +1,147 @@
+import os
+import re
+import uuid
+from typing import Optional, Dict, Any
+
+from ..models.request_enum import AudioExtension
+
+# Audio objects: {patient}patient_{date}date_{file_id}fileID_{user_id}{.ext}
+AUDIO_KEY_PATTERN = re.compile(
+    r"^(?P<patient_name>.*?)patient_"
+    r"(?P<timestamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})date_"
+    r"(?P<file_id>[0-9a-f]{64})fileID_"
+    r"(?P<user_id>.+?)\.(?P<extension>[^.]+)$"
+)
+
+# Output objects: {file_id}_{file_name}_{user_id}_output.{json|txt}
+# Both the file name and the user id may contain "_", so the pattern only
+# anchors on the file_id and the _output suffix; see split_output_name.
+OUTPUT_KEY_PATTERN = re.compile(
+    r"^(?P<file_id>[^_]+)_(?P<name_and_user>.+)_output\.(?P<extension>json|txt)$"
+)
+
+AUDIO_EXTENSIONS = {extension.value for extension in AudioExtension}
+
+def key_user_id(object_name: str) -> Optional[str]:
+    """User id of a key in the users/{user_id}/... layout, None for legacy keys."""
+    parts = object_name.split("/")
+    if len(parts) > 2 and parts[0] == USERS_PREFIX:
+        return parts[1]
+    return None
+
+def split_output_name(name_and_user: str, user_id: Optional[str] = None) -> Optional[tuple]:
+    """
+    Split the {file_name}_{user_id} part of an output key.
+    With a known user id the key must end with it; otherwise the last "_"
+    separates them, which is only right for user ids without "_".
+    """
+    if user_id and name_and_user.endswith(f"_{user_id}"):
+        return name_and_user[:-len(user_id) - 1], user_id
+    patient_name, separator, user_id = name_and_user.rpartition("_")
+    if not separator or not user_id:
+        return None
+    return patient_name, user_id
+
+def parse_object_key(object_name: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Extract the metadata encoded in an object key.
+
+    Returns a dictionary with file_id, user_id, patient_name, timestamp,
+    extension and kind (audio/json/txt), or None if the key does not follow
+    one of the naming schemes used by the pipeline. Output keys only carry
+    their user unambiguously in the users/{user_id}/ layout; for legacy keys
+    pass the user_id if it is known.
+    """
+    base_name = os.path.basename(object_name)
+
+    match = AUDIO_KEY_PATTERN.match(base_name)
+    if match and match.group("extension") in AUDIO_EXTENSIONS:
+        return {
+            "file_id": match.group("file_id"),
+            "user_id": match.group("user_id"),
+            "patient_name": match.group("patient_name"),
+            "timestamp": match.group("timestamp"),
+            "extension": match.group("extension"),
+            "kind": "audio",
+        }
+
+    match = OUTPUT_KEY_PATTERN.match(base_name)
+    parts = match and split_output_name(match.group("name_and_user"), user_id or key_user_id(object_name))
+    if parts:
+        patient_name, user_id = parts
+        return {
+            "file_id": match.group("file_id"),
+            "user_id": user_id,
+            "patient_name": patient_name,
+            "timestamp": None,
+            "extension": match.group("extension"),
+            "kind": match.group("extension"),
+        }
+
+    return None
+
+# Hierarchical layout: users/{user_id}/{audio|outputs|uploads}/{file name}
+USERS_PREFIX = "users"
+AUDIO_FOLDER = "audio"
+OUTPUTS_FOLDER = "outputs"
+UPLOADS_FOLDER = "uploads"
+CHECKPOINTS_FOLDER = "checkpoints"
+
+def user_prefix(user_id: str, folder: str) -> str:
+    """Prefix holding one kind of object for a user, e.g. users/42/audio/."""
+    return f"{USERS_PREFIX}/{user_id}/{folder}/"
+
+def audio_object_key(user_id: str, file_name: str) -> str:
+    return user_prefix(user_id, AUDIO_FOLDER) + os.path.basename(file_name)
+
+def output_object_key(user_id: str, file_name: str) -> str:
+    return user_prefix(user_id, OUTPUTS_FOLDER) + os.path.basename(file_name)
+
+def new_upload_id() -> str:
+    return uuid.uuid4().hex
+
+def upload_object_key(user_id: str, file_name: str, upload_id: Optional[str] = None) -> str:
+    """
+    Key of a raw upload. Each upload request gets its own upload_id folder,
+    users/{user_id}/uploads/{upload_id}/{file name}, so concurrent uploads of
+    the same file name never share an object. Without upload_id this is the
+    flat key of uploads stored before upload ids existed.
+    """
+    prefix = user_prefix(user_id, UPLOADS_FOLDER)
+    if upload_id:
+        prefix += f"{upload_id}/"
+    return prefix + os.path.basename(file_name)
+
+def checkpoint_object_key(user_id: Optional[str], file_id: str, stage: str) -> str:
+    """Pipeline checkpoint of a recording: users/{user_id}/checkpoints/{file_id}/{stage}.json."""
+    prefix = user_prefix(user_id, CHECKPOINTS_FOLDER) if user_id else f"{CHECKPOINTS_FOLDER}/"
+    return f"{prefix}{file_id}/{stage}.json"
+
+# Task results too large for the Celery result backend: results/{task_id}.json
+RESULTS_PREFIX = "results/"
+
+def task_result_object_key(task_id: str) -> str:
+    return f"{RESULTS_PREFIX}{task_id}.json"
+
+def is_legacy_key(object_name: str) -> bool:
+    """Legacy keys are flat names at the bucket root."""
+    return "/" not in object_name
+
+def folder_for_kind(kind: str) -> str:
+    """Map a catalog kind (audio/json/txt) to its folder in the user layout."""
+    return AUDIO_FOLDER if kind == "audio" else OUTPUTS_FOLDER
+
+def layout_key_for(object_name: str, user_id: Optional[str] = None) -> Optional[str]:
+    """
+    Get the hierarchical key a legacy flat key migrates to.
+    Returns None for keys that are already migrated or carry no user_id.
+    """
+    if not is_legacy_key(object_name):
+        return None
+
+    record = parse_object_key(object_name, user_id)
+    if record is None:
+        return None
+
+    folder = folder_for_kind(record["kind"])
+    return user_prefix(record["user_id"], folder) + object_name
@@ -0,0 +1,117 @@
+import time
+import logging
+from itertools import islice
+from typing import Optional, Dict, Any
+
+from minio.commonconfig import CopySource
+
+from .storage_helpers import init_storage_client, MIGRATION_COMPLETE_KEY
+from .catalog_helpers import record_object, touch_listing, lookup_object
+from .key_helpers import layout_key_for, parse_object_key
+from ..core.redis_config import get_redis_client
+
+# Redis key holding the last legacy key processed, so an interrupted run resumes
+MIGRATION_CURSOR_KEY = "medvoice:migration:key_layout:cursor"
+
+def cataloged_user_id(object_name: str) -> Optional[str]:
+    """
+    User of a legacy output key, from the catalog record of its audio.
+    Output keys alone cannot tell a user id containing "_" from the file name.
+    """
+    record = parse_object_key(object_name)
+    if record is None or record["kind"] == "audio":
+        return None
+    audio = lookup_object(record["file_id"], "audio")
+    return (audio or {}).get("user_id")
+
+def legacy_keys_left(client, bucket_name: str) -> bool:
+    """Whether any key at the bucket root still belongs in the per-user layout."""
+    return any(
+        not obj.is_dir and layout_key_for(obj.object_name, cataloged_user_id(obj.object_name))
+        for obj in client.list_objects(bucket_name, recursive=False)
+    )
+
+def migrate_legacy_keys(
+    batch_size: int = 100,
+    max_batches: Optional[int] = None,
+    pause: float = 0.0,
+    dry_run: bool = False,
+    reset: bool = False,
+) -> Dict[str, Any]:
+    """
+    Move legacy flat keys into the users/{user_id}/{audio|outputs}/ layout.
+
+    Objects are copied server-side, the copy's size is verified, the object is
+    re-cataloged under its new key and then removed from the bucket root.
+    Readers handle both layouts, so the migration can run while the API is
+    serving traffic. Progress is checkpointed in Redis after every batch and
+    the next run resumes from there. Once a run finishes with no legacy key
+    left, it sets a flag so user listings stop scanning the bucket root.
+
+    Args:
+        batch_size: Number of root objects handled per batch
+        max_batches: Stop after this many batches (default: run to completion)
+        pause: Seconds to sleep between batches to limit load on MinIO
+        dry_run: Only report what would be migrated
+        reset: Ignore the saved checkpoint and start from the beginning
+
+    Returns:
+        Counts of migrated, skipped and failed objects and whether the run finished
+    """
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    redis_client = get_redis_client()
+
+    cursor = None if reset else redis_client.get(MIGRATION_CURSOR_KEY)
+    if not dry_run:
+        # Legacy keys may exist again; listings scan the root until this run finishes
+        redis_client.delete(MIGRATION_COMPLETE_KEY)
+    stats = {"migrated": 0, "skipped": 0, "failed": 0, "batches": 0, "finished": False}
+
+    while max_batches is None or stats["batches"] < max_batches:
+        # A non-recursive root listing only returns legacy keys (and the users/ prefix)
+        objects = client.list_objects(bucket_name, recursive=False, start_after=cursor)
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            stats["finished"] = True
+            break
+
+        for obj in batch:
+            new_key = None if obj.is_dir else layout_key_for(obj.object_name, cataloged_user_id(obj.object_name))
+            if new_key is None:
+                stats["skipped"] += 1
+                continue
+
+            if dry_run:
+                logging.info(f"Would migrate {obj.object_name} -> {new_key}")
+                stats["migrated"] += 1
+                continue
+
+            try:
+                client.copy_object(bucket_name, new_key, CopySource(bucket_name, obj.object_name))
+                copied = client.stat_object(bucket_name, new_key)
+                if copied.size != obj.size:
+                    raise IOError(f"Copy of {obj.object_name} has {copied.size} bytes, expected {obj.size}")
+                record_object(new_key, obj.size)
+                touch_listing(new_key)
+                client.remove_object(bucket_name, obj.object_name)
+                stats["migrated"] += 1
+            except Exception as e:
+                logging.error(f"Failed to migrate {obj.object_name}: {e}")
+                stats["failed"] += 1
+
+        cursor = batch[-1].object_name
+        if not dry_run:
+            redis_client.set(MIGRATION_CURSOR_KEY, cursor)
+        stats["batches"] += 1
+        logging.info(f"Batch {stats['batches']} done up to {cursor}: {stats}")
+
+        if pause:
+            time.sleep(pause)
+
+    if stats["finished"] and not dry_run and not legacy_keys_left(client, bucket_name):
+        redis_client.set(MIGRATION_COMPLETE_KEY, int(time.time()))
+        logging.info("Key migration complete: user listings no longer scan the bucket root")
+
+    return stats
@@ -0,0 +1,86 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+from ..core.redis_config import get_redis_client, get_async_redis_client
+
+# Pub/sub channel of a task's progress events; the latest event is also kept
+# under the same key so a client connecting late gets the current state
+PROGRESS_KEY_PREFIX = "medvoice:progress"
+PROGRESS_TTL = 24 * 60 * 60
+
+# Events in pipeline order; saved and failed end the stream
+PROGRESS_EVENTS = ("queued", "uploaded", "transcribing", "extracting", "retrying", "saved", "failed")
+TERMINAL_EVENTS = ("saved", "failed")
+
+# Seconds between keepalive comments on an idle stream, so proxies keep it open
+KEEPALIVE_INTERVAL = 15
+
+def progress_key(task_id: str) -> str:
+    return f"{PROGRESS_KEY_PREFIX}:{task_id}"
+
+def publish_progress(task_id: Optional[str], event: str, **data) -> None:
+    """
+    Publish a progress event of a pipeline task and remember it as the latest.
+    Progress is best effort: Redis errors are logged and never fail the task.
+    """
+    if not task_id:
+        return
+    message = json.dumps({"task_id": task_id, "event": event, "timestamp": time.time(), **data})
+    key = progress_key(task_id)
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.set(key, message, ex=PROGRESS_TTL)
+        pipe.publish(key, message)
+        pipe.execute()
+    except Exception as e:
+        logging.warning(f"Could not publish progress event {event} of task {task_id}: {e}")
+
+def get_progress(task_id: str) -> Optional[Dict[str, Any]]:
+    """Latest progress event of a task, or None if it has not published any."""
+    message = get_redis_client().get(progress_key(task_id))
+    return json.loads(message) if message else None
+
+def format_sse(data: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message."""
+    return f"event: {data['event']}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_progress(task_id: str, is_disconnected=None,
+                          keepalive_interval: float = KEEPALIVE_INTERVAL) -> AsyncIterator[str]:
+    """
+    Server-Sent Events of a task's progress, until it is saved or failed.
+
+    Subscribes before reading the latest event, so nothing published in
+    between is lost. is_disconnected is an optional coroutine function
+    (Request.is_disconnected) checked between messages.
+    """
+    pubsub = get_async_redis_client().pubsub()
+    await pubsub.subscribe(progress_key(task_id))
+    try:
+        latest = await get_async_redis_client().get(progress_key(task_id))
+        if latest:
+            data = json.loads(latest)
+            yield format_sse(data)
+            if data["event"] in TERMINAL_EVENTS:
+                return
+
+        while True:
+            if is_disconnected is not None and await is_disconnected():
+                return
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=keepalive_interval)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+
+            data = json.loads(message["data"])
+            yield format_sse(data)
+            if data["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+        except Exception as e:
+            logging.warning(f"Could not close progress subscription of task {task_id}: {e}")
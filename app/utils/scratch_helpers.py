@@ -0,0 +1,150 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Iterator, List, Optional
+
+from ..core.config_loader import config
+
+logger = logging.getLogger(__name__)
+
+class ScratchQuotaExceeded(RuntimeError):
+    """Raised when a scratch file would take the process over scratch.disk_quota."""
+
+# Bytes reserved by all open scratch spaces of this process
+_reserved_bytes = 0
+_reserved_lock = threading.Lock()
+
+def scratch_usage() -> dict:
+    """Reserved scratch bytes and the quota, for metrics."""
+    with _reserved_lock:
+        return {"reserved": _reserved_bytes, "quota": config.scratch.disk_quota}
+
+class ScratchSpace:
+    """
+    Private scratch directory for one task or request.
+
+    Every space gets its own directory, so concurrent work on files with the
+    same name never collides. Everything that can reach the disk reserves its
+    size against a per-process quota first: files written to path() with the
+    size they will have, and spooled buffers large enough to spill. Everything
+    is removed on cleanup (or when the context manager exits, even on errors).
+
+        with ScratchSpace("whisper") as scratch:
+            buffer = await scratch.spool(object_name)
+    """
+
+    def __init__(self, label: str = "task"):
+        os.makedirs(config.scratch.root, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=f"{label}-", dir=config.scratch.root)
+        self.reserved = 0
+        self._names = set()
+        self._buffers: List[tempfile.SpooledTemporaryFile] = []
+
+    def path(self, name: str, size: int = 0) -> str:
+        """
+        Unique path for a file of size bytes in this space, reserved against
+        the quota; only the basename of name is used.
+        """
+        self.reserve(size)
+        base_name = os.path.basename(name) or "file"
+        candidate, counter = base_name, 1
+        while candidate in self._names:
+            candidate = f"{counter}_{base_name}"
+            counter += 1
+        self._names.add(candidate)
+        return os.path.join(self.directory, candidate)
+
+    def reserve(self, nbytes: int) -> None:
+        """Reserve disk space for a file, or raise ScratchQuotaExceeded."""
+        global _reserved_bytes
+        with _reserved_lock:
+            if _reserved_bytes + nbytes > config.scratch.disk_quota:
+                raise ScratchQuotaExceeded(
+                    f"Scratch quota of {config.scratch.disk_quota} bytes exceeded "
+                    f"({_reserved_bytes} reserved, {nbytes} requested)"
+                )
+            _reserved_bytes += nbytes
+        self.reserved += nbytes
+
+    def spooled(self, size: int = 0, max_size: Optional[int] = None) -> tempfile.SpooledTemporaryFile:
+        """
+        Buffer for size bytes that stays in memory up to max_size bytes
+        (default: scratch.spool_max_size) and then spills to a file in this
+        space. Only a size that will spill is reserved against the quota.
+        """
+        max_size = max_size or config.scratch.spool_max_size
+        if size > max_size:
+            self.reserve(size)
+        buffer = tempfile.SpooledTemporaryFile(max_size=max_size, dir=self.directory)
+        self._buffers.append(buffer)
+        return buffer
+
+    async def spool(self, object_name: str) -> tempfile.SpooledTemporaryFile:
+        """
+        Read an object into a spooled buffer, rewound: small objects stay in
+        memory, larger ones spill to this space after reserving their size.
+        """
+        from .storage_helpers import run_storage_io, stat_object, open_object_stream, iter_object_chunks
+
+        stat = await run_storage_io(stat_object, object_name)
+        if stat is None:
+            raise FileNotFoundError(f"Object not found: {object_name}")
+        buffer = self.spooled(stat.size)
+
+        def copy() -> None:
+            for chunk in iter_object_chunks(open_object_stream(object_name)):
+                buffer.write(chunk)
+            buffer.seek(0)
+
+        await run_storage_io(copy)
+        return buffer
+
+    def cleanup(self) -> None:
+        """Close buffers, delete the directory and release the reserved quota."""
+        global _reserved_bytes
+        for buffer in self._buffers:
+            try:
+                buffer.close()
+            except Exception as e:
+                logger.warning(f"Could not close scratch buffer: {e}")
+        self._buffers = []
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+        with _reserved_lock:
+            _reserved_bytes -= self.reserved
+        self.reserved = 0
+
+    def __enter__(self) -> "ScratchSpace":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.cleanup()
+
+def request_scratch_space() -> Iterator[ScratchSpace]:
+    """FastAPI dependency: a scratch space removed once the request is done."""
+    with ScratchSpace("request") as scratch:
+        yield scratch
+
+def purge_stale_scratch(max_age: Optional[int] = None) -> int:
+    """
+    Remove scratch directories left behind by crashed processes.
+    Only directories older than max_age seconds (default: scratch.stale_after) are removed.
+    """
+    max_age = max_age or config.scratch.stale_after
+    root = config.scratch.root
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} stale scratch directories from {root}")
+    return removed
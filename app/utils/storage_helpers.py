@@ -2,81 +2,106 @@ import os
 import re
 import time
 import io
+import asyncio
+import functools
+import json
+import random
+import gzip
+import hashlib
+import heapq
 import logging
-from typing import List, Optional, BinaryIO, Union
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, BinaryIO, Union
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
 # Import MinIO libraries
 from minio import Minio
 from minio.error import S3Error
+from minio.commonconfig import CopySource
 
 # Import configuration
-from ..core.minio_config import minio_config, minio_client
+from ..core.minio_config import minio_config
+from ..core.config_loader import config
+from ..core.redis_config import get_redis_client
+from ..storage import get_storage_backend, CircuitOpenError
+from .catalog_helpers import record_object, touch_listing
+from .scratch_helpers import scratch_usage
+from .key_helpers import parse_object_key, user_prefix, upload_object_key, folder_for_kind, RESULTS_PREFIX
+
+def backoff_delay(attempt: int, retry_delay: float = 1, max_delay: float = 30) -> float:
+    """
+    Delay before the next retry: exponential backoff with full jitter,
+    so clients retrying against a degraded MinIO do not retry in lockstep.
+    """
+    return random.uniform(0, min(max_delay, retry_delay * (2 ** attempt)))
+
+# Storage backend whose bucket has been checked, set on first successful use
+storage_client = None
+
+def configure_result_expiry(client, bucket_name: str) -> None:
+    """Let the bucket expire offloaded task results after pipeline.result_retention_days."""
+    try:
+        if not client.set_prefix_expiry(bucket_name, RESULTS_PREFIX, config.pipeline.result_retention_days):
+            logging.info(f"Storage backend does not expire {RESULTS_PREFIX}; offloaded results are kept")
+    except Exception as e:
+        logging.warning(f"Could not configure expiry of {RESULTS_PREFIX}: {e}")
 
 def init_storage_client(max_retries=3, retry_delay=1):
     """
-    Get the MinIO client with retry logic if needed.
-    Returns a MinIO client and bucket information.
+    Get the storage backend client with retry logic if needed.
+    Returns the client (MinIO or local, see storage.backend) and bucket information.
     
     Args:
         max_retries: Maximum number of retry attempts
-        retry_delay: Delay in seconds between retries
+        retry_delay: Base delay in seconds for the jittered exponential backoff
     """
-    global minio_client
+    global storage_client
     bucket_name = minio_config['bucket_name']
     
-    if minio_client is None:
-        # If global client initialization failed, try again with retries
+    if storage_client is None:
         for attempt in range(max_retries):
             try:
-                # Initialize MinIO client
-                client = Minio(
-                    minio_config['endpoint'],
-                    access_key=minio_config['access_key'],
-                    secret_key=minio_config['secret_key'],
-                    secure=minio_config['secure']
-                )
+                client = get_storage_backend()
                 
                 # Create bucket if it doesn't exist
-                if not client.bucket_exists(bucket_name):
-                    client.make_bucket(bucket_name)
-                    # Set bucket policy for public access if required
-                    try:
-                        policy = {
-                            "Version": "2012-10-17",
-                            "Statement": [
-                                {
-                                    "Effect": "Allow",
-                                    "Principal": {"AWS": "*"},
-                                    "Action": ["s3:GetObject"],
-                                    "Resource": [f"arn:aws:s3:::{bucket_name}/*"]
-                                }
-                            ]
-                        }
-                        client.set_bucket_policy(bucket_name, policy)
-                        logging.info(f"Bucket {bucket_name} created and configured for public access")
-                    except Exception as e:
-                        logging.warning(f"Could not set public access policy: {e}")
+                client.ensure_bucket(bucket_name)
+                configure_result_expiry(client, bucket_name)
                 
                 # Update the global client
-                minio_client = client
+                storage_client = client
                 return {"client": client, "bucket_name": bucket_name}
             
             except Exception as e:
-                if attempt < max_retries - 1:
-                    logging.warning(f"MinIO connection attempt {attempt + 1} failed: {e}. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    # Increase delay for next retry (exponential backoff)
-                    retry_delay *= 2
+                if attempt < max_retries - 1 and not isinstance(e, CircuitOpenError):
+                    # Exponential backoff with full jitter
+                    delay = backoff_delay(attempt, retry_delay)
+                    logging.warning(f"Storage connection attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                    time.sleep(delay)
                 else:
-                    logging.error(f"Failed to connect to MinIO after {max_retries} attempts: {e}")
+                    logging.error(f"Failed to connect to storage after {max_retries} attempts: {e}")
                     raise
     else:
         # Use the global client that was already initialized
-        return {"client": minio_client, "bucket_name": bucket_name}
+        return {"client": storage_client, "bucket_name": bucket_name}
+
+# gzip level for compressed objects: close to the best ratio on JSON/text
+# at a fraction of the CPU cost of level 9
+COMPRESSION_LEVEL = 6
+GZIP_MAGIC = b"\x1f\x8b"
+
+def decode_object_bytes(data: bytes) -> bytes:
+    """
+    Return the plain content of an object body.
+    gzip-compressed objects are detected by their magic bytes, so objects
+    written before compression was enabled are returned as they are.
+    """
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data)
+    return data
 
-def upload_file(source_file_path: str, destination_blob_name: str = None, data: bytes = None, max_retries=3, retry_delay=1) -> str:
+def upload_file(source_file_path: str, destination_blob_name: str = None, data: bytes = None, max_retries=3, retry_delay=1,
+                compress: bool = False) -> str:
     """
     Upload a file to MinIO with retry logic.
     Returns the public URL to the file.
@@ -86,7 +111,8 @@ def upload_file(source_file_path: str, destination_blob_name: str = None, data:
         destination_blob_name: Name to give the file in MinIO (default: basename of source_file_path)
         data: Binary data to upload directly (bypasses reading from source_file_path)
         max_retries: Maximum number of retry attempts
-        retry_delay: Delay in seconds between retries
+        retry_delay: Base delay in seconds for the jittered exponential backoff
+        compress: Store the content gzip-compressed with Content-Encoding: gzip
     """
     if not destination_blob_name and source_file_path:
         destination_blob_name = os.path.basename(source_file_path)
@@ -94,13 +120,15 @@ def upload_file(source_file_path: str, destination_blob_name: str = None, data:
         raise ValueError("Either source_file_path or destination_blob_name must be provided")
     
     # Determine content type
-    content_type = None
-    if destination_blob_name.endswith('.mp3'):
-        content_type = 'audio/mpeg'
-    elif destination_blob_name.endswith('.wav'):
-        content_type = 'audio/wav'
-    elif destination_blob_name.endswith('.json'):
-        content_type = 'application/json'
+    content_type = get_content_type(destination_blob_name)
+    
+    metadata = None
+    if compress:
+        if data is None:
+            with open(source_file_path, 'rb') as f:
+                data = f.read()
+        data = gzip.compress(data, compresslevel=COMPRESSION_LEVEL)
+        metadata = {"Content-Encoding": "gzip"}
     
     for attempt in range(max_retries):
         try:
@@ -118,7 +146,8 @@ def upload_file(source_file_path: str, destination_blob_name: str = None, data:
                     destination_blob_name,
                     data_stream,
                     length=len(data),
-                    content_type=content_type
+                    content_type=content_type,
+                    metadata=metadata
                 )
                 logging.info(f"Data uploaded to MinIO as {destination_blob_name}")
             else:
@@ -131,23 +160,164 @@ def upload_file(source_file_path: str, destination_blob_name: str = None, data:
                 )
                 logging.info(f"File {source_file_path} uploaded to MinIO as {destination_blob_name}")
             
-            # For internal container use, use the container name
-            protocol = 'http'  # Always use HTTP for internal container communication
+            # Keep the metadata catalog in sync with the bucket
+            size = len(data) if data is not None else os.path.getsize(source_file_path)
+            if compress:
+                record_object(destination_blob_name, size, encoding="gzip")
+            else:
+                record_object(destination_blob_name, size)
+            touch_listing(destination_blob_name)
             
-            # Use the container endpoint for internal URLs
-            file_url = f"{protocol}://{minio_config['endpoint']}/{bucket_name}/{destination_blob_name}"
-            return file_url
+            return get_object_url(destination_blob_name, bucket_name)
         
         except Exception as e:
-            if attempt < max_retries - 1:
-                logging.warning(f"Upload attempt {attempt + 1} failed: {e}. Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                # Increase delay for next retry (exponential backoff)
-                retry_delay *= 2
+            if attempt < max_retries - 1 and not isinstance(e, CircuitOpenError):
+                # Exponential backoff with full jitter
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"Upload attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
             else:
                 logging.error(f"Failed to upload file after {max_retries} attempts: {e}")
                 raise
 
+def get_content_type(object_name: str) -> Optional[str]:
+    """Determine the content type of an object from its name."""
+    if object_name.endswith('.mp3'):
+        return 'audio/mpeg'
+    elif object_name.endswith('.wav'):
+        return 'audio/wav'
+    elif object_name.endswith('.m4a'):
+        return 'audio/mp4'
+    elif object_name.endswith('.json'):
+        return 'application/json'
+    return None
+
+# Part size for streamed multipart uploads (MinIO requires at least 5 MiB)
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
+class HashingReader:
+    """File-like wrapper that counts and hashes the bytes read through it."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        self.size += len(chunk)
+        self.sha256.update(chunk)
+        return chunk
+
+def upload_stream(stream: BinaryIO, destination_blob_name: str, content_type: Optional[str] = None,
+                  part_size: int = UPLOAD_PART_SIZE, max_retries=3, retry_delay=1) -> dict:
+    """
+    Stream a file-like object into MinIO without buffering it whole.
+    
+    Data is read and sent in fixed-size multipart parts, one part at a time, so
+    memory stays constant whatever the size of the stream. The size and sha256
+    are computed while streaming and the write is confirmed from the upload
+    response, so no extra stat call is needed.
+    
+    Args:
+        stream: Readable binary stream (retries require it to be seekable)
+        destination_blob_name: Name to give the file in MinIO
+        content_type: Content type (default: derived from the object name)
+        part_size: Size of each multipart part in bytes
+        max_retries: Maximum number of retry attempts
+        retry_delay: Base delay in seconds for the jittered exponential backoff
+        
+    Returns:
+        Dictionary with the object url, size, sha256 and etag
+    """
+    content_type = content_type or get_content_type(destination_blob_name) or 'application/octet-stream'
+    seekable = callable(getattr(stream, "seekable", None)) and stream.seekable()
+    start = stream.tell() if seekable else 0
+    
+    for attempt in range(max_retries):
+        try:
+            storage = init_storage_client()
+            client = storage["client"]
+            bucket_name = storage["bucket_name"]
+            
+            reader = HashingReader(stream)
+            result = client.put_object(
+                bucket_name,
+                destination_blob_name,
+                reader,
+                length=-1,
+                content_type=content_type,
+                part_size=part_size,
+                num_parallel_uploads=1
+            )
+            if not result.etag:
+                raise IOError(f"Upload of {destination_blob_name} was not acknowledged by MinIO")
+            
+            logging.info(f"Streamed {reader.size} bytes to MinIO as {destination_blob_name}")
+            sha256 = reader.sha256.hexdigest()
+            record_object(destination_blob_name, reader.size, sha256=sha256)
+            touch_listing(destination_blob_name)
+            
+            return {
+                "url": get_object_url(destination_blob_name, bucket_name),
+                "size": reader.size,
+                "sha256": sha256,
+                "etag": result.etag
+            }
+        
+        except Exception as e:
+            if attempt < max_retries - 1 and seekable and not isinstance(e, CircuitOpenError):
+                # Exponential backoff with full jitter
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"Streamed upload attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
+                stream.seek(start)
+            else:
+                logging.error(f"Failed to stream upload after {attempt + 1} attempts: {e}")
+                raise
+
+def copy_file(source_object_name: str, destination_blob_name: str, remove_source: bool = False, max_retries=3, retry_delay=1) -> str:
+    """
+    Copy an object to a new name with a server-side copy.
+    Returns the URL of the copy. Callers are responsible for cataloging it.
+    
+    Args:
+        source_object_name: Name of the existing object in MinIO
+        destination_blob_name: Name to give the copy
+        remove_source: Delete the source object once the copy succeeded (a server-side move)
+        max_retries: Maximum number of retry attempts
+        retry_delay: Base delay in seconds for the jittered exponential backoff
+    """
+    for attempt in range(max_retries):
+        try:
+            storage = init_storage_client()
+            client = storage["client"]
+            bucket_name = storage["bucket_name"]
+            
+            client.copy_object(bucket_name, destination_blob_name, CopySource(bucket_name, source_object_name))
+            logging.info(f"Copied {source_object_name} to {destination_blob_name} in MinIO")
+            touch_listing(destination_blob_name)
+            break
+        
+        except Exception as e:
+            if attempt < max_retries - 1 and not isinstance(e, CircuitOpenError):
+                # Exponential backoff with full jitter
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"Copy attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
+            else:
+                logging.error(f"Failed to copy file after {max_retries} attempts: {e}")
+                raise
+    
+    if remove_source:
+        try:
+            client.remove_object(bucket_name, source_object_name)
+        except Exception as e:
+            # The copy is in place; a leftover source object is only wasted space
+            logging.warning(f"Could not remove {source_object_name} after copying it: {e}")
+    
+    return get_object_url(destination_blob_name, bucket_name)
+
 def download_file(object_name: str, destination_path: str = None, stream: bool = False, max_retries=3, retry_delay=1) -> Union[str, io.BytesIO]:
     """
     Download a file from MinIO with retry logic.
@@ -157,7 +327,7 @@ def download_file(object_name: str, destination_path: str = None, stream: bool =
         destination_path: Local path to save the file to (default: basename of object_name)
         stream: If True, returns a BytesIO object instead of saving to disk
         max_retries: Maximum number of retry attempts
-        retry_delay: Delay in seconds between retries
+        retry_delay: Base delay in seconds for the jittered exponential backoff
         
     Returns:
         If stream=False: Path to the downloaded file (str)
@@ -191,15 +361,111 @@ def download_file(object_name: str, destination_path: str = None, stream: bool =
                 return destination_path
         
         except Exception as e:
-            if attempt < max_retries - 1:
-                logging.warning(f"Download attempt {attempt + 1} failed: {e}. Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                # Increase delay for next retry (exponential backoff)
-                retry_delay *= 2
+            if attempt < max_retries - 1 and not isinstance(e, CircuitOpenError):
+                # Exponential backoff with full jitter
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"Download attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
             else:
                 logging.error(f"Failed to download file after {max_retries} attempts: {e}")
                 raise
 
+def fetch_json_object(object_name: str, max_retries=3, retry_delay=1) -> Any:
+    """
+    Fetch an object and parse it as JSON straight from the response buffer.
+    
+    Args:
+        object_name: Name of the JSON object in MinIO
+        max_retries: Maximum number of retry attempts
+        retry_delay: Base delay in seconds for the jittered exponential backoff
+    """
+    for attempt in range(max_retries):
+        try:
+            storage = init_storage_client()
+            client = storage["client"]
+            bucket_name = storage["bucket_name"]
+            
+            response = client.get_object(bucket_name, object_name)
+            try:
+                # Outputs may be stored gzip-compressed (see upload_file)
+                return json.loads(decode_object_bytes(response.read()))
+            finally:
+                # Close the response to release the pooled connection
+                response.close()
+                response.release_conn()
+        
+        except Exception as e:
+            if attempt < max_retries - 1 and not isinstance(e, CircuitOpenError):
+                # Exponential backoff with full jitter
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"Fetch attempt {attempt + 1} for {object_name} failed: {e}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
+            else:
+                logging.error(f"Failed to fetch {object_name} after {max_retries} attempts: {e}")
+                raise
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def open_object_stream(object_name: str, offset: int = 0, length: int = 0):
+    """
+    Open an object (or a byte range of it) for streaming.
+    Returns the raw MinIO response; pass it to iter_object_chunks to read and release it.
+    
+    Args:
+        object_name: Name of the object in MinIO
+        offset: First byte to read
+        length: Number of bytes to read (0 reads to the end of the object)
+    """
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    
+    return client.get_object(bucket_name, object_name, offset=offset, length=length)
+
+def iter_object_chunks(response, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield an object response in fixed-size chunks, then release its connection."""
+    try:
+        for chunk in response.stream(chunk_size):
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+def object_sha256(object_name: str, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the sha256 of an object by streaming it in chunks."""
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    
+    digest = hashlib.sha256()
+    response = client.get_object(bucket_name, object_name)
+    try:
+        for chunk in response.stream(chunk_size):
+            digest.update(chunk)
+    finally:
+        response.close()
+        response.release_conn()
+    return digest.hexdigest()
+
+def fetch_json_objects(object_names: List[str], max_concurrency: Optional[int] = None) -> List[Any]:
+    """
+    Fetch many JSON objects concurrently, without touching the local disk.
+    
+    Args:
+        object_names: Names of the JSON objects in MinIO
+        max_concurrency: Maximum number of requests in flight (default: minio.fetch_concurrency)
+        
+    Returns:
+        The parsed documents, in the same order as object_names
+    """
+    if not object_names:
+        return []
+    
+    max_concurrency = max_concurrency or minio_config['fetch_concurrency']
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(object_names))) as executor:
+        # executor.map keeps results in input order
+        return list(executor.map(fetch_json_object, object_names))
+
 def list_files(prefix: str = '', recursive: bool = True, include_url: bool = True, max_retries=3, retry_delay=1) -> List[dict]:
     """
     List files in MinIO with the given prefix and retry logic.
@@ -210,7 +476,7 @@ def list_files(prefix: str = '', recursive: bool = True, include_url: bool = Tru
         recursive: Whether to list objects recursively in subdirectories
         include_url: Whether to include public URLs in the result
         max_retries: Maximum number of retry attempts
-        retry_delay: Delay in seconds between retries
+        retry_delay: Base delay in seconds for the jittered exponential backoff
         
     Returns:
         List of dictionaries containing file metadata
@@ -246,15 +512,125 @@ def list_files(prefix: str = '', recursive: bool = True, include_url: bool = Tru
             return files
             
         except Exception as e:
-            if attempt < max_retries - 1:
-                logging.warning(f"List files attempt {attempt + 1} failed: {e}. Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                # Increase delay for next retry (exponential backoff)
-                retry_delay *= 2
+            if attempt < max_retries - 1 and not isinstance(e, CircuitOpenError):
+                # Exponential backoff with full jitter
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"List files attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
             else:
                 logging.error(f"Failed to list files after {max_retries} attempts: {e}")
                 raise
 
+# Set by the key migration once no legacy flat keys are left at the bucket root
+MIGRATION_COMPLETE_KEY = "medvoice:migration:key_layout:complete"
+
+def legacy_keys_migrated() -> bool:
+    """Whether user listings can skip the bucket root; unknown (Redis down) means no."""
+    try:
+        return bool(get_redis_client().exists(MIGRATION_COMPLETE_KEY))
+    except Exception as e:
+        logging.warning(f"Could not read the key migration state: {e}")
+        return False
+
+def is_legacy_user_object(object_name: str, user_id: str, folder: str) -> bool:
+    """Whether a flat legacy key belongs to the user's objects of one kind."""
+    record = parse_object_key(object_name, user_id)
+    return bool(record) and record["user_id"] == user_id and folder_for_kind(record["kind"]) == folder
+
+def list_user_objects(user_id: str, folder: str) -> list:
+    """
+    List a user's objects of one kind (audio/outputs) in both key layouts.
+
+    Objects under users/{user_id}/{folder}/ come from a server-side prefix scan.
+    Legacy flat keys live at the bucket root, so a non-recursive root listing
+    picks them up without descending into the users/ tree. An object seen in
+    both layouts while the migration runs is returned once, from the new layout.
+    Once the migration has finished, the root is not listed at all.
+    """
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+
+    objects = list(client.list_objects(bucket_name, prefix=user_prefix(user_id, folder), recursive=True))
+    if legacy_keys_migrated():
+        return objects
+    seen = {os.path.basename(obj.object_name) for obj in objects}
+
+    for obj in client.list_objects(bucket_name, recursive=False):
+        if obj.is_dir or obj.object_name in seen:
+            continue
+        if is_legacy_user_object(obj.object_name, user_id, folder):
+            objects.append(obj)
+
+    return objects
+
+def list_user_objects_page(user_id: str, folder: str, start_after: Optional[str] = None, limit: Optional[int] = None) -> tuple:
+    """
+    List one page of a user's objects of one kind, ordered by file name.
+    
+    The users/{user_id}/{folder}/ prefix scan and the legacy keys at the bucket
+    root are merged into one stream ordered by file name, which is also key
+    order within each layout. The cursor is the last file name returned and
+    starts both scans after it, so an object seen in both layouts while the
+    migration runs is returned once, from the new layout, even across pages.
+    Once the migration has finished, the root is not listed at all.
+    
+    Returns:
+        (objects, next_cursor); next_cursor is None on the last page
+    """
+    if limit is None:
+        return list_user_objects(user_id, folder), None
+    
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    prefix = user_prefix(user_id, folder)
+    # Cursors used to be full keys; the file name carries the same position
+    cursor = os.path.basename(start_after) if start_after else None
+    
+    user_objects = client.list_objects(bucket_name, prefix=prefix, recursive=True,
+                                       start_after=prefix + cursor if cursor else None)
+    legacy_objects = () if legacy_keys_migrated() else (
+        obj for obj in client.list_objects(bucket_name, recursive=False, start_after=cursor)
+        if not obj.is_dir and is_legacy_user_object(obj.object_name, user_id, folder)
+    )
+    # heapq.merge is stable, so on equal names the new-layout object comes first
+    merged = heapq.merge(user_objects, legacy_objects, key=lambda obj: os.path.basename(obj.object_name))
+    
+    objects = []
+    last_name = None
+    for obj in merged:
+        name = os.path.basename(obj.object_name)
+        if name == last_name:
+            continue
+        if len(objects) == limit:
+            return objects, last_name
+        objects.append(obj)
+        last_name = name
+    
+    return objects, None
+
+async def resolve_upload_key(user_id: str, file_name: str) -> str:
+    """
+    Get the storage key of a raw upload, preferring the per-user uploads
+    prefix and falling back to the legacy key at the bucket root.
+    """
+    if "/" in file_name:
+        return file_name
+
+    storage_path = upload_object_key(user_id, file_name)
+    if await check_file_exists(storage_path):
+        return storage_path
+    return file_name
+
+def get_object_url(object_name: str, bucket_name: Optional[str] = None) -> str:
+    """
+    Build the internal URL of an object.
+    Always uses HTTP and the container endpoint for internal container communication.
+    """
+    bucket_name = bucket_name or minio_config['bucket_name']
+    return f"http://{minio_config['endpoint']}/{bucket_name}/{object_name}"
+
 def extract_path_from_url(url: str) -> Optional[str]:
     """
     Extract the path/object name from a MinIO URL.
@@ -294,9 +670,14 @@ def sort_files_by_datetime(files: List[str], pattern=r"(\d{4}-\d{2}-\d{2}_\d{2}-
     # Return only the files, sorted
     return [file for file, _ in sorted_files]
 
-async def check_file_exists(storage_path: str) -> bool:
+def remove_object(object_name: str) -> None:
+    """Delete an object from storage (blocking); deleting a missing object is not an error."""
+    storage = init_storage_client()
+    storage["client"].remove_object(storage["bucket_name"], object_name)
+
+def file_exists(storage_path: str) -> bool:
     """
-    Check if a file exists in MinIO storage.
+    Check if a file exists in MinIO storage (blocking).
     
     Args:
         storage_path: Path to the file in MinIO storage
@@ -319,4 +700,211 @@ async def check_file_exists(storage_path: str) -> bool:
         return True
     except Exception as e:
         logging.error(f"File verification failed for {storage_path}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def stat_object(object_name: str):
+    """
+    Get the metadata of an object in MinIO storage (blocking).
+    Returns None if the object does not exist.
+    """
+    storage = init_storage_client()
+    client = storage["client"]
+    bucket_name = storage["bucket_name"]
+    
+    try:
+        return client.stat_object(bucket_name, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return None
+        raise
+
+# Client used only to sign URLs handed to browsers: the signature covers the
+# host, so it must use the external endpoint. A fixed region means signing
+# is done locally without a bucket location request.
+presign_client = None
+
+def get_presign_client() -> Minio:
+    global presign_client
+    if presign_client is None:
+        presign_client = Minio(
+            minio_config['external_endpoint'],
+            access_key=minio_config['access_key'],
+            secret_key=minio_config['secret_key'],
+            secure=minio_config['secure'],
+            region=minio_config['region']
+        )
+    return presign_client
+
+def presign_upload(object_name: str, expires_in: Optional[int] = None) -> str:
+    """
+    Create a presigned PUT URL for uploading one object directly to MinIO.
+    The signature covers the exact object key, so the URL cannot write anywhere else.
+    
+    Args:
+        object_name: Key the client will upload to
+        expires_in: Lifetime of the URL in seconds (default: minio.presign_expiry)
+    """
+    if config.storage.backend != "minio":
+        raise RuntimeError("Presigned uploads require the MinIO storage backend")
+    
+    expires_in = expires_in or minio_config['presign_expiry']
+    return get_presign_client().presigned_put_object(
+        minio_config['bucket_name'],
+        object_name,
+        expires=timedelta(seconds=expires_in)
+    )
+
+# Presigned upload keys issued per user, checked when the upload is completed
+ISSUED_UPLOAD_KEY_PREFIX = "medvoice:upload"
+
+def register_issued_upload(object_name: str, user_id: str, expires_in: Optional[int] = None) -> None:
+    """Remember that object_name was issued to user_id, until some time after its URL expires."""
+    expires_in = expires_in or minio_config['presign_expiry']
+    get_redis_client().set(f"{ISSUED_UPLOAD_KEY_PREFIX}:{object_name}", user_id, ex=expires_in + 60 * 60)
+
+def is_issued_upload(object_name: str, user_id: str) -> bool:
+    """Whether object_name was issued to user_id by a presigned upload."""
+    return get_redis_client().get(f"{ISSUED_UPLOAD_KEY_PREFIX}:{object_name}") == user_id
+
+def add_upload_task(object_name: str, task_id: str) -> None:
+    """
+    Remember that task_id was submitted to process the upload object_name,
+    for as long as its submission can be deduplicated.
+    """
+    key = f"{ISSUED_UPLOAD_KEY_PREFIX}:{object_name}:tasks"
+    pipe = get_redis_client().pipeline()
+    pipe.sadd(key, task_id)
+    pipe.expire(key, config.pipeline.idempotency_ttl)
+    pipe.execute()
+
+def is_upload_task(object_name: str, task_id: str) -> bool:
+    """Whether task_id was submitted to process the upload object_name."""
+    return bool(get_redis_client().sismember(f"{ISSUED_UPLOAD_KEY_PREFIX}:{object_name}:tasks", task_id))
+
+###############################################################################
+# Async storage API
+#
+# The MinIO client is blocking. Async code (FastAPI routes, the Celery
+# pipeline coroutines) must go through these wrappers, which run each call on
+# a dedicated, bounded thread pool and retry with asyncio.sleep, so a slow
+# MinIO call never stalls the event loop.
+###############################################################################
+
+storage_executor = ThreadPoolExecutor(max_workers=minio_config['io_workers'], thread_name_prefix="storage-io")
+
+async def run_storage_io(func, *args, **kwargs):
+    """Run a blocking storage call on the storage thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, functools.partial(func, *args, **kwargs))
+
+async def retry_storage_io(operation: str, func, *args, max_attempts=3, retry_delay=1, **kwargs):
+    """
+    Run a blocking storage call on the storage thread pool, retrying with
+    jittered exponential backoff without blocking the event loop.
+    Wrapped helpers that retry on their own should be passed max_retries=1.
+    
+    Args:
+        operation: Name of the operation for log messages
+        func: Blocking function to run
+        max_attempts: Maximum number of attempts
+        retry_delay: Base delay in seconds for the jittered exponential backoff
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await run_storage_io(func, *args, **kwargs)
+        except Exception as e:
+            if attempt < max_attempts - 1 and not isinstance(e, CircuitOpenError):
+                delay = backoff_delay(attempt, retry_delay)
+                logging.warning(f"{operation} attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
+            else:
+                logging.error(f"{operation} failed after {max_attempts} attempts: {e}")
+                raise
+
+def storage_metrics() -> dict:
+    """Storage backend, connection pool, circuit breaker and thread pool metrics."""
+    metrics = {"backend": config.storage.backend}
+    if storage_client is not None:
+        metrics.update(storage_client.metrics())
+    metrics["executor"] = {
+        "max_workers": storage_executor._max_workers,
+        "threads": len(storage_executor._threads),
+        "queued": storage_executor._work_queue.qsize(),
+    }
+    metrics["scratch"] = scratch_usage()
+    return metrics
+
+async def upload_file_async(source_file_path: str, destination_blob_name: str = None, data: bytes = None, max_retries=3, retry_delay=1,
+                            compress: bool = False) -> str:
+    """Async version of upload_file."""
+    return await retry_storage_io(
+        "Upload", upload_file, source_file_path, destination_blob_name, data,
+        max_retries=1, max_attempts=max_retries, retry_delay=retry_delay, compress=compress
+    )
+
+async def upload_stream_async(stream: BinaryIO, destination_blob_name: str, content_type: Optional[str] = None,
+                              part_size: int = UPLOAD_PART_SIZE, max_retries=3, retry_delay=1) -> dict:
+    """Async version of upload_stream. Retries rewind the stream, which must then be seekable."""
+    start = stream.tell() if stream.seekable() else 0
+    
+    def upload_from_start():
+        if stream.seekable():
+            stream.seek(start)
+        return upload_stream(stream, destination_blob_name, content_type, part_size, max_retries=1)
+    
+    attempts = max_retries if stream.seekable() else 1
+    return await retry_storage_io("Streamed upload", upload_from_start, max_attempts=attempts, retry_delay=retry_delay)
+
+async def copy_file_async(source_object_name: str, destination_blob_name: str, remove_source: bool = False, max_retries=3, retry_delay=1) -> str:
+    """Async version of copy_file."""
+    return await retry_storage_io(
+        "Copy", copy_file, source_object_name, destination_blob_name, remove_source,
+        max_retries=1, max_attempts=max_retries, retry_delay=retry_delay
+    )
+
+async def download_file_async(object_name: str, destination_path: str = None, stream: bool = False, max_retries=3, retry_delay=1) -> Union[str, io.BytesIO]:
+    """Async version of download_file."""
+    return await retry_storage_io(
+        "Download", download_file, object_name, destination_path, stream,
+        max_retries=1, max_attempts=max_retries, retry_delay=retry_delay
+    )
+
+async def fetch_json_objects_async(object_names: List[str], max_concurrency: Optional[int] = None) -> List[Any]:
+    """
+    Async version of fetch_json_objects.
+    At most max_concurrency fetches are in flight; results keep the input order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or minio_config['fetch_concurrency'])
+    
+    async def fetch(object_name: str) -> Any:
+        async with semaphore:
+            return await retry_storage_io("Fetch", fetch_json_object, object_name, max_retries=1)
+    
+    return await asyncio.gather(*(fetch(object_name) for object_name in object_names))
+
+async def list_user_objects_async(user_id: str, folder: str, max_retries=3, retry_delay=1) -> list:
+    """Async version of list_user_objects."""
+    return await retry_storage_io(
+        "List user objects", list_user_objects, user_id, folder,
+        max_attempts=max_retries, retry_delay=retry_delay
+    )
+
+async def list_user_objects_page_async(user_id: str, folder: str, start_after: Optional[str] = None, limit: Optional[int] = None,
+                                       max_retries=3, retry_delay=1) -> tuple:
+    """Async version of list_user_objects_page."""
+    return await retry_storage_io(
+        "List user objects", list_user_objects_page, user_id, folder, start_after, limit,
+        max_attempts=max_retries, retry_delay=retry_delay
+    )
+
+async def check_file_exists(storage_path: str) -> bool:
+    """
+    Check if a file exists in MinIO storage without blocking the event loop.
+    
+    Args:
+        storage_path: Path to the file in MinIO storage
+        
+    Returns:
+        bool: True if file exists, False otherwise
+    """
+    return await run_storage_io(file_exists, storage_path)
@@ -0,0 +1,103 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from ..core.config_loader import config
+from ..core.redis_config import get_async_redis_client
+from .key_helpers import task_result_object_key
+from .progress_helpers import progress_key
+from .storage_helpers import upload_file, fetch_json_object
+
+# Field of the pipeline result holding the (possibly large) extraction
+OUTPUT_FIELD = "llama3_json_output"
+
+# Key prefix of the Celery Redis result backend
+CELERY_TASK_META_PREFIX = "celery-task-meta-"
+
+def summarize_output(output: Any) -> Dict[str, Any]:
+    """Small description of an offloaded output, kept in the result backend."""
+    if isinstance(output, dict):
+        return {"type": "object", "keys": list(output)[:50]}
+    if isinstance(output, list):
+        return {"type": "array", "length": len(output)}
+    return {"type": type(output).__name__}
+
+def offload_task_result(result: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+    """
+    Keep a task result small enough for the Celery result backend.
+
+    If the output serializes to more than pipeline.result_inline_max_bytes,
+    it is stored gzip-compressed at results/{task_id}.json and the result
+    keeps a pointer (result_object), its size and a summary instead.
+    """
+    if OUTPUT_FIELD not in result or not task_id:
+        return result
+
+    payload = json.dumps(result[OUTPUT_FIELD], separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if len(payload) <= config.pipeline.result_inline_max_bytes:
+        return result
+
+    object_name = task_result_object_key(task_id)
+    upload_file(None, object_name, data=payload, compress=True)
+
+    compact = {key: value for key, value in result.items() if key != OUTPUT_FIELD}
+    compact.update({
+        "result_object": object_name,
+        "result_size": len(payload),
+        "result_summary": summarize_output(result[OUTPUT_FIELD]),
+    })
+    return compact
+
+def load_task_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Result with its output, fetched from the bucket if it was offloaded."""
+    if "result_object" not in result:
+        return result
+    return {**result, OUTPUT_FIELD: fetch_json_object(result["result_object"])}
+
+def compact_task_status(meta: Optional[str], progress: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Short status of a task from its raw result backend entry and latest
+    progress event: the state, the progress of unfinished tasks, and file_id,
+    transcript_url or error once finished. The output itself is left to
+    GET /get_audio_task/{task_id}.
+    """
+    # No backend entry yet: the task is queued (or the id is unknown)
+    meta = json.loads(meta) if meta else {"status": "PENDING"}
+    status = {"status": meta["status"]}
+    result = meta.get("result")
+
+    if meta["status"] == "SUCCESS" and isinstance(result, dict):
+        if "error" in result:
+            # Pipeline errors are passed through as results
+            status.update({"status": "FAILURE", "error": result["error"]})
+        else:
+            status["file_id"] = result.get("file_id")
+            if result.get("transcript_url"):
+                status["transcript_url"] = result["transcript_url"]
+            if "result_object" in result:
+                status["result_offloaded"] = True
+    elif meta["status"] == "FAILURE":
+        # Celery stores exceptions as {"exc_type", "exc_message": [args]}
+        message = result.get("exc_message") if isinstance(result, dict) else result
+        if isinstance(message, list):
+            message = " ".join(str(arg) for arg in message)
+        status["error"] = str(message)
+    elif progress:
+        status["progress"] = json.loads(progress).get("event")
+    return status
+
+async def get_task_statuses(task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compact statuses of many tasks with a single MGET of their result backend
+    entries and progress events (one Redis round trip however many tasks).
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    if not task_ids:
+        return {}
+    keys = [f"{CELERY_TASK_META_PREFIX}{task_id}" for task_id in task_ids]
+    keys += [progress_key(task_id) for task_id in task_ids]
+    values = await get_async_redis_client().mget(keys)
+    metas, progress = values[:len(task_ids)], values[len(task_ids):]
+    return {
+        task_id: compact_task_status(meta, event)
+        for task_id, meta, event in zip(task_ids, metas, progress)
+    }
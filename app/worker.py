@@ -1,18 +1,37 @@
-import os, re, asyncio
-from typing import Optional, Dict, Any, Tuple
-from celery import Celery
+import os, re, uuid, asyncio, logging
+import httpx
+import urllib3
+from typing import Optional, Dict, Any, List, Tuple
+from celery import Celery, chain, states
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from fastapi import HTTPException, UploadFile
+from minio.error import S3Error
+from replicate.exceptions import ModelError, ReplicateError
 
 from .utils.storage_helpers import *
 from .utils.file_helpers import *
 from .utils.json_helpers import *
+from .utils.scratch_helpers import purge_stale_scratch
+from .utils.event_loop_helpers import get_worker_loop, stop_worker_loop
+from .utils.progress_helpers import publish_progress
+from .utils.idempotency_helpers import claim_submission, release_submission, SubmissionInProgress
+from .utils.fair_share_helpers import enqueue_fair, next_fair_job, requeue_fair, release_slot
+from .utils.task_result_helpers import offload_task_result
+from .utils.checkpoint_helpers import save_checkpoint, load_checkpoint
+from .utils.scratch_helpers import ScratchQuotaExceeded
+from .llm.rate_limiter import RateLimitTimeout
+from .llm.result_cache import checkpoint_fingerprint
+from .llm.reextraction import reextract_outputs
 from .core.minio_config import minio_config
+from .core.config_loader import config
 from .models.request_enum import *
 
 # API Router
 from .api.v1.endpoints.post.llm import *
 from .api.v1.endpoints.get.minio_storage import *
 
+logger = logging.getLogger(__name__)
+
 # In app/worker.py
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 
@@ -26,16 +45,73 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Large outputs are offloaded to the bucket; results only stay in Redis this long
+    result_expires=config.pipeline.result_expires,
+    # Pipeline stages are long-running: fetch one message at a time
+    worker_prefetch_multiplier=1,
+    # Priority lists per queue on the Redis broker; lower numbers are consumed first
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+    },
+    # Each pipeline stage has its own queue so it can be scaled independently
+    task_routes={
+        "pipeline.ingest": {"queue": "ingest"},
+        "pipeline.transcribe": {"queue": "transcribe"},
+        "pipeline.extract": {"queue": "extract"},
+        "pipeline.persist": {"queue": "persist"},
+    },
+    # Run by celery beat: restarts fair-share dispatch if no pipeline finishes
+    # (e.g. slots freed by expired leases of lost workers)
+    beat_schedule={
+        "dispatch-fair-share": {
+            "task": "maintenance.dispatch_fair_share",
+            "schedule": 30.0,
+        },
+    },
 )
 
+# Celery priority of each TaskPriority: interactive recordings overtake bulk
+# reprocessing at every stage, so backfills do not delay users
+TASK_PRIORITIES = {
+    TaskPriority.interactive: 0,
+    TaskPriority.bulk: 9,
+}
+
+def task_priority(priority) -> int:
+    return TASK_PRIORITIES[TaskPriority(priority)]
+
+# Grace period between the soft time limit (raised inside the task) and the hard kill
+HARD_TIME_LIMIT_GRACE = 30
+
 # Autodiscover tasks in the 'app' package, specifically looking in 'main.py'
 celery_app.autodiscover_tasks()
 
+@worker_init.connect
+def purge_scratch_on_start(**kwargs):
+    """Remove scratch directories left behind by a previous worker that crashed."""
+    purge_stale_scratch()
+
+@worker_process_init.connect
+def start_event_loop(**kwargs):
+    """Start the long-lived event loop of each prefork child process."""
+    get_worker_loop()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_event_loop(**kwargs):
+    stop_worker_loop()
 
-async def handle_uploaded_file_case(user_id: str, file_path: str, file_metadata: dict) -> Tuple[str, str, str, str]:
+
+async def handle_uploaded_file_case(user_id: str, file_path: str, file_metadata: dict,
+                                    date_string: Optional[str] = None) -> Tuple[str, str, str, str]:
     """Handle the case when a file is uploaded directly."""
     try:
-        audio_file = await fetch_and_store_audio(user_id, file_metadata["filename"])
+        storage_path = file_metadata.get("storage_path") or await resolve_upload_key(user_id, file_metadata["filename"])
+        audio_file = await fetch_and_store_audio(
+            user_id, storage_path, size=file_metadata.get("size"), sha256=file_metadata.get("sha256"),
+            date_string=date_string
+        )
         file_id, audio_file_path = audio_file["file_id"], audio_file["new_file_name"]
         
         # Construct MinIO URL
@@ -60,20 +136,18 @@ async def handle_uploaded_file_case(user_id: str, file_path: str, file_metadata:
 
 async def handle_file_id_case(file_id: str, file_extension: AudioExtension) -> Tuple[str, str, str]:
     """Handle the case when a file_id is provided."""
-    file_url = await get_audio(file_id, file_extension)
-    audio_file_path = extract_audio_path(file_url)
-    
-    pattern = r"/(.*?)patient_"
-    match = re.search(pattern, audio_file_path)
-    patient_name = None
-    if match:
-        patient_name = match.group(1)
+    record = await find_audio_object(file_id, file_extension)
+    audio_file_path = record["object_key"]
+    file_url = get_object_url(audio_file_path)
+    patient_name = record["patient_name"] or None
         
     return audio_file_path, file_url, patient_name
 
-async def handle_user_file_case(user_id: str, file_name: str) -> Tuple[str, str, str, str]:
+async def handle_user_file_case(user_id: str, file_name: str,
+                                date_string: Optional[str] = None) -> Tuple[str, str, str, str]:
     """Handle the case when user_id and file_name are provided."""
-    audio_file = await fetch_and_store_audio(user_id, file_name)
+    storage_path = await resolve_upload_key(user_id, file_name)
+    audio_file = await fetch_and_store_audio(user_id, storage_path, date_string=date_string)
     file_id, audio_file_path = audio_file["file_id"], audio_file["new_file_name"]
     
     # Construct MinIO URL using internal container endpoint
@@ -85,16 +159,13 @@ async def handle_user_file_case(user_id: str, file_name: str) -> Tuple[str, str,
     return file_id, audio_file_path, file_url, patient_name
 
 async def process_audio_output(llama3_json_output: Dict[str, Any], file_id: str, user_id: str, 
-                             file_name: str, audio_file_path: str) -> Dict[str, Any]:
+                             file_name: str) -> Dict[str, Any]:
     """Process and save the audio output."""
     # Generate and upload output file - generate_output_filename now handles the upload
-    transcript_url = generate_output_filename(
-        llama3_json_output, file_id, user_id, file_name
+    transcript_url = await run_storage_io(
+        generate_output_filename, llama3_json_output, file_id, user_id, file_name
     )
     
-    # Clean up any remaining local files
-    remove_local_file(audio_file_path)
-    
     return {
         "file_id": file_id, 
         "llama3_json_output": llama3_json_output,
@@ -108,55 +179,444 @@ async def process_audio_background(
     file_name: Optional[str] = None,
     file_path: Optional[str] = None,
     file_metadata: Optional[dict] = None,
+    bypass_cache: bool = False,
 ):
-    """Main audio processing function."""
+    """
+    Main audio processing function: the pipeline stages run back to back in
+    one task, reusing the same result cache and checkpoints.
+    """
     try:
-        # Initialize variables
-        patient_name = None
-        audio_file_path = None
-        file_url = None
-        
-        # Handle different input cases
-        if user_id and file_path and file_metadata:
-            file_id, audio_file_path, file_url, patient_name = await handle_uploaded_file_case(user_id, file_path, file_metadata)
-        elif file_id:
-            audio_file_path, file_url, patient_name = await handle_file_id_case(file_id, file_extension)
-            file_name = patient_name.replace("patient_", "") if patient_name else None
-        elif user_id and file_name:
-            file_id, audio_file_path, file_url, patient_name = await handle_user_file_case(user_id, file_name)
-
-        # Process audio with LLM
-        llama3_json_output = await llm_pipeline_audio_to_json(file_url, patient_name)
-        
+        job = await ingest_audio({
+            "file_id": file_id,
+            "file_extension": getattr(file_extension, "value", file_extension),
+            "user_id": user_id,
+            "file_name": file_name,
+            "file_path": file_path,
+            "file_metadata": file_metadata,
+            "bypass_cache": bypass_cache,
+        })
+        job = await extract_job(await transcribe_job(job))
+
         # Handle output and cleanup
-        return await process_audio_output(llama3_json_output, file_id, user_id, file_name, audio_file_path)
+        return await process_audio_output(job["extraction"], job["file_id"], job["user_id"], job["file_name"])
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@celery_app.task(name="process_audio_task")
+@celery_app.task(name="process_audio_task", bind=True)
 def process_audio_task(
+    self,
     file_id: Optional[str] = None,
     file_extension: str = "m4a",
     user_id: Optional[str] = None,
     file_name: Optional[str] = None,
     file_path: Optional[str] = None,
     file_metadata: Optional[dict] = None,
+    bypass_cache: bool = False,
 ):
     try:
-        # Run the async function in an event loop
-        loop = asyncio.get_event_loop()
-        result = loop.run_until_complete(
+        # Run on the process's long-lived event loop, concurrently with other tasks
+        result = run_async(
             process_audio_background(
                 file_id=file_id,
                 file_extension=file_extension,
                 user_id=user_id,
                 file_name=file_name,
                 file_path=file_path,
-                file_metadata=file_metadata
+                file_metadata=file_metadata,
+                bypass_cache=bypass_cache
             )
         )
-        return result
+        return offload_task_result(result, self.request.id)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+###############################################################################
+# Staged audio pipeline
+#
+# The pipeline runs as a chain of ingest -> transcribe -> extract -> persist
+# tasks, each on its own queue with its own time limit, so a worker slot is
+# only held for one stage. Stages pass a JSON job dict along the chain.
+# A failing stage records {"error": ...} in the job and the later stages pass
+# it through, so the result of the last task always reports the outcome.
+###############################################################################
+
+def run_async(coro, timeout: Optional[float] = None):
+    """
+    Run a coroutine to completion from a Celery task.
+
+    The coroutine runs on the worker process's long-lived event loop, so with
+    `--pool threads` one process overlaps the Replicate and MinIO awaits of
+    many tasks. The calling pool thread blocks until the coroutine is done, so
+    a process runs at most min(--concurrency, pipeline.max_concurrent) at once.
+    """
+    return get_worker_loop().run(coro, timeout=timeout)
+
+# Progress events published when a stage starts or finishes (see progress_helpers)
+STAGE_STARTED_EVENTS = {"transcribe": "transcribing", "extract": "extracting"}
+STAGE_FINISHED_EVENTS = {"ingest": "uploaded", "persist": "saved"}
+
+class StageRetry(RuntimeError):
+    """Raised by run_stage so Celery retries a stage after a transient failure."""
+
+class InvalidExtraction(RuntimeError):
+    """The LLM returned output that could not be parsed; worth another attempt."""
+
+def is_transient_error(error: Exception) -> bool:
+    """Failures a retry of the same stage can fix (network, rate limits, 5xx, bad LLM output)."""
+    if isinstance(error, (ConnectionError, RateLimitTimeout, ScratchQuotaExceeded, InvalidExtraction,
+                          ModelError, httpx.TransportError, urllib3.exceptions.HTTPError)):
+        return True
+    if isinstance(error, S3Error):
+        status = getattr(error.response, "status", None)
+        return status is None or status >= 500
+    if isinstance(error, ReplicateError):
+        return error.status is None or error.status == 429 or error.status >= 500
+    return False
+
+def run_stage(stage: str, job: Dict[str, Any], stage_coro, task=None) -> Dict[str, Any]:
+    """
+    Run one pipeline stage on a job, or pass an earlier error through.
+
+    With the stage's Celery task, a transient failure raises StageRetry while
+    retries are left, so Celery retries just this stage with backoff; the
+    job it retries with already holds the earlier stages' outputs.
+    """
+    if "error" in job:
+        return job
+    task_id = job.get("task_id")
+    if stage in STAGE_STARTED_EVENTS:
+        publish_progress(task_id, STAGE_STARTED_EVENTS[stage], stage=stage, file_id=job.get("file_id"))
+    try:
+        # Celery only enforces time limits in prefork children; also bound the coroutine itself
+        result = run_async(stage_coro(job), timeout=getattr(config.pipeline, f"{stage}_time_limit"))
+    except asyncio.TimeoutError:
+        logger.exception(f"Pipeline stage {stage} timed out for {job.get('file_id')}")
+        result = {"error": f"Stage {stage} timed out", "stage": stage, "file_id": job.get("file_id")}
+    except Exception as e:
+        if task is not None and is_transient_error(e) and task.request.retries < task.max_retries:
+            attempt = task.request.retries + 1
+            logger.warning(f"Pipeline stage {stage} failed for {job.get('file_id')} (attempt {attempt}), retrying: {e}")
+            publish_progress(task_id, "retrying", stage=stage, file_id=job.get("file_id"), attempt=attempt, error=str(e))
+            raise StageRetry(f"{stage}: {e}") from e
+        logger.exception(f"Pipeline stage {stage} failed for {job.get('file_id')}: {e}")
+        result = {"error": str(e), "stage": stage, "file_id": job.get("file_id")}
+
+    if "error" in result:
+        publish_progress(task_id, "failed", stage=stage, file_id=result.get("file_id"), error=result["error"])
+    elif stage in STAGE_FINISHED_EVENTS:
+        details = {"transcript_url": result.get("transcript_url")} if stage == "persist" else {}
+        publish_progress(task_id, STAGE_FINISHED_EVENTS[stage], stage=stage, file_id=result.get("file_id"), **details)
+
+    # Finished either way: a repeated submission may start a new run now,
+    # and the freed slot goes to the next user's queued pipeline
+    if "error" in result or stage == "persist":
+        release_submission(job.get("idempotency_key"), task_id)
+        if job.get("fair_share_user"):
+            release_slot(job["fair_share_user"], task_id)
+            try:
+                dispatch_fair_share()
+            except Exception as e:
+                logger.exception(f"Could not dispatch queued pipelines: {e}")
+    return result
+
+def stage_task_options(stage: str) -> Dict[str, Any]:
+    """
+    Time limits and automatic retries (exponential backoff with jitter) of a stage task.
+    Celery enforces the time limits only in prefork children; run_stage bounds
+    the coroutine with the same soft limit on every pool.
+    """
+    soft_time_limit = getattr(config.pipeline, f"{stage}_time_limit")
+    return {
+        "bind": True,
+        "soft_time_limit": soft_time_limit,
+        "time_limit": soft_time_limit + HARD_TIME_LIMIT_GRACE,
+        "autoretry_for": (StageRetry,),
+        "max_retries": config.pipeline.stage_max_retries,
+        "retry_backoff": config.pipeline.retry_backoff,
+        "retry_backoff_max": config.pipeline.retry_backoff_max,
+        "retry_jitter": True,
+    }
+
+async def ingest_audio(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resolve the input, copy the audio into the user's audio prefix and build its URL.
+
+    The audio object name (and so the file_id) comes from the ingest_date
+    fixed when the chain was built, so a retried ingest overwrites the same
+    copy and catalog entry, and later stages find the same checkpoints.
+    """
+    file_id, file_name, user_id = job.get("file_id"), job.get("file_name"), job.get("user_id")
+    file_path, file_metadata = job.get("file_path"), job.get("file_metadata")
+    date_string = job.get("ingest_date")
+
+    if user_id and file_path and file_metadata:
+        file_id, audio_file_path, file_url, patient_name = await handle_uploaded_file_case(
+            user_id, file_path, file_metadata, date_string
+        )
+    elif file_id:
+        audio_file_path, file_url, patient_name = await handle_file_id_case(file_id, job.get("file_extension") or "m4a")
+        file_name = patient_name.replace("patient_", "") if patient_name else None
+    elif user_id and file_name:
+        file_id, audio_file_path, file_url, patient_name = await handle_user_file_case(user_id, file_name, date_string)
+    else:
+        raise ValueError("Either file_id, user_id and file_name, or an uploaded file must be provided")
+
+    return {
+        "file_id": file_id,
+        "user_id": user_id,
+        "file_name": file_name,
+        "audio_file_path": audio_file_path,
+        "file_url": file_url,
+        "patient_name": patient_name,
+        "bypass_cache": job.get("bypass_cache", False),
+        "task_id": job.get("task_id"),
+        "idempotency_key": job.get("idempotency_key"),
+        "fair_share_user": job.get("fair_share_user"),
+    }
+
+def checkpoint_owner(job: Dict[str, Any]) -> Optional[str]:
+    # With bypass_cache only this task's own checkpoints (from earlier attempts) are reused
+    return job.get("task_id") if job.get("bypass_cache") else None
+
+async def load_job_checkpoint(job: Dict[str, Any], stage: str) -> Optional[Any]:
+    if job.get("bypass_cache") and not job.get("task_id"):
+        return None
+    try:
+        return await run_storage_io(
+            load_checkpoint, job.get("user_id"), job["file_id"], stage,
+            checkpoint_fingerprint(stage, job.get("patient_name")), checkpoint_owner(job)
+        )
+    except Exception as e:
+        # A missing checkpoint only costs the stage's work again
+        logger.warning(f"Could not read {stage} checkpoint of {job['file_id']}: {e}")
+        return None
+
+async def save_job_checkpoint(job: Dict[str, Any], stage: str, data: Any) -> None:
+    try:
+        await run_storage_io(
+            save_checkpoint, job.get("user_id"), job["file_id"], stage,
+            checkpoint_fingerprint(stage, job.get("patient_name")), data, job.get("task_id"),
+            {"patient_name": job.get("patient_name"), "file_name": job.get("file_name")}
+        )
+    except Exception as e:
+        logger.exception(f"Could not write {stage} checkpoint of {job['file_id']}: {e}")
+
+async def transcribe_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Take the extraction from the result cache, or the diarization from a
+    checkpoint of an earlier run, or run Whisper and checkpoint its output.
+    """
+    lookup = await lookup_cached_extraction(job["file_url"], job["patient_name"], job["bypass_cache"])
+    if lookup["extraction"] is not None:
+        return {**job, **lookup}
+
+    diarization = await load_job_checkpoint(job, "diarization")
+    if diarization is not None:
+        logger.info(f"Resuming {job['file_id']} from its diarization checkpoint")
+    else:
+        diarization = await whisper_diarization(job["file_url"])
+        await save_job_checkpoint(job, "diarization", diarization)
+    return {**job, "cache_key": lookup["cache_key"], "diarization": diarization}
+
+async def extract_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the medical JSON from the diarization (skipped on a cache hit or checkpoint)."""
+    if "extraction" not in job:
+        extraction = await load_job_checkpoint(job, "extraction")
+        if extraction is None:
+            extraction = await extract_medical_json(job["diarization"], job["patient_name"], job["cache_key"])
+            if isinstance(extraction, dict) and "error" in extraction:
+                raise InvalidExtraction(extraction["error"])
+            await save_job_checkpoint(job, "extraction", extraction)
+        job["extraction"] = extraction
+    # The diarization is not needed past this stage; keep messages small
+    job.pop("diarization", None)
+    return job
+
+async def persist_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Upload the output; returns the same result as process_audio_task (large outputs offloaded)."""
+    result = await process_audio_output(job["extraction"], job["file_id"], job["user_id"], job["file_name"])
+    return await run_storage_io(offload_task_result, result, job.get("task_id"))
+
+@celery_app.task(name="pipeline.ingest", **stage_task_options("ingest"))
+def ingest_audio_task(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    return run_stage("ingest", job, ingest_audio, task=self)
+
+@celery_app.task(name="pipeline.transcribe", **stage_task_options("transcribe"))
+def transcribe_audio_task(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    return run_stage("transcribe", job, transcribe_job, task=self)
+
+@celery_app.task(name="pipeline.extract", **stage_task_options("extract"))
+def extract_audio_task(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    return run_stage("extract", job, extract_job, task=self)
+
+@celery_app.task(name="pipeline.persist", **stage_task_options("persist"))
+def persist_audio_task(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    return run_stage("persist", job, persist_job, task=self)
+
+@celery_app.task(name="maintenance.reextract")
+def reextract_outputs_task(
+    user_id: Optional[str] = None,
+    concurrency: int = 8,
+    batch_size: int = 100,
+    force: bool = False,
+    reset: bool = False,
+):
+    """Re-run the extraction over stored diarizations (see app.llm.reextraction)."""
+    try:
+        return run_async(reextract_outputs(
+            user_id=user_id, concurrency=concurrency, batch_size=batch_size, force=force, reset=reset
+        ))
     except Exception as e:
         return {"error": str(e)}
+
+def audio_pipeline(
+    file_id: Optional[str] = None,
+    file_extension: str = "m4a",
+    user_id: Optional[str] = None,
+    file_name: Optional[str] = None,
+    file_path: Optional[str] = None,
+    file_metadata: Optional[dict] = None,
+    bypass_cache: bool = False,
+    priority: TaskPriority = TaskPriority.interactive,
+    task_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    fair_share_user: Optional[str] = None,
+):
+    """
+    Build the staged pipeline chain; takes the same arguments as process_audio_task.
+    The last stage's task id is chosen up front and carried in the job, so every
+    stage publishes its progress events under the id the client tracks.
+    Every stage is sent with the Celery priority of the given TaskPriority.
+    Pipelines started by the fair-share dispatcher carry their user's slot.
+    """
+    task_id = task_id or str(uuid.uuid4())
+    job = {
+        "file_id": file_id,
+        "file_extension": getattr(file_extension, "value", file_extension),
+        "user_id": user_id,
+        "file_name": file_name,
+        "file_path": file_path,
+        "file_metadata": file_metadata,
+        "bypass_cache": bypass_cache,
+        "task_id": task_id,
+        "idempotency_key": idempotency_key,
+        "fair_share_user": fair_share_user,
+        # Fixes the stored audio name and file_id across retries of the ingest stage
+        "ingest_date": audio_date_string(),
+    }
+    celery_priority = task_priority(priority)
+    return chain(
+        ingest_audio_task.s(job).set(priority=celery_priority),
+        transcribe_audio_task.s().set(priority=celery_priority),
+        extract_audio_task.s().set(priority=celery_priority),
+        persist_audio_task.s().set(task_id=task_id, priority=celery_priority),
+    )
+
+def enqueue_audio_pipelines(batch: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Start the staged pipeline for several recordings (audio_pipeline keyword
+    arguments each). Returns the AsyncResults of their last stages, in order,
+    whose results match process_audio_task's.
+
+    With fair_share enabled the pipelines wait in their users' queues (all
+    queued in one Redis round trip, then dispatched once) until the dispatcher
+    gives them slots; interactive recordings go ahead of the user's bulk work.
+    Without Redis they start right away. Blocks on Redis and the broker: call
+    it from async code through run_storage_io.
+    """
+    if config.fair_share.enabled:
+        entries = []
+        for kwargs in batch:
+            kwargs = dict(kwargs)
+            task_id = kwargs.pop("task_id", None) or str(uuid.uuid4())
+            priority = TaskPriority(kwargs.get("priority", TaskPriority.interactive))
+            pipeline_kwargs = {name: getattr(value, "value", value) for name, value in kwargs.items()}
+            entries.append((kwargs.get("user_id"), task_id, pipeline_kwargs, priority == TaskPriority.interactive))
+        try:
+            enqueue_fair(entries)
+        except Exception as e:
+            logger.exception(f"Could not queue pipelines for fair-share dispatch, starting them directly: {e}")
+            batch = [{**pipeline_kwargs, "task_id": task_id} for _, task_id, pipeline_kwargs, _ in entries]
+        else:
+            for _, task_id, _, _ in entries:
+                publish_progress(task_id, "queued")
+            try:
+                dispatch_fair_share()
+            except Exception as e:
+                logger.exception(f"Could not dispatch queued pipelines: {e}")
+            return [celery_app.AsyncResult(task_id) for _, task_id, _, _ in entries]
+
+    results = []
+    for kwargs in batch:
+        result = audio_pipeline(**kwargs).apply_async()
+        publish_progress(result.id, "queued")
+        results.append(result)
+    return results
+
+def enqueue_audio_pipeline(**kwargs):
+    """
+    Start the staged pipeline for one recording (see enqueue_audio_pipelines).
+    Returns the AsyncResult of the last stage, whose result matches process_audio_task's.
+    """
+    return enqueue_audio_pipelines([kwargs])[0]
+
+def dispatch_fair_share() -> int:
+    """
+    Start queued pipelines while slots are free, round robin across users
+    (see fair_share_helpers). Runs after every submission and every finished
+    pipeline, and periodically to recover slots of lost workers.
+    Returns the number of pipelines started.
+    """
+    started = 0
+    while (picked := next_fair_job()) is not None:
+        user, job = picked
+        try:
+            audio_pipeline(**job["kwargs"], task_id=job["task_id"], fair_share_user=user).apply_async()
+        except Exception:
+            requeue_fair(user, job)
+            raise
+        started += 1
+    return started
+
+@celery_app.task(name="maintenance.dispatch_fair_share")
+def dispatch_fair_share_task() -> int:
+    return dispatch_fair_share()
+
+def is_task_active(task_id: str) -> bool:
+    """Whether a pipeline is still queued or running (its last stage has not finished)."""
+    return celery_app.AsyncResult(task_id).state not in states.READY_STATES
+
+def submit_audio_pipeline(idempotency_key: Optional[str] = None, task_id: Optional[str] = None,
+                          **kwargs) -> Tuple[Any, bool]:
+    """
+    Start the staged pipeline unless the same submission is already queued or running.
+
+    Returns the AsyncResult to track and whether it belongs to an earlier
+    submission. Without Redis, submissions are not deduplicated. Blocks on
+    Redis and the broker: call it from async code through run_storage_io.
+    A task_id chosen by the caller is used if this submission starts a run.
+    """
+    task_id = task_id or str(uuid.uuid4())
+    if idempotency_key is None:
+        return enqueue_audio_pipeline(**kwargs, task_id=task_id), False
+
+    try:
+        existing = claim_submission(idempotency_key, task_id, is_task_active)
+    except SubmissionInProgress:
+        raise
+    except Exception as e:
+        logger.exception(f"Could not check idempotency key, enqueueing without deduplication: {e}")
+        return enqueue_audio_pipeline(**kwargs, task_id=task_id), False
+
+    if existing is not None:
+        logger.info(f"Duplicate submission, returning existing task {existing}")
+        return celery_app.AsyncResult(existing), True
+
+    try:
+        return enqueue_audio_pipeline(**kwargs, task_id=task_id, idempotency_key=idempotency_key), False
+    except Exception:
+        release_submission(idempotency_key, task_id)
+        raise
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+import logging
+
+# Add project root to path to enable imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.utils.migration_helpers import migrate_legacy_keys
+
+def main():
+    """Rewrite legacy flat object keys into the per-user key layout"""
+    parser = argparse.ArgumentParser(description="Migrate legacy MedVoice object keys to users/{user_id}/... prefixes.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Objects handled per batch")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to wait between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--reset", action="store_true", help="Ignore the saved checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = migrate_legacy_keys(
+        batch_size=args.batch_size,
+        max_batches=args.max_batches,
+        pause=args.pause,
+        dry_run=args.dry_run,
+        reset=args.reset,
+    )
+    print(
+        f"Migrated {stats['migrated']}, skipped {stats['skipped']}, failed {stats['failed']} "
+        f"in {stats['batches']} batches ({'finished' if stats['finished'] else 'resumable'})"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+import logging
+
+# Add project root to path to enable imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.utils.catalog_helpers import rebuild_catalog
+
+def main():
+    """Backfill the object metadata catalog from an existing bucket"""
+    parser = argparse.ArgumentParser(description="Rebuild the MedVoice storage catalog from the bucket.")
+    parser.add_argument("--prefix", default="", help="Only catalog objects under this prefix")
+    parser.add_argument("--batch-size", type=int, default=500, help="Catalog writes per Redis pipeline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = rebuild_catalog(prefix=args.prefix, batch_size=args.batch_size)
+    print(f"Scanned {stats['scanned']} objects, cataloged {stats['cataloged']}")
+
+if __name__ == "__main__":
+    main()
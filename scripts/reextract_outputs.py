@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import os
+import sys
+import asyncio
+import argparse
+import logging
+
+# Add project root to path to enable imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.llm.reextraction import reextract_outputs
+
+def main():
+    """Re-run the Llama extraction over stored diarization checkpoints"""
+    parser = argparse.ArgumentParser(
+        description="Refresh MedVoice patient JSONs after a prompt or model change, without re-transcribing."
+    )
+    parser.add_argument("--user-id", default=None, help="Only re-extract this user's recordings (default: all users)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Extractions running at once")
+    parser.add_argument("--batch-size", type=int, default=100, help="Recordings per checkpointed batch")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    parser.add_argument("--force", action="store_true", help="Also re-extract recordings that are already current")
+    parser.add_argument("--reset", action="store_true", help="Ignore the saved checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stats = asyncio.run(reextract_outputs(
+        user_id=args.user_id,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        max_batches=args.max_batches,
+        force=args.force,
+        reset=args.reset,
+    ))
+    print(
+        f"Re-extracted {stats['reextracted']}, skipped {stats['skipped']}, failed {stats['failed']} "
+        f"in {stats['batches']} batches, {stats.get('elapsed', 0)}s ({stats.get('per_minute', 0)}/min, "
+        f"{'finished' if stats['finished'] else 'resumable'})"
+    )
+
+if __name__ == "__main__":
+    main()
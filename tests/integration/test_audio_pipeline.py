@@ -0,0 +1,123 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.worker import (
+    celery_app,
+    audio_pipeline,
+    run_stage,
+    transcribe_job,
+    extract_job,
+    ingest_audio,
+    StageRetry,
+    InvalidExtraction,
+)
+
+def test_pipeline_stages_use_their_own_queues():
+    """Each stage of the chain is routed to its own queue."""
+    pipeline = audio_pipeline(file_id="a" * 64, file_extension="m4a")
+    names = [task.task for task in pipeline.tasks]
+    routes = celery_app.conf.task_routes
+
+    assert names == ["pipeline.ingest", "pipeline.transcribe", "pipeline.extract", "pipeline.persist"]
+    assert [routes[name]["queue"] for name in names] == ["ingest", "transcribe", "extract", "persist"]
+
+def test_pipeline_stages_carry_priority():
+    """Every stage is sent with the priority of the recording."""
+    interactive = audio_pipeline(file_id="a" * 64, priority="interactive")
+    bulk = audio_pipeline(file_id="a" * 64, priority="bulk")
+
+    assert {task.options["priority"] for task in interactive.tasks} == {0}
+    assert {task.options["priority"] for task in bulk.tasks} == {9}
+
+def test_failed_stage_is_passed_through():
+    """A stage failure is recorded in the job and later stages do not run."""
+    async def failing(job):
+        raise IOError("S3 operation failed")
+
+    later = AsyncMock()
+    failed = run_stage("ingest", {"file_id": "x"}, failing)
+    passed = run_stage("transcribe", failed, later)
+
+    assert failed == {"error": "S3 operation failed", "stage": "ingest", "file_id": "x"}
+    assert passed is failed
+    later.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_extract_skips_llm_on_cache_hit():
+    """The extraction stage reuses a cached extraction and drops the diarization."""
+    with patch("app.worker.extract_medical_json", new_callable=AsyncMock) as mock_extract, \
+            patch("app.worker.load_job_checkpoint", new_callable=AsyncMock, return_value=None), \
+            patch("app.worker.save_job_checkpoint", new_callable=AsyncMock):
+        mock_extract.return_value = {"patient": "John"}
+        cached = await extract_job({"extraction": {"patient": "John"}, "patient_name": "John"})
+        fresh = await extract_job(
+            {"file_id": "f", "diarization": [{"text": "hi"}], "patient_name": "John", "cache_key": "k"}
+        )
+
+    mock_extract.assert_awaited_once_with([{"text": "hi"}], "John", "k")
+    assert cached["extraction"] == {"patient": "John"}
+    assert "diarization" not in fresh
+
+@pytest.mark.asyncio
+async def test_transcribe_resumes_from_checkpoint():
+    """A diarization checkpoint of an earlier run skips Whisper."""
+    job = {"file_id": "f", "user_id": "42", "file_url": "http://minio/a.m4a", "patient_name": "John",
+           "bypass_cache": False}
+    with patch("app.worker.lookup_cached_extraction", new_callable=AsyncMock,
+               return_value={"cache_key": "k", "extraction": None}), \
+            patch("app.worker.load_job_checkpoint", new_callable=AsyncMock, return_value=[{"text": "hi"}]), \
+            patch("app.worker.whisper_diarization", new_callable=AsyncMock) as mock_whisper:
+        resumed = await transcribe_job(job)
+
+    mock_whisper.assert_not_called()
+    assert resumed["diarization"] == [{"text": "hi"}]
+    assert resumed["cache_key"] == "k"
+
+@pytest.mark.asyncio
+async def test_unparseable_extraction_is_not_checkpointed():
+    job = {"file_id": "f", "diarization": [{"text": "hi"}], "patient_name": "John", "cache_key": "k"}
+    with patch("app.worker.extract_medical_json", new_callable=AsyncMock,
+               return_value={"error": "Failed to parse JSON"}), \
+            patch("app.worker.load_job_checkpoint", new_callable=AsyncMock, return_value=None), \
+            patch("app.worker.save_job_checkpoint", new_callable=AsyncMock) as mock_save:
+        with pytest.raises(InvalidExtraction):
+            await extract_job(job)
+
+    mock_save.assert_not_called()
+
+def test_transient_failures_retry_the_stage():
+    """Transient failures are retried while attempts are left; then the error is passed on."""
+    async def flaky(job):
+        raise ConnectionError("Replicate unreachable")
+
+    task = MagicMock(max_retries=3)
+    task.request.retries = 0
+    with pytest.raises(StageRetry):
+        run_stage("extract", {"file_id": "x"}, flaky, task=task)
+
+    task.request.retries = 3
+    assert run_stage("extract", {"file_id": "x"}, flaky, task=task)["error"] == "Replicate unreachable"
+
+def test_permanent_failures_are_not_retried():
+    async def broken(job):
+        raise ValueError("Either file_id, user_id and file_name, or an uploaded file must be provided")
+
+    task = MagicMock(max_retries=3)
+    task.request.retries = 0
+    assert "error" in run_stage("ingest", {}, broken, task=task)
+
+@pytest.mark.asyncio
+async def test_retried_ingest_reuses_its_file_id():
+    """A retried ingest copies to the same key, so the file_id and checkpoints stay the same."""
+    job = audio_pipeline(user_id="42", file_name="visit.m4a").tasks[0].args[0]
+    assert job["ingest_date"]
+    job["ingest_date"] = "2024-05-01_10-30-00"
+    with patch("app.worker.resolve_upload_key", new_callable=AsyncMock, return_value="users/42/uploads/visit.m4a"), \
+            patch("app.utils.file_helpers.copy_file_async", new_callable=AsyncMock) as mock_copy, \
+            patch("app.utils.file_helpers.record_object"):
+        first = await ingest_audio(job)
+        retried = await ingest_audio(job)
+
+    assert first["file_id"] == retried["file_id"]
+    assert "2024-05-01_10-30-00date_" in first["audio_file_path"]
+    assert mock_copy.call_args_list[0] == mock_copy.call_args_list[1]
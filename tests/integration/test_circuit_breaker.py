@@ -0,0 +1,49 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.storage import CircuitBreaker, CircuitOpenError
+from app.utils.storage_helpers import fetch_json_object
+
+def test_breaker_opens_and_recovers():
+    """The breaker opens after repeated failures and closes after a successful trial."""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+
+    with patch("app.storage.circuit_breaker.time.monotonic", return_value=100.0):
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    with patch("app.storage.circuit_breaker.time.monotonic", return_value=131.0):
+        breaker.before_call()
+        # Only one trial request is let through while half-open
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+
+    assert breaker.state == "closed"
+    assert breaker.snapshot()["total_rejected"] == 2
+
+def test_open_breaker_skips_retries():
+    """Storage helpers give up immediately instead of backing off when the breaker is open."""
+    mock_client = MagicMock()
+    mock_client.get_object.side_effect = CircuitOpenError("open")
+
+    with patch("app.utils.storage_helpers.init_storage_client") as mock_init, \
+         patch("app.utils.storage_helpers.time.sleep") as mock_sleep:
+        mock_init.return_value = {"client": mock_client, "bucket_name": "test-bucket"}
+        with pytest.raises(CircuitOpenError):
+            fetch_json_object("users/42/outputs/a_output.json")
+
+    assert mock_client.get_object.call_count == 1
+    mock_sleep.assert_not_called()
+
+def test_storage_metrics_endpoint(client):
+    """The metrics endpoint reports the backend and thread pool usage."""
+    response = client.get("/storage/metrics")
+
+    assert response.status_code == 200
+    assert "executor" in response.json()
@@ -0,0 +1,67 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.event_loop_helpers import WorkerEventLoop, get_worker_loop
+
+@pytest.fixture
+def worker_loop():
+    loop = WorkerEventLoop(max_concurrent=2)
+    yield loop
+    loop.stop()
+
+def test_tasks_share_one_loop_concurrently(worker_loop):
+    """Coroutines submitted from several task threads overlap on the same loop."""
+    seen_loops = set()
+
+    async def call_replicate():
+        seen_loops.add(id(asyncio.get_running_loop()))
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(worker_loop.run(call_replicate())))
+        for _ in range(2)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["ok", "ok"]
+    assert len(seen_loops) == 1
+    assert time.monotonic() - started < 0.35
+
+def test_concurrency_is_capped(worker_loop):
+    """No more than max_concurrent coroutines run at once."""
+    peak, running = 0, 0
+
+    async def call_replicate():
+        nonlocal peak, running
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    futures = [worker_loop.submit(call_replicate()) for _ in range(6)]
+    for future in futures:
+        future.result()
+
+    assert peak == 2
+    assert worker_loop.stats()["completed"] == 6
+
+def test_timeout_cancels_coroutine(worker_loop):
+    """A coroutine over its timeout is cancelled and frees its slot."""
+    with pytest.raises(asyncio.TimeoutError):
+        worker_loop.run(asyncio.sleep(5), timeout=0.05)
+
+    assert worker_loop.stats()["in_flight"] == 0
+    assert worker_loop.run(asyncio.sleep(0, result="next")) == "next"
+
+def test_process_loop_is_reused():
+    """Every task of a process gets the same long-lived loop."""
+    assert get_worker_loop() is get_worker_loop()
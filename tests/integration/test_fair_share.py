@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.worker import enqueue_audio_pipeline, enqueue_audio_pipelines, dispatch_fair_share, run_stage
+
+@patch("app.worker.dispatch_fair_share")
+@patch("app.worker.publish_progress")
+@patch("app.worker.enqueue_fair")
+def test_pipelines_wait_in_their_users_queue(mock_enqueue, mock_publish, mock_dispatch):
+    """A submission is queued per user and tracked under its pre-chosen task id."""
+    result = enqueue_audio_pipeline(user_id="42", file_name="a.m4a", priority="bulk", task_id="task-1")
+
+    assert result.id == "task-1"
+    mock_enqueue.assert_called_once_with(
+        [("42", "task-1", {"user_id": "42", "file_name": "a.m4a", "priority": "bulk"}, False)]
+    )
+    mock_publish.assert_called_once_with("task-1", "queued")
+    mock_dispatch.assert_called_once()
+
+@patch("app.worker.dispatch_fair_share")
+@patch("app.worker.publish_progress")
+@patch("app.worker.enqueue_fair")
+def test_batches_are_queued_and_dispatched_once(mock_enqueue, mock_publish, mock_dispatch):
+    """A batch costs one queueing round trip and one dispatch, not one per recording."""
+    results = enqueue_audio_pipelines([{"user_id": "42", "file_name": f"{n}.m4a", "priority": "bulk"} for n in range(3)])
+
+    assert len(results) == 3
+    mock_enqueue.assert_called_once()
+    assert len(mock_enqueue.call_args.args[0]) == 3
+    mock_dispatch.assert_called_once()
+
+@patch("app.worker.audio_pipeline")
+@patch("app.worker.publish_progress")
+@patch("app.worker.enqueue_fair", side_effect=ConnectionError("Redis down"))
+def test_pipelines_start_directly_without_redis(mock_enqueue, mock_publish, mock_pipeline):
+    mock_pipeline.return_value.apply_async.return_value = MagicMock(id="task-1")
+
+    assert enqueue_audio_pipeline(user_id="42", file_name="a.m4a").id == "task-1"
+    assert mock_pipeline.call_args.kwargs["task_id"] is not None
+
+@patch("app.worker.requeue_fair")
+@patch("app.worker.audio_pipeline")
+@patch("app.worker.next_fair_job")
+def test_dispatch_starts_picked_pipelines_with_their_slot(mock_next, mock_pipeline, mock_requeue):
+    """Dispatched pipelines carry their user so the slot is freed when they finish."""
+    mock_next.side_effect = [("42", {"task_id": "t1", "kwargs": {"user_id": "42"}}), None]
+
+    assert dispatch_fair_share() == 1
+    mock_pipeline.assert_called_once_with(user_id="42", task_id="t1", fair_share_user="42")
+    mock_requeue.assert_not_called()
+
+@patch("app.worker.requeue_fair")
+@patch("app.worker.audio_pipeline")
+@patch("app.worker.next_fair_job")
+def test_dispatch_requeues_pipelines_it_cannot_send(mock_next, mock_pipeline, mock_requeue):
+    job = {"task_id": "t1", "kwargs": {}}
+    mock_next.return_value = ("42", job)
+    mock_pipeline.return_value.apply_async.side_effect = ConnectionError("broker down")
+
+    with pytest.raises(ConnectionError):
+        dispatch_fair_share()
+    mock_requeue.assert_called_once_with("42", job)
+
+@patch("app.worker.dispatch_fair_share")
+@patch("app.worker.release_slot")
+@patch("app.worker.publish_progress")
+def test_finished_pipeline_frees_its_slot(mock_publish, mock_release, mock_dispatch):
+    async def failing(job):
+        raise ValueError("no such recording")
+
+    run_stage("ingest", {"file_id": "x", "task_id": "t1", "fair_share_user": "42"}, failing)
+
+    mock_release.assert_called_once_with("42", "t1")
+    mock_dispatch.assert_called_once()
@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.utils.idempotency_helpers import idempotency_key, claim_submission, SubmissionInProgress
+from app.worker import submit_audio_pipeline
+
+HELPERS_MODULE = "app.utils.idempotency_helpers"
+
+def test_keys_are_scoped_to_user():
+    """Derived keys depend on user and recording, client keys on user and header."""
+    key = idempotency_key("42", sha256="abc", bypass_cache=False)
+
+    assert key == idempotency_key("42", bypass_cache=False, sha256="abc")
+    assert key != idempotency_key("43", sha256="abc", bypass_cache=False)
+    assert key != idempotency_key("42", sha256="abc", bypass_cache=True)
+    assert idempotency_key("42", "retry-1", sha256="abc") == idempotency_key("42", "retry-1", sha256="def")
+
+def test_claim_returns_active_task():
+    redis_client = MagicMock()
+    redis_client.set.return_value = False
+    redis_client.get.return_value = "task-1"
+
+    with patch(f"{HELPERS_MODULE}.get_redis_client", return_value=redis_client):
+        assert claim_submission("key", "task-2", is_active=lambda task_id: True) == "task-1"
+
+    redis_client.eval.assert_not_called()
+
+def test_claim_replaces_finished_task():
+    """A retry after the earlier task finished starts a new run."""
+    redis_client = MagicMock()
+    redis_client.set.return_value = False
+    redis_client.get.return_value = "task-1"
+    redis_client.eval.return_value = 1
+
+    with patch(f"{HELPERS_MODULE}.get_redis_client", return_value=redis_client):
+        assert claim_submission("key", "task-2", is_active=lambda task_id: False) is None
+
+    assert redis_client.eval.call_args.args[3:5] == ("task-1", "task-2")
+
+@patch("app.worker.enqueue_audio_pipeline")
+@patch("app.worker.claim_submission")
+def test_duplicate_submission_is_not_enqueued(mock_claim, mock_enqueue):
+    mock_claim.return_value = "task-1"
+
+    task, deduplicated = submit_audio_pipeline(idempotency_key="key", file_id="a" * 64)
+
+    assert deduplicated is True
+    assert task.id == "task-1"
+    mock_enqueue.assert_not_called()
+
+@patch("app.worker.enqueue_audio_pipeline")
+@patch("app.worker.claim_submission")
+def test_new_submission_carries_its_key(mock_claim, mock_enqueue):
+    """The claimed task id is used for the chain, so the claim can be released when it finishes."""
+    mock_claim.return_value = None
+
+    _, deduplicated = submit_audio_pipeline(idempotency_key="key", file_id="a" * 64)
+
+    claimed_task_id = mock_claim.call_args.args[1]
+    assert deduplicated is False
+    assert mock_enqueue.call_args.kwargs["task_id"] == claimed_task_id
+    assert mock_enqueue.call_args.kwargs["idempotency_key"] == "key"
+
+def test_claim_fails_after_losing_every_race():
+    """Losing the claim to other submissions fails instead of enqueueing without it."""
+    redis_client = MagicMock()
+    redis_client.set.return_value = False
+    redis_client.get.return_value = None
+
+    with patch(f"{HELPERS_MODULE}.get_redis_client", return_value=redis_client):
+        with pytest.raises(SubmissionInProgress):
+            claim_submission("key", "task-2", is_active=lambda task_id: True, max_attempts=3)
+
+    assert redis_client.set.call_count == 3
+
+@patch("app.worker.enqueue_audio_pipeline")
+@patch("app.worker.claim_submission", side_effect=SubmissionInProgress("contended"))
+def test_contended_submission_is_not_enqueued(mock_claim, mock_enqueue):
+    with pytest.raises(SubmissionInProgress):
+        submit_audio_pipeline(idempotency_key="key", file_id="a" * 64)
+    mock_enqueue.assert_not_called()
@@ -0,0 +1,77 @@
+import io
+import os
+import pytest
+from unittest.mock import patch
+from minio.error import S3Error
+from minio.commonconfig import CopySource
+
+from app.storage import LocalBackend
+from app.utils.storage_helpers import upload_stream, fetch_json_object, list_user_objects_page
+
+BUCKET = "test-bucket"
+
+@pytest.fixture
+def local_backend(tmp_path):
+    """A local storage backend rooted in a temporary directory."""
+    backend = LocalBackend(str(tmp_path))
+    backend.ensure_bucket(BUCKET)
+    return backend
+
+def test_local_backend_reads_and_writes(local_backend):
+    """Objects round-trip, ranges are served from the mapped file and copies are independent."""
+    local_backend.put_object(BUCKET, "users/42/audio/a.m4a", io.BytesIO(b"0123456789"), -1)
+    local_backend.copy_object(BUCKET, "users/42/audio/b.m4a", CopySource(BUCKET, "users/42/audio/a.m4a"))
+    local_backend.remove_object(BUCKET, "users/42/audio/a.m4a")
+
+    response = local_backend.get_object(BUCKET, "users/42/audio/b.m4a", offset=2, length=3)
+    assert response.read() == b"234"
+    response.close()
+
+    assert local_backend.stat_object(BUCKET, "users/42/audio/b.m4a").size == 10
+    with pytest.raises(S3Error) as error:
+        local_backend.stat_object(BUCKET, "users/42/audio/a.m4a")
+    assert error.value.code == "NoSuchKey"
+    assert os.listdir(local_backend.tmp_dir) == []
+
+def test_local_backend_lists_like_s3(local_backend):
+    """Listings are key-ordered, honour start_after and collapse prefixes when not recursive."""
+    for name in ["legacy.m4a", "users/42/audio/b.m4a", "users/42/audio/a.m4a", "users/43/audio/c.m4a"]:
+        local_backend.put_object(BUCKET, name, io.BytesIO(b"x"), 1)
+
+    root = [(obj.object_name, obj.is_dir) for obj in local_backend.list_objects(BUCKET)]
+    user = [obj.object_name for obj in local_backend.list_objects(BUCKET, prefix="users/42/", recursive=True,
+                                                                  start_after="users/42/audio/a.m4a")]
+
+    assert root == [("legacy.m4a", False), ("users/", True)]
+    assert user == ["users/42/audio/b.m4a"]
+
+def test_storage_helpers_run_on_local_backend(local_backend):
+    """The storage helpers work unchanged on top of the local backend."""
+    storage = {"client": local_backend, "bucket_name": BUCKET}
+    with patch("app.utils.storage_helpers.init_storage_client", return_value=storage), \
+         patch("app.utils.storage_helpers.legacy_keys_migrated", return_value=False), \
+         patch("app.utils.storage_helpers.record_object"), \
+         patch("app.utils.storage_helpers.touch_listing"):
+        upload_stream(io.BytesIO(b'{"ok": true}'), "users/42/outputs/a_output.json")
+        objects, cursor = list_user_objects_page("42", "outputs")
+
+        assert fetch_json_object("users/42/outputs/a_output.json") == {"ok": True}
+        assert [obj.object_name for obj in objects] == ["users/42/outputs/a_output.json"]
+        assert cursor is None
+
+def test_paginated_listing_merges_layouts_across_pages(local_backend):
+    """Pages follow file name order over both layouts and a migrated object is listed once."""
+    names = [f"{patient}patient_2024-05-01_10-30-00date_{'a' * 64}fileID_42.m4a" for patient in "ABC"]
+    local_backend.put_object(BUCKET, f"users/42/audio/{names[1]}", io.BytesIO(b"x"), 1)
+    for name in names:
+        local_backend.put_object(BUCKET, name, io.BytesIO(b"x"), 1)
+
+    storage = {"client": local_backend, "bucket_name": BUCKET}
+    with patch("app.utils.storage_helpers.init_storage_client", return_value=storage), \
+            patch("app.utils.storage_helpers.legacy_keys_migrated", return_value=False):
+        first, cursor = list_user_objects_page("42", "audio", limit=2)
+        second, last_cursor = list_user_objects_page("42", "audio", start_after=cursor, limit=2)
+
+    assert [obj.object_name for obj in first] == [names[0], f"users/42/audio/{names[1]}"]
+    assert [obj.object_name for obj in second] == [names[2]]
+    assert last_cursor is None
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.worker import audio_pipeline, run_stage
+from app.utils.progress_helpers import stream_progress
+
+PROCESS_MODULE = "app.api.v1.endpoints.process_audio"
+
+def published_events(mock_publish):
+    return [call.args[1] for call in mock_publish.call_args_list]
+
+@patch("app.worker.publish_progress")
+def test_stages_publish_progress(mock_publish):
+    """Stages publish start/finish events under the tracked task id."""
+    async def stage(job):
+        return {**job, "transcript_url": "http://minio/out.json"}
+
+    job = {"file_id": "x", "task_id": "t-1"}
+    for name in ("ingest", "transcribe", "extract", "persist"):
+        job = run_stage(name, job, stage)
+
+    assert published_events(mock_publish) == ["uploaded", "transcribing", "extracting", "saved"]
+    assert {call.args[0] for call in mock_publish.call_args_list} == {"t-1"}
+    assert mock_publish.call_args.kwargs["transcript_url"] == "http://minio/out.json"
+
+@patch("app.worker.publish_progress")
+def test_failed_stage_publishes_failure(mock_publish):
+    async def failing(job):
+        raise IOError("Replicate unavailable")
+
+    run_stage("transcribe", {"file_id": "x", "task_id": "t-1"}, failing)
+
+    assert published_events(mock_publish) == ["transcribing", "failed"]
+    assert mock_publish.call_args.kwargs["error"] == "Replicate unavailable"
+
+def test_pipeline_tracks_last_stage_id():
+    """The id clients track is the last stage's, and every stage knows it."""
+    pipeline = audio_pipeline(file_id="a" * 64)
+    task_id = pipeline.tasks[0].args[0]["task_id"]
+
+    assert pipeline.tasks[-1].options["task_id"] == task_id
+
+@pytest.mark.asyncio
+async def test_stream_ends_after_terminal_event():
+    """The stream replays the latest event, sends keepalives and stops after saved."""
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+    pubsub.aclose = AsyncMock()
+    pubsub.get_message = AsyncMock(side_effect=[
+        None,
+        {"data": json.dumps({"task_id": "t-1", "event": "extracting"})},
+        {"data": json.dumps({"task_id": "t-1", "event": "saved"})},
+    ])
+    redis_client = MagicMock()
+    redis_client.pubsub.return_value = pubsub
+    redis_client.get = AsyncMock(return_value=json.dumps({"task_id": "t-1", "event": "transcribing"}))
+
+    with patch("app.utils.progress_helpers.get_async_redis_client", return_value=redis_client):
+        messages = [message async for message in stream_progress("t-1")]
+
+    assert [message.split("\n")[0] for message in messages] == [
+        "event: transcribing", ": keepalive", "event: extracting", "event: saved"
+    ]
+    pubsub.aclose.assert_awaited_once()
+
+@patch(f"{PROCESS_MODULE}.AsyncResult")
+@patch(f"{PROCESS_MODULE}.run_storage_io", new_callable=AsyncMock, return_value=None)
+def test_events_of_finished_task_without_progress(mock_io, mock_result, client):
+    """A task that finished without progress events gets a single terminal event."""
+    mock_result.return_value.ready.return_value = True
+    mock_result.return_value.state = "SUCCESS"
+    mock_result.return_value.result = {"file_id": "f-1", "transcript_url": "http://minio/out.json"}
+
+    response = client.get("/get_audio_task/t-1/events")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("event: saved\n")
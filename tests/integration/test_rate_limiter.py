@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.llm.rate_limiter import TokenBucket, RateLimitTimeout, rate_limited
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_tokens():
+    """A call waits as long as the bucket says and then retries."""
+    bucket = TokenBucket("whisper", per_minute=60, burst=1)
+    with patch.object(bucket, "_try_acquire", side_effect=[0.02, 0.0]) as mock_try:
+        waited = await bucket.acquire(max_wait=1)
+
+    assert mock_try.call_count == 2
+    assert waited >= 0.02
+
+@pytest.mark.asyncio
+async def test_acquire_gives_up_after_max_wait():
+    bucket = TokenBucket("llama", per_minute=1, burst=1)
+    with patch.object(bucket, "_try_acquire", return_value=60.0):
+        with pytest.raises(RateLimitTimeout):
+            await bucket.acquire(max_wait=5)
+
+@pytest.mark.asyncio
+async def test_acquire_fails_open_without_redis():
+    """A Redis outage does not block or fail Replicate calls."""
+    bucket = TokenBucket("whisper", per_minute=60, burst=1)
+    with patch.object(bucket, "_try_acquire", side_effect=ConnectionError("Redis down")):
+        assert await bucket.acquire() < 1
+
+def test_script_arguments():
+    """The bucket refills in tokens per second up to the burst size."""
+    script = MagicMock(return_value=1500)
+    redis_client = MagicMock()
+    redis_client.register_script.return_value = script
+    bucket = TokenBucket("llama", per_minute=120, burst=10)
+
+    with patch("app.llm.rate_limiter.get_redis_client", return_value=redis_client):
+        assert bucket._try_acquire(1) == 1.5
+
+    script.assert_called_once_with(keys=["medvoice:ratelimit:llama"], args=[2.0, 10, 1])
+
+@pytest.mark.asyncio
+async def test_decorator_takes_a_token_per_call():
+    bucket = MagicMock()
+    bucket.acquire = AsyncMock(return_value=0.0)
+
+    @rate_limited("whisper")
+    async def call_replicate(value):
+        return value
+
+    with patch("app.llm.rate_limiter.get_bucket", return_value=bucket):
+        assert await call_replicate("ok") == "ok"
+        assert await call_replicate("again") == "again"
+
+    assert bucket.acquire.call_count == 2
+
+@pytest.mark.asyncio
+async def test_acquire_runs_redis_off_the_event_loop():
+    """The blocking Redis script never runs on the loop shared by pipeline coroutines."""
+    import threading
+    bucket = TokenBucket("whisper", per_minute=60, burst=1)
+    loop_thread = threading.current_thread()
+    calls = []
+
+    def try_acquire(tokens):
+        calls.append(threading.current_thread())
+        return 0.0
+
+    with patch.object(bucket, "_try_acquire", side_effect=try_acquire):
+        await bucket.acquire()
+
+    assert calls and calls[0] is not loop_thread
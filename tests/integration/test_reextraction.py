@@ -0,0 +1,168 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.llm.reextraction import (
+    reextract_checkpoint,
+    reextract_outputs,
+    ReextractionRunning,
+    RELEASE_LOCK_SCRIPT,
+    list_diarization_checkpoints,
+    refresh_lock,
+)
+from app.llm.result_cache import checkpoint_fingerprint
+
+MODULE = "app.llm.reextraction"
+DIARIZATION = "users/42/checkpoints/f-1/diarization.json"
+
+def diarization_document():
+    return {
+        "stage": "diarization", "user_id": "42", "file_id": "f-1",
+        "metadata": {"patient_name": "John", "file_name": "visit"},
+        "data": [{"speaker": "SPEAKER_00", "text": "Hello"}],
+    }
+
+async def run_io(func, *args):
+    return func(*args)
+
+@pytest.mark.asyncio
+async def test_reextracts_from_diarization():
+    """Only the prompt and Llama run again; the checkpoint and the user's output are refreshed."""
+    documents = {DIARIZATION: diarization_document(), "users/42/checkpoints/f-1/extraction.json": None}
+    with patch(f"{MODULE}.run_storage_io", side_effect=run_io), \
+            patch(f"{MODULE}.read_checkpoint", side_effect=documents.get), \
+            patch(f"{MODULE}.llama3_generate_medical_json", new_callable=AsyncMock,
+                  return_value={"patient": "John"}) as mock_llama, \
+            patch(f"{MODULE}.save_checkpoint") as mock_save, \
+            patch(f"{MODULE}.generate_output_filename") as mock_output:
+        assert await reextract_checkpoint(DIARIZATION) == "reextracted"
+
+    assert "Hello" in mock_llama.call_args.args[0]
+    assert mock_save.call_args.args[:5] == (
+        "42", "f-1", "extraction", checkpoint_fingerprint("extraction", "John"), {"patient": "John"}
+    )
+    mock_output.assert_called_once_with({"patient": "John"}, "f-1", "42", "visit")
+
+@pytest.mark.asyncio
+async def test_current_extractions_are_skipped():
+    current = {"fingerprint": checkpoint_fingerprint("extraction", "John")}
+    documents = {DIARIZATION: diarization_document(), "users/42/checkpoints/f-1/extraction.json": current}
+    with patch(f"{MODULE}.run_storage_io", side_effect=run_io), \
+            patch(f"{MODULE}.read_checkpoint", side_effect=documents.get), \
+            patch(f"{MODULE}.llama3_generate_medical_json", new_callable=AsyncMock) as mock_llama:
+        assert await reextract_checkpoint(DIARIZATION) == "skipped"
+
+    mock_llama.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_run_checkpoints_progress_and_counts():
+    """Batches are listed from the saved cursor, and the cursor advances after each batch."""
+    redis_client = MagicMock()
+    redis_client.set.return_value = True
+    redis_client.get.return_value = None
+    batches = [["a/checkpoints/1/diarization.json", "a/checkpoints/2/diarization.json"], []]
+    outcomes = {"a/checkpoints/1/diarization.json": "reextracted"}
+
+    async def reextract(object_name, force):
+        if object_name not in outcomes:
+            raise RuntimeError("Replicate error")
+        return outcomes[object_name]
+
+    async def io(func, *args):
+        if func is list_diarization_checkpoints:
+            return batches.pop(0)
+        return func(*args)
+
+    with patch(f"{MODULE}.get_redis_client", return_value=redis_client), \
+            patch(f"{MODULE}.run_storage_io", side_effect=io) as mock_io, \
+            patch(f"{MODULE}.reextract_checkpoint", side_effect=reextract):
+        stats = await reextract_outputs(user_id="a", concurrency=2)
+
+    assert (stats["reextracted"], stats["failed"], stats["batches"], stats["finished"]) == (1, 1, 1, True)
+    redis_client.pipeline.return_value.set.assert_called_with(
+        "medvoice:reextract:a:cursor", "a/checkpoints/2/diarization.json"
+    )
+    redis_client.pipeline.return_value.delete.assert_called_once_with("medvoice:reextract:a:cursor")
+    token = redis_client.set.call_args.args[1]
+    redis_client.eval.assert_called_once_with(RELEASE_LOCK_SCRIPT, 1, "medvoice:reextract:a:lock", token)
+    # Every Redis call goes through the storage thread pool
+    assert {call.args[0].__name__ for call in mock_io.call_args_list} == {
+        "acquire_lock", "load_cursor", "list_diarization_checkpoints", "save_progress", "release_lock"
+    }
+
+@pytest.mark.asyncio
+async def test_run_stops_when_its_lock_is_taken_over():
+    """A run whose lock expired leaves the new owner's lock, cursor and stats alone."""
+    redis_client = MagicMock()
+    redis_client.set.return_value = True
+    redis_client.get.return_value = None
+
+    async def io(func, *args):
+        if func is list_diarization_checkpoints:
+            return ["a/checkpoints/1/diarization.json"]
+        if func is refresh_lock:
+            return False  # the lock holds another run's token
+        return func(*args)
+
+    async def slow_reextract(object_name, force):
+        await asyncio.sleep(0.05)
+        return "reextracted"
+
+    with patch(f"{MODULE}.get_redis_client", return_value=redis_client), \
+            patch(f"{MODULE}.REEXTRACT_HEARTBEAT", 0.01), \
+            patch(f"{MODULE}.run_storage_io", side_effect=io), \
+            patch(f"{MODULE}.reextract_checkpoint", side_effect=slow_reextract):
+        with pytest.raises(ReextractionRunning):
+            await reextract_outputs(user_id="a")
+
+    redis_client.pipeline.return_value.set.assert_not_called()
+    redis_client.delete.assert_not_called()
+    assert redis_client.eval.call_args.args[0] == RELEASE_LOCK_SCRIPT
+
+@pytest.mark.asyncio
+async def test_outputs_without_file_name_use_the_patient_name():
+    document = diarization_document()
+    document["metadata"] = {"patient_name": "John"}
+    documents = {DIARIZATION: document, "users/42/checkpoints/f-1/extraction.json": None}
+    with patch(f"{MODULE}.run_storage_io", side_effect=run_io), \
+            patch(f"{MODULE}.read_checkpoint", side_effect=documents.get), \
+            patch(f"{MODULE}.lookup_object", return_value=None), \
+            patch(f"{MODULE}.llama3_generate_medical_json", new_callable=AsyncMock, return_value={"patient": "John"}), \
+            patch(f"{MODULE}.save_checkpoint"), \
+            patch(f"{MODULE}.generate_output_filename") as mock_output:
+        await reextract_checkpoint(DIARIZATION)
+
+    assert mock_output.call_args.args[3] == "transcript"
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_are_rejected():
+    redis_client = MagicMock()
+    redis_client.set.return_value = False
+    with patch(f"{MODULE}.get_redis_client", return_value=redis_client):
+        with pytest.raises(ReextractionRunning):
+            await reextract_outputs()
+
+@patch("app.api.v1.endpoints.admin.reextract_outputs_task")
+@patch("app.api.v1.endpoints.admin.run_storage_io", new_callable=AsyncMock)
+def test_admin_endpoint_requires_token(mock_io, mock_task, client):
+    mock_io.return_value = {"scope": "42", "running": False}
+    mock_task.delay.return_value = MagicMock(id="task-1")
+
+    with patch("app.api.v1.endpoints.admin.config") as mock_config:
+        mock_config.tokens.admin = "secret"
+        assert client.post("/admin/reextract", params={"user_id": "42"}).status_code == 403
+        response = client.post("/admin/reextract", params={"user_id": "42"}, headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.json()["task_id"] == "task-1"
+    assert mock_task.delay.call_args.kwargs["user_id"] == "42"
+
+@patch("app.api.v1.endpoints.admin.reextract_outputs_task")
+def test_admin_endpoints_are_closed_without_a_token(mock_task, client):
+    """Without a configured ADMIN_TOKEN nobody can start a paid re-extraction."""
+    with patch("app.api.v1.endpoints.admin.config") as mock_config:
+        mock_config.tokens.admin = ""
+        assert client.post("/admin/reextract").status_code == 403
+        assert client.post("/admin/reextract", headers={"X-Admin-Token": ""}).status_code == 403
+
+    mock_task.delay.assert_not_called()
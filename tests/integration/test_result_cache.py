@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.llm.result_cache import result_cache_key, store_cached_result
+from app.api.v1.endpoints.post.llm import llm_pipeline_audio_to_json
+
+AUDIO_SHA = "b" * 64
+LLM_MODULE = "app.api.v1.endpoints.post.llm"
+
+def test_cache_key_depends_on_inputs():
+    """Identical audio and inputs share a key; a new patient or prompt does not."""
+    key = result_cache_key(AUDIO_SHA, "John Doe")
+
+    assert result_cache_key(AUDIO_SHA, "John Doe") == key
+    assert result_cache_key(AUDIO_SHA, "Jane Doe") != key
+    with patch("app.llm.result_cache.PROMPT_VERSION", "changed"):
+        assert result_cache_key(AUDIO_SHA, "John Doe") != key
+
+@pytest.mark.asyncio
+@patch(f"{LLM_MODULE}.llama3_generate_medical_json", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.whisper_diarization", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.get_cached_result", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.resolve_audio_sha256", new_callable=AsyncMock)
+async def test_cache_hit_skips_replicate(mock_sha, mock_cached, mock_whisper, mock_llama):
+    """A cached result is returned without calling the models."""
+    mock_sha.return_value = AUDIO_SHA
+    mock_cached.return_value = {"extraction": {"patient": "John Doe"}}
+
+    result = await llm_pipeline_audio_to_json("http://minio/bucket/a.m4a", "John Doe")
+
+    assert result == {"patient": "John Doe"}
+    mock_whisper.assert_not_called()
+    mock_llama.assert_not_called()
+
+@pytest.mark.asyncio
+@patch(f"{LLM_MODULE}.store_cached_result", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.convert_prompt_for_llama3")
+@patch(f"{LLM_MODULE}.llama3_generate_medical_json", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.whisper_diarization", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.get_cached_result", new_callable=AsyncMock)
+@patch(f"{LLM_MODULE}.resolve_audio_sha256", new_callable=AsyncMock)
+async def test_bypass_cache_refreshes_result(mock_sha, mock_cached, mock_whisper, mock_llama, mock_prompt, mock_store):
+    """bypass_cache skips the lookup but still stores the fresh result."""
+    mock_sha.return_value = AUDIO_SHA
+    mock_prompt.return_value = {"prompt": "prompt"}
+    mock_llama.return_value = {"patient": "John Doe"}
+
+    await llm_pipeline_audio_to_json("http://minio/bucket/a.m4a", "John Doe", bypass_cache=True)
+
+    mock_cached.assert_not_called()
+    mock_whisper.assert_called_once()
+    mock_store.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_failed_extraction_is_not_cached():
+    """Extraction errors are never written to the cache."""
+    with patch("app.llm.result_cache.upload_file_async", new_callable=AsyncMock) as mock_upload:
+        await store_cached_result("key", [], {"error": "bad json"})
+
+    mock_upload.assert_not_called()
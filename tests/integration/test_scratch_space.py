@@ -0,0 +1,73 @@
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.core.config_loader import config
+from app.utils.scratch_helpers import ScratchSpace, ScratchQuotaExceeded, scratch_usage
+
+@pytest.fixture(autouse=True)
+def scratch_root(tmp_path):
+    """Keep scratch directories inside the test's temporary directory."""
+    with patch.object(config.scratch, "root", str(tmp_path)):
+        yield tmp_path
+
+def test_spaces_do_not_collide():
+    """Concurrent spaces get separate paths for the same file name and are removed on exit."""
+    with ScratchSpace("upload") as first, ScratchSpace("upload") as second:
+        first_path, second_path = first.path("visit.m4a"), second.path("visit.m4a")
+        assert first_path != second_path
+        assert first.path("visit.m4a") != first_path
+
+        with open(first_path, "wb") as f:
+            f.write(b"audio")
+
+    assert not os.path.exists(first.directory)
+    assert not os.path.exists(second.directory)
+
+def test_quota_is_enforced_and_released():
+    """Reservations over the quota fail, and cleanup gives the space back."""
+    with patch.object(config.scratch, "disk_quota", 100):
+        with ScratchSpace() as scratch:
+            scratch.reserve(80)
+            with pytest.raises(ScratchQuotaExceeded):
+                scratch.reserve(30)
+        assert scratch_usage()["reserved"] == 0
+
+def test_spooled_buffer_spills_to_space():
+    """Spooled buffers stay in memory until they pass max_size, then spill to disk."""
+    with ScratchSpace() as scratch:
+        buffer = scratch.spooled(max_size=4)
+        buffer.write(b"abc")
+        assert not buffer._rolled
+        buffer.write(b"def")
+        assert buffer._rolled
+        buffer.seek(0)
+        assert buffer.read() == b"abcdef"
+
+def test_disk_files_reserve_quota():
+    """Paths and buffers that will spill count against the quota; small buffers stay in memory."""
+    with patch.object(config.scratch, "disk_quota", 100), patch.object(config.scratch, "spool_max_size", 10):
+        with ScratchSpace() as scratch:
+            scratch.path("a.json", size=60)
+            scratch.spooled(size=5)
+            assert scratch.reserved == 60
+            with pytest.raises(ScratchQuotaExceeded):
+                scratch.spooled(size=50)
+
+@pytest.mark.asyncio
+async def test_spool_reads_objects_into_memory():
+    """spool() copies an object into a rewound buffer that stays in memory when small."""
+    response = MagicMock()
+    response.stream.return_value = [b"abc", b"def"]
+
+    async def run_io(func, *args):
+        return func(*args)
+
+    with patch("app.utils.storage_helpers.run_storage_io", side_effect=run_io), \
+            patch("app.utils.storage_helpers.stat_object", return_value=MagicMock(size=6)), \
+            patch("app.utils.storage_helpers.open_object_stream", return_value=response):
+        with ScratchSpace() as scratch:
+            buffer = await scratch.spool("users/42/audio/visit.m4a")
+            assert buffer.read() == b"abcdef"
+            assert not buffer._rolled
+            assert scratch.reserved == 0
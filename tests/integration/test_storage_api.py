@@ -0,0 +1,232 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.utils.storage_helpers import register_issued_upload, is_issued_upload, stat_object, remove_object, is_upload_task
+
+MARKER = {"version": 3, "last_modified": datetime(2024, 5, 1, 10, 30, tzinfo=timezone.utc)}
+
+def make_object(name: str) -> MagicMock:
+    obj = MagicMock()
+    obj.object_name = name
+    obj.last_modified = MARKER["last_modified"]
+    return obj
+
+@patch("app.api.v1.endpoints.get.minio_storage.list_user_objects_page_async", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.get.minio_storage.get_listing_marker")
+def test_audio_listing_returns_validators(mock_marker, mock_list, client):
+    """Listings carry ETag/Last-Modified and a cursor when paginated."""
+    mock_marker.return_value = MARKER
+    key = f"users/42/audio/Johnpatient_2024-05-01_10-30-00date_{'a' * 64}fileID_42.m4a"
+    mock_list.return_value = ([make_object(key)], key)
+
+    response = client.get("/get_audios_from_user/42", params={"limit": 1})
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] == key
+    assert len(response.json()["urls"]) == 1
+    assert response.headers["etag"].startswith('W/"audio-3-')
+    assert response.headers["last-modified"] == "Wed, 01 May 2024 10:30:00 GMT"
+
+@patch("app.api.v1.endpoints.get.minio_storage.list_user_objects_page_async", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.get.minio_storage.get_listing_marker")
+def test_unchanged_listing_returns_304(mock_marker, mock_list, client):
+    """A matching If-None-Match short-circuits before listing the bucket."""
+    mock_marker.return_value = MARKER
+    mock_list.return_value = ([], None)
+
+    etag = client.get("/get_json_transcripts_by_user/42").headers["etag"]
+    mock_list.reset_mock()
+
+    response = client.get("/get_json_transcripts_by_user/42", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    mock_list.assert_not_called()
+
+@patch("app.api.v1.endpoints.get.minio_storage.list_user_objects_page_async", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.get.minio_storage.get_listing_marker")
+def test_listing_changes_etag_per_page(mock_marker, mock_list, client):
+    """Different pages of the same listing do not share an ETag."""
+    mock_marker.return_value = MARKER
+    mock_list.return_value = ([], None)
+
+    first = client.get("/get_audios_from_user/42", params={"limit": 10}).headers["etag"]
+    second = client.get("/get_audios_from_user/42", params={"limit": 10, "start_after": "users/42/audio/x"}).headers["etag"]
+
+    assert first != second
+
+@patch("app.api.v1.endpoints.process_audio.run_storage_io", new_callable=AsyncMock)
+def test_presigned_upload_is_scoped_to_user(mock_io, client):
+    """Presigned uploads get a key of their own in the user's uploads prefix, recorded as issued."""
+    mock_io.return_value = "http://localhost:9000/medvoice-storage/users/42/uploads/visit.m4a?X-Amz-Signature=abc"
+
+    response = client.post("/presigned_upload/42", params={"file_name": "../../visit.m4a"})
+
+    assert response.status_code == 200
+    object_key = response.json()["object_key"]
+    assert object_key.startswith("users/42/uploads/") and object_key.endswith("/visit.m4a")
+    assert object_key != client.post("/presigned_upload/42", params={"file_name": "visit.m4a"}).json()["object_key"]
+    assert response.json()["method"] == "PUT"
+    mock_io.assert_any_await(register_issued_upload, object_key, "42")
+
+@patch("app.api.v1.endpoints.process_audio.start_pipeline", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.process_audio.run_storage_io", new_callable=AsyncMock)
+def test_complete_upload_enqueues_task(mock_io, mock_task, client):
+    """Completing a direct upload verifies the object and starts processing."""
+    mock_io.return_value = MagicMock(size=2048, etag="etag-1", content_type="audio/mp4")
+    mock_task.return_value = (MagicMock(id="task-1"), False)
+
+    response = client.post("/complete_upload/42", params={"object_key": f"users/42/uploads/{'b' * 32}/visit.m4a"})
+
+    assert response.status_code == 200
+    assert response.json()["task_id"] == "task-1"
+    assert response.json()["deduplicated"] is False
+    assert mock_task.call_args.kwargs["file_metadata"]["size"] == 2048
+
+@patch("app.api.v1.endpoints.process_audio.start_pipeline", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.process_audio.run_storage_io", new_callable=AsyncMock)
+def test_complete_upload_rejects_other_prefixes(mock_io, mock_task, client):
+    """Keys outside the user's uploads prefix, keys never issued, or missing objects are not processed."""
+    object_key = f"users/42/uploads/{'b' * 32}/visit.m4a"
+    assert client.post("/complete_upload/42", params={"object_key": "users/43/uploads/visit.m4a"}).status_code == 403
+
+    mock_io.return_value = False
+    assert client.post("/complete_upload/42", params={"object_key": object_key}).status_code == 403
+
+    mock_io.side_effect = [True, None]
+    assert client.post("/complete_upload/42", params={"object_key": object_key}).status_code == 404
+    mock_task.assert_not_called()
+
+@patch("app.api.v1.endpoints.process_audio.start_pipeline", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.process_audio.run_storage_io", new_callable=AsyncMock)
+def test_deduplicated_completion_removes_unused_upload(mock_io, mock_task, client):
+    """A completion deduplicated onto another upload's task deletes its own object; the running task's object is kept."""
+    object_key = f"users/42/uploads/{'b' * 32}/visit.m4a"
+    stat = MagicMock(size=2048, etag="etag-1", content_type="audio/mp4")
+    mock_task.return_value = (MagicMock(id="task-0"), True)
+
+    def storage_io(owned):
+        results = {is_issued_upload: True, stat_object: stat, is_upload_task: owned}
+        async def run_io(func, *args):
+            return results.get(func)
+        return run_io
+
+    for owned, removed in ((False, True), (True, False)):
+        mock_io.reset_mock()
+        mock_io.side_effect = storage_io(owned)
+        response = client.post("/complete_upload/42", params={"object_key": object_key},
+                               headers={"Idempotency-Key": "visit-1"})
+
+        assert response.json()["deduplicated"] is True
+        assert any(call.args == (remove_object, object_key) for call in mock_io.await_args_list) is removed
+
+@patch("app.api.v1.endpoints.process_audio.start_pipeline", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.process_audio.run_storage_io", new_callable=AsyncMock)
+@patch("app.api.v1.endpoints.process_audio.upload_stream_async", new_callable=AsyncMock)
+def test_deduplicated_upload_removes_its_staged_object(mock_upload, mock_io, mock_task, client):
+    """A re-uploaded recording that joins a running task does not leave its staged copy behind."""
+    mock_upload.return_value = {"url": "http://minio:9000/b/key", "size": 3, "sha256": "c" * 64}
+    mock_task.return_value = (MagicMock(id="task-0"), True)
+
+    response = client.post("/process_upload_audio/42", files=[("file", ("visit.m4a", b"abc", "audio/mp4"))])
+
+    assert response.json()["deduplicated"] is True
+    staged_key = mock_task.call_args.kwargs["file_id"]
+    mock_io.assert_any_await(remove_object, staged_key)
+
+STREAM_MODULE = "app.api.v1.endpoints.get.minio_storage"
+
+def mock_audio_object(payload: bytes):
+    """Patch the catalog lookup and MinIO reads behind /stream_audio."""
+    def open_stream(object_name, offset=0, length=0):
+        response = MagicMock()
+        response.stream.return_value = [payload[offset:offset + length]]
+        return response
+
+    stat = MagicMock(size=len(payload), etag="etag-1", content_type="audio/mp4")
+    return (
+        patch(f"{STREAM_MODULE}.find_audio_object", new_callable=AsyncMock,
+              return_value={"object_key": "users/42/audio/visit.m4a"}),
+        patch(f"{STREAM_MODULE}.stat_object", return_value=stat),
+        patch(f"{STREAM_MODULE}.open_object_stream", side_effect=open_stream),
+    )
+
+def test_stream_audio_serves_ranges(client):
+    """A Range request returns 206 with only the requested bytes."""
+    payload = bytes(range(100))
+    find, stat, stream = mock_audio_object(payload)
+
+    with find, stat, stream as mock_open:
+        response = client.get(f"/stream_audio/{'a' * 64}/m4a", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.content == payload[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/100"
+    assert response.headers["accept-ranges"] == "bytes"
+    mock_open.assert_called_once_with("users/42/audio/visit.m4a", 10, 10)
+
+def test_stream_audio_full_and_unsatisfiable(client):
+    """No Range returns the whole file; a range past the end returns 416."""
+    payload = bytes(range(100))
+    find, stat, stream = mock_audio_object(payload)
+
+    with find, stat, stream:
+        full = client.get(f"/stream_audio/{'a' * 64}/m4a")
+        past_end = client.get(f"/stream_audio/{'a' * 64}/m4a", headers={"Range": "bytes=200-"})
+
+    assert full.status_code == 200
+    assert full.content == payload
+    assert past_end.status_code == 416
+    assert past_end.headers["content-range"] == "bytes */100"
+
+def test_stream_audio_ignores_invalid_ranges(client):
+    """A syntactically invalid Range header is ignored and the whole file is sent."""
+    payload = bytes(range(100))
+    find, stat, stream = mock_audio_object(payload)
+
+    with find, stat, stream:
+        responses = [client.get(f"/stream_audio/{'a' * 64}/m4a", headers={"Range": value})
+                     for value in ("bytes=abc-", "bytes=20-10", "bytes=-")]
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert all(response.content == payload for response in responses)
+
+PROCESS_MODULE = "app.api.v1.endpoints.process_audio"
+
+@patch(f"{PROCESS_MODULE}.GroupResult")
+@patch(f"{PROCESS_MODULE}.enqueue_audio_pipelines")
+@patch(f"{PROCESS_MODULE}.upload_stream_async", new_callable=AsyncMock)
+def test_batch_upload_starts_one_group(mock_upload, mock_enqueue, mock_group_result, client):
+    """Every uploaded file becomes a member of one saved Celery group, queued in one call."""
+    mock_upload.return_value = {"url": "http://minio:9000/b/key", "size": 3, "sha256": "c" * 64}
+    mock_enqueue.return_value = [MagicMock(id="task-1"), MagicMock(id="task-2")]
+    group_result = MagicMock(id="group-1", results=[MagicMock(id="task-1"), MagicMock(id="task-2")])
+    mock_group_result.return_value = group_result
+
+    files = [("files", ("a.m4a", b"abc", "audio/mp4")), ("files", ("b.m4a", b"abc", "audio/mp4"))]
+    response = client.post("/process_upload_audios/42", files=files)
+
+    assert response.status_code == 200
+    assert response.json()["group_id"] == "group-1"
+    assert response.json()["task_ids"] == ["task-1", "task-2"]
+    assert mock_upload.await_count == 2
+    mock_enqueue.assert_called_once()
+    assert {task_kwargs["priority"] for task_kwargs in mock_enqueue.call_args.args[0]} == {"bulk"}
+    group_result.save.assert_called_once()
+
+@patch(f"{PROCESS_MODULE}.GroupResult")
+def test_batch_status_aggregates_members(mock_group_result, client):
+    """The batch status counts member states, including errors reported in results."""
+    mock_group_result.restore.return_value = MagicMock(results=[
+        MagicMock(id="task-1", state="SUCCESS", result={"file_id": "x"}),
+        MagicMock(id="task-2", state="SUCCESS", result={"error": "transcription failed"}),
+        MagicMock(id="task-3", state="PENDING", result=None),
+    ])
+
+    body = client.get("/get_audio_batch/group-1").json()
+
+    assert body["total"] == 3
+    assert body["succeeded"] == 1
+    assert body["failed"] == 1
+    assert body["ready"] is False
+    assert body["tasks"][1]["error"] == "transcription failed"
@@ -0,0 +1,166 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.utils.key_helpers import parse_object_key, layout_key_for, audio_object_key, output_object_key
+from app.utils.catalog_helpers import record_object, lookup_object, catalog_is_complete
+from app.utils.migration_helpers import migrate_legacy_keys, MIGRATION_CURSOR_KEY
+from app.utils.storage_helpers import MIGRATION_COMPLETE_KEY
+
+FILE_ID = "a" * 64
+AUDIO_KEY = f"John Doepatient_2024-05-01_10-30-00date_{FILE_ID}fileID_42.m4a"
+OUTPUT_KEY = f"{FILE_ID}_John Doe_42_output.json"
+
+def test_parse_audio_key():
+    """Audio keys expose their file_id, user, patient and timestamp."""
+    record = parse_object_key(AUDIO_KEY)
+
+    assert record["file_id"] == FILE_ID
+    assert record["user_id"] == "42"
+    assert record["patient_name"] == "John Doe"
+    assert record["timestamp"] == "2024-05-01_10-30-00"
+    assert record["extension"] == "m4a"
+    assert record["kind"] == "audio"
+
+def test_parse_output_key():
+    """Output keys are cataloged by their extension."""
+    record = parse_object_key(OUTPUT_KEY)
+
+    assert record["file_id"] == FILE_ID
+    assert record["user_id"] == "42"
+    assert record["patient_name"] == "John Doe"
+    assert record["kind"] == "json"
+
+def test_parse_output_key_with_underscored_user():
+    """A user id containing "_" parses from the layout prefix, or when the caller knows it."""
+    output_name = f"{FILE_ID}_John Doe_clinic_7_output.json"
+    record = parse_object_key(output_object_key("clinic_7", output_name))
+
+    assert record["user_id"] == "clinic_7"
+    assert record["patient_name"] == "John Doe"
+    assert parse_object_key(output_name, "clinic_7")["user_id"] == "clinic_7"
+    assert layout_key_for(output_name, "clinic_7") == f"users/clinic_7/outputs/{output_name}"
+
+def test_parse_unrelated_key():
+    """Keys without a file_id are not cataloged."""
+    assert parse_object_key("recording.m4a") is None
+
+def test_parse_layout_key():
+    """Keys in the per-user layout parse the same as legacy flat keys."""
+    record = parse_object_key(audio_object_key("42", AUDIO_KEY))
+
+    assert record["file_id"] == FILE_ID
+    assert record["user_id"] == "42"
+
+def test_layout_key_for_legacy_keys():
+    """Legacy keys migrate under their user's prefix; other keys stay put."""
+    assert layout_key_for(AUDIO_KEY) == f"users/42/audio/{AUDIO_KEY}"
+    assert layout_key_for(OUTPUT_KEY) == f"users/42/outputs/{OUTPUT_KEY}"
+    assert layout_key_for(f"users/42/audio/{AUDIO_KEY}") is None
+    assert layout_key_for("recording.m4a") is None
+
+@patch("app.utils.catalog_helpers.get_redis_client")
+def test_record_and_lookup(mock_get_client):
+    """Recorded objects are stored per file_id and kind."""
+    store = {}
+    mock_client = MagicMock()
+    mock_client.hset.side_effect = lambda key, field, value: store.__setitem__((key, field), value)
+    mock_client.hget.side_effect = lambda key, field: store.get((key, field))
+    mock_get_client.return_value = mock_client
+
+    record_object(AUDIO_KEY, 1024)
+    record = lookup_object(FILE_ID, "audio")
+
+    assert record["object_key"] == AUDIO_KEY
+    assert record["size"] == 1024
+    assert lookup_object(FILE_ID, "json") is None
+
+@patch("app.utils.catalog_helpers.get_redis_client")
+def test_catalog_unavailable(mock_get_client):
+    """Redis errors degrade to a catalog miss instead of failing the caller."""
+    mock_client = MagicMock()
+    mock_client.hget.side_effect = ConnectionError("redis down")
+    mock_get_client.return_value = mock_client
+
+    assert lookup_object(FILE_ID) is None
+    assert catalog_is_complete() is False
+
+@pytest.mark.asyncio
+async def test_failed_copy_leaves_catalog_untouched():
+    """The audio is only cataloged once its copy exists in storage."""
+    from app.utils.file_helpers import fetch_and_store_audio
+
+    with patch("app.utils.file_helpers.copy_file_async", side_effect=IOError("S3 operation failed")), \
+            patch("app.utils.file_helpers.record_object") as mock_record:
+        with pytest.raises(IOError):
+            await fetch_and_store_audio("42", "users/42/uploads/visit.m4a", size=3, sha256="c" * 64)
+    mock_record.assert_not_called()
+
+    with patch("app.utils.file_helpers.copy_file_async"), \
+            patch("app.utils.file_helpers.record_object") as mock_record:
+        stored = await fetch_and_store_audio("42", "users/42/uploads/visit.m4a", size=3, sha256="c" * 64)
+    mock_record.assert_called_once_with(stored["new_file_name"], 3, sha256="c" * 64)
+
+def make_object(name: str, size: int = 10, is_dir: bool = False) -> MagicMock:
+    return MagicMock(object_name=name, size=size, is_dir=is_dir)
+
+@pytest.fixture
+def migration_storage():
+    """Patch the MinIO client, Redis and the catalog used by the key migration."""
+    client, redis_client = MagicMock(), MagicMock()
+    redis_client.get.return_value = None
+    with patch("app.utils.migration_helpers.init_storage_client",
+               return_value={"client": client, "bucket_name": "test-bucket"}), \
+            patch("app.utils.migration_helpers.get_redis_client", return_value=redis_client), \
+            patch("app.utils.migration_helpers.lookup_object", return_value=None), \
+            patch("app.utils.migration_helpers.record_object") as mock_record, \
+            patch("app.utils.migration_helpers.touch_listing"):
+        yield client, redis_client, mock_record
+
+def test_migration_copies_verifies_and_deletes(migration_storage):
+    """Legacy keys are copied, checked, re-cataloged and removed; a bad copy keeps the original."""
+    client, redis_client, mock_record = migration_storage
+    bad_key = f"Janepatient_2024-05-01_10-30-00date_{'b' * 64}fileID_42.m4a"
+    root = [make_object(AUDIO_KEY), make_object(bad_key), make_object("users/", is_dir=True)]
+    client.list_objects.side_effect = lambda bucket, recursive=False, start_after=None: iter(
+        [obj for obj in root if start_after is None or obj.object_name > start_after]
+    )
+    client.stat_object.side_effect = lambda bucket, key: MagicMock(size=10 if key.endswith(AUDIO_KEY) else 3)
+
+    stats = migrate_legacy_keys(batch_size=10)
+
+    assert (stats["migrated"], stats["failed"], stats["skipped"], stats["finished"]) == (1, 1, 1, True)
+    client.remove_object.assert_called_once_with("test-bucket", AUDIO_KEY)
+    mock_record.assert_called_once_with(f"users/42/audio/{AUDIO_KEY}", 10)
+    redis_client.set.assert_any_call(MIGRATION_CURSOR_KEY, "users/")
+    # The failed key is still at the root, so listings keep scanning it
+    assert MIGRATION_COMPLETE_KEY not in [call.args[0] for call in redis_client.set.call_args_list]
+
+def test_migration_resumes_from_cursor_and_marks_completion(migration_storage):
+    """A run resumes after the saved cursor, and flags the migration complete when no legacy key is left."""
+    client, redis_client, _ = migration_storage
+    redis_client.get.return_value = "John Doe"
+    listings = [[make_object(OUTPUT_KEY)], [], [make_object("users/", is_dir=True)]]
+    client.list_objects.side_effect = lambda *args, **kwargs: iter(listings.pop(0))
+    client.stat_object.return_value = MagicMock(size=10)
+
+    stats = migrate_legacy_keys(batch_size=10)
+
+    assert stats["migrated"] == 1
+    assert client.list_objects.call_args_list[0].kwargs["start_after"] == "John Doe"
+    client.copy_object.assert_called_once()
+    assert client.copy_object.call_args.args[1] == f"users/42/outputs/{OUTPUT_KEY}"
+    assert redis_client.set.call_args.args[0] == MIGRATION_COMPLETE_KEY
+
+@patch("app.utils.storage_helpers.legacy_keys_migrated", return_value=True)
+@patch("app.utils.storage_helpers.init_storage_client")
+def test_listings_skip_the_root_once_migrated(mock_init, mock_migrated):
+    from app.utils.storage_helpers import list_user_objects, list_user_objects_page
+
+    client = MagicMock()
+    client.list_objects.side_effect = lambda *args, **kwargs: iter([make_object(f"users/42/audio/{AUDIO_KEY}")])
+    mock_init.return_value = {"client": client, "bucket_name": "test-bucket"}
+
+    assert len(list_user_objects("42", "audio")) == 1
+    assert len(list_user_objects_page("42", "audio", limit=10)[0]) == 1
+    assert all(call.kwargs.get("prefix") == "users/42/audio/" for call in client.list_objects.call_args_list)
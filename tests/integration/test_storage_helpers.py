@@ -0,0 +1,128 @@
+import io
+import gzip
+import json
+import hashlib
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.utils.storage_helpers import (
+    upload_file,
+    upload_stream,
+    fetch_json_object,
+    fetch_json_objects,
+    fetch_json_objects_async,
+    copy_file_async,
+)
+
+@pytest.fixture
+def mock_storage():
+    """Patch the MinIO client used by the storage helpers."""
+    mock_client = MagicMock()
+    with patch("app.utils.storage_helpers.init_storage_client") as mock_init, \
+         patch("app.utils.storage_helpers.record_object"):
+        mock_init.return_value = {"client": mock_client, "bucket_name": "test-bucket"}
+        yield mock_client
+
+def test_upload_stream_hashes_while_streaming(mock_storage):
+    """Size and sha256 are computed from the bytes MinIO reads."""
+    payload = b"audio-bytes" * 1000
+
+    def consume(bucket_name, object_name, data, length, **kwargs):
+        assert length == -1
+        while data.read(4096):
+            pass
+        return MagicMock(etag="etag-1")
+
+    mock_storage.put_object.side_effect = consume
+
+    result = upload_stream(io.BytesIO(payload), "users/42/uploads/visit.m4a")
+
+    assert result["size"] == len(payload)
+    assert result["sha256"] == hashlib.sha256(payload).hexdigest()
+    assert result["etag"] == "etag-1"
+    assert mock_storage.stat_object.call_count == 0
+
+def test_upload_stream_retries_from_start(mock_storage):
+    """A failed attempt rewinds the stream so the retry hashes every byte once."""
+    payload = b"0123456789"
+    calls = []
+
+    def flaky(bucket_name, object_name, data, length, **kwargs):
+        calls.append(data.read(4))
+        if len(calls) == 1:
+            raise IOError("connection reset")
+        data.read()
+        return MagicMock(etag="etag-2")
+
+    mock_storage.put_object.side_effect = flaky
+
+    with patch("app.utils.storage_helpers.time.sleep"):
+        result = upload_stream(io.BytesIO(payload), "users/42/uploads/visit.m4a")
+
+    assert calls == [b"0123", b"0123"]
+    assert result["sha256"] == hashlib.sha256(payload).hexdigest()
+
+def test_fetch_json_objects_keeps_order(mock_storage):
+    """Documents come back in the order of the requested names."""
+    def get_object(bucket_name, object_name):
+        response = MagicMock()
+        response.read.return_value = json.dumps({"name": object_name}).encode()
+        return response
+
+    mock_storage.get_object.side_effect = get_object
+    names = [f"users/42/outputs/{index}_output.json" for index in range(20)]
+
+    documents = fetch_json_objects(names, max_concurrency=4)
+
+    assert [document["name"] for document in documents] == names
+
+@pytest.mark.asyncio
+async def test_fetch_json_objects_async_keeps_order(mock_storage):
+    """The async bulk fetch runs off the event loop and keeps the input order."""
+    def get_object(bucket_name, object_name):
+        response = MagicMock()
+        response.read.return_value = json.dumps({"name": object_name}).encode()
+        return response
+
+    mock_storage.get_object.side_effect = get_object
+    names = [f"users/42/outputs/{index}_output.json" for index in range(20)]
+
+    documents = await fetch_json_objects_async(names, max_concurrency=4)
+
+    assert [document["name"] for document in documents] == names
+
+@pytest.mark.asyncio
+async def test_copy_file_async_retries_without_blocking(mock_storage):
+    """Async retries back off with asyncio.sleep instead of time.sleep."""
+    mock_storage.copy_object.side_effect = [IOError("timeout"), MagicMock()]
+
+    with patch("app.utils.storage_helpers.asyncio.sleep") as mock_sleep, \
+         patch("app.utils.storage_helpers.time.sleep") as mock_time_sleep:
+        url = await copy_file_async("users/42/uploads/a.m4a", "users/42/audio/b.m4a")
+
+    assert url.endswith("/test-bucket/users/42/audio/b.m4a")
+    assert mock_storage.copy_object.call_count == 2
+    mock_sleep.assert_called_once()
+    mock_time_sleep.assert_not_called()
+
+def test_compressed_upload_sets_content_encoding(mock_storage):
+    """Compressed uploads store gzip bytes with Content-Encoding metadata."""
+    payload = json.dumps({"notes": ["fever"] * 200}).encode()
+
+    upload_file(None, "users/42/outputs/a_output.json", data=payload, compress=True)
+
+    kwargs = mock_storage.put_object.call_args.kwargs
+    stored = mock_storage.put_object.call_args.args[2].read()
+    assert kwargs["metadata"] == {"Content-Encoding": "gzip"}
+    assert kwargs["length"] < len(payload)
+    assert gzip.decompress(stored) == payload
+
+@pytest.mark.parametrize("body", [
+    gzip.compress(b'{"status": "ok"}'),
+    b'{"status": "ok"}',
+])
+def test_fetch_json_object_reads_compressed_and_legacy(mock_storage, body):
+    """JSON objects are read whether or not they were stored compressed."""
+    mock_storage.get_object.return_value.read.return_value = body
+
+    assert fetch_json_object("users/42/outputs/a_output.json") == {"status": "ok"}
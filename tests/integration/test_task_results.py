@@ -0,0 +1,96 @@
+import json
+from unittest.mock import patch, AsyncMock
+
+from minio.commonconfig import ENABLED, Filter
+from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+
+from app.storage import MinioBackend
+from app.worker import celery_app
+from app.utils.task_result_helpers import offload_task_result, load_task_result
+
+HELPERS_MODULE = "app.utils.task_result_helpers"
+PROCESS_MODULE = "app.api.v1.endpoints.process_audio"
+
+LARGE_OUTPUT = {"patient": "John", "notes": "x" * 20000}
+
+def test_small_results_stay_inline():
+    result = {"file_id": "f-1", "llama3_json_output": {"patient": "John"}, "transcript_url": "u"}
+    with patch(f"{HELPERS_MODULE}.upload_file") as mock_upload:
+        assert offload_task_result(result, "t-1") is result
+    mock_upload.assert_not_called()
+
+def test_large_results_are_offloaded():
+    """Large outputs go to results/{task_id}.json; the backend keeps a pointer and summary."""
+    result = {"file_id": "f-1", "llama3_json_output": LARGE_OUTPUT, "transcript_url": "u"}
+    with patch(f"{HELPERS_MODULE}.upload_file") as mock_upload:
+        compact = offload_task_result(result, "t-1")
+
+    assert "llama3_json_output" not in compact
+    assert compact["result_object"] == "results/t-1.json"
+    assert compact["result_summary"] == {"type": "object", "keys": ["patient", "notes"]}
+    assert mock_upload.call_args.args[1] == "results/t-1.json"
+    assert mock_upload.call_args.kwargs["compress"] is True
+    assert len(mock_upload.call_args.kwargs["data"]) == compact["result_size"]
+
+    with patch(f"{HELPERS_MODULE}.fetch_json_object", return_value=LARGE_OUTPUT):
+        assert load_task_result(compact)["llama3_json_output"] == LARGE_OUTPUT
+
+def mock_offloaded_task(mock_result):
+    mock_result.return_value.ready.return_value = True
+    mock_result.return_value.state = "SUCCESS"
+    mock_result.return_value.get.return_value = {
+        "file_id": "f-1", "transcript_url": "u", "result_object": "results/t-1.json",
+        "result_size": 20030, "result_summary": {"type": "object", "keys": ["patient", "notes"]},
+    }
+
+@patch(f"{PROCESS_MODULE}.run_storage_io", new_callable=AsyncMock)
+@patch(f"{PROCESS_MODULE}.AsyncResult")
+def test_status_fetches_offloaded_result_on_request(mock_result, mock_io, client):
+    """The status endpoint only reads the bucket when include_result is set."""
+    mock_offloaded_task(mock_result)
+    mock_io.return_value = {"llama3_json_output": LARGE_OUTPUT}
+
+    summary = client.get("/get_audio_task/t-1").json()
+    assert summary["llama3_json_output"] is None
+    assert summary["result_offloaded"] is True
+    mock_io.assert_not_called()
+
+    full = client.get("/get_audio_task/t-1", params={"include_result": True}).json()
+    assert full["llama3_json_output"] == LARGE_OUTPUT
+
+def test_minio_expiry_rule_keeps_other_rules():
+    backend = MinioBackend("localhost:9000", access_key="a", secret_key="b", secure=False)
+    other = Rule(ENABLED, rule_filter=Filter(prefix="tmp/"), rule_id="expire-tmp", expiration=Expiration(days=1))
+
+    with patch.object(backend, "get_bucket_lifecycle", return_value=LifecycleConfig([other])), \
+            patch.object(backend, "set_bucket_lifecycle") as mock_set:
+        assert backend.set_prefix_expiry("audio", "results/", 7) is True
+
+    rules = mock_set.call_args.args[1].rules
+    assert [rule.rule_id for rule in rules] == ["expire-tmp", "expire-results"]
+    assert rules[1].expiration.days == 7
+
+def test_task_statuses_use_one_mget(client):
+    """All task states and progress events are read in one round trip."""
+    redis_client = AsyncMock()
+    redis_client.mget.return_value = [
+        json.dumps({"status": "SUCCESS", "result": {"file_id": "f-1", "transcript_url": "u",
+                                                    "result_object": "results/t-1.json"}}),
+        json.dumps({"status": "SUCCESS", "result": {"error": "transcription failed", "stage": "transcribe"}}),
+        None,
+        None, None, json.dumps({"event": "transcribing"}),
+    ]
+    with patch(f"{HELPERS_MODULE}.get_async_redis_client", return_value=redis_client):
+        response = client.post("/tasks/status", json={"task_ids": ["t-1", "t-2", "t-3", "t-1"]})
+
+    assert response.status_code == 200
+    assert response.json()["tasks"] == {
+        "t-1": {"status": "SUCCESS", "file_id": "f-1", "transcript_url": "u", "result_offloaded": True},
+        "t-2": {"status": "FAILURE", "error": "transcription failed"},
+        "t-3": {"status": "PENDING", "progress": "transcribing"},
+    }
+    redis_client.mget.assert_awaited_once()
+    assert redis_client.mget.await_args.args[0][0] == celery_app.backend.get_key_for_task("t-1").decode()
+
+def test_task_statuses_need_task_ids(client):
+    assert client.post("/tasks/status", json={"task_ids": []}).status_code == 422